@@ -0,0 +1,72 @@
+"""
+One-pass matching of new RFPs against every digest subscriber.
+
+Users are indexed once by the states and categories they ask for; each RFP
+looks up its own state and category, so building all digests costs
+O(new RFPs + matches) Python work and two queries, instead of a filtered
+queryset plus several COUNTs per user.
+"""
+from bisect import bisect_right
+
+
+class DigestIndex:
+    """Digest users indexed by preferred state / category, with value and keyword checks."""
+
+    def __init__(self, users):
+        self.users = list(users)
+        self._by_state = {}
+        self._by_category = {}
+        self._required = []
+        self._settings = []
+        open_users = []
+        for uid, user in enumerate(self.users):
+            required = 0
+            for index, values in ((self._by_state, user.preferred_states),
+                                  (self._by_category, user.preferred_categories)):
+                if values:
+                    required += 1
+                    for value in values:
+                        index.setdefault(value, []).append(uid)
+            self._required.append(required)
+            settings = getattr(user, 'settings', None)
+            self._settings.append((
+                [k.lower() for k in (settings.include_keywords if settings else None) or []],
+                [k.lower() for k in (settings.exclude_keywords if settings else None) or []],
+            ))
+            if not required:
+                open_users.append((user.minimum_contract_value or 0, uid))
+        open_users.sort(key=lambda item: item[0])
+        self._open_values = [value for value, _ in open_users]
+        self._open_ids = [uid for _, uid in open_users]
+
+    def match(self, rfp):
+        """Indexes of the users an RFP belongs to."""
+        value = rfp.estimated_value
+        matched = set(self._open_ids[:bisect_right(self._open_values, value if value is not None else 0)])
+        hits = {}
+        for uid in self._by_state.get(rfp.source_state, ()):
+            hits[uid] = hits.get(uid, 0) + 1
+        for uid in self._by_category.get(rfp.category, ()):
+            hits[uid] = hits.get(uid, 0) + 1
+        for uid, count in hits.items():
+            minimum = self.users[uid].minimum_contract_value
+            if count == self._required[uid] and (not minimum or (value is not None and value >= minimum)):
+                matched.add(uid)
+        if matched:
+            text = f'{rfp.title} {rfp.description}'.lower()
+            matched = {uid for uid in matched if self._keywords_ok(uid, text)}
+        return matched
+
+    def _keywords_ok(self, uid, text):
+        include, exclude = self._settings[uid]
+        if include and not any(k in text for k in include):
+            return False
+        return not any(k in text for k in exclude)
+
+    def digests(self, rfps):
+        """[(user, [rfps])] for users with at least one matching RFP, in user order."""
+        found = {}
+        for rfp in rfps:
+            for uid in self.match(rfp):
+                found.setdefault(uid, []).append(rfp)
+        return [(self.users[uid], found[uid]) for uid in sorted(found)]
@@ -9,6 +9,7 @@ import logging
 from apps.users.models import User
 from apps.rfps.models import RFP
 from apps.notifications.models import Notification, EmailDigest
+from apps.notifications.matching import DigestIndex
 
 logger = logging.getLogger('notifications')
 
@@ -26,21 +27,22 @@ def send_notification_emails():
         email_notifications_enabled=True,
         notification_frequency='daily',
         is_subscription_active=True
-    )
+    ).select_related('settings')
+    
+    # New RFPs are fetched once and matched against every user's preferences in
+    # one pass, instead of a filtered query plus COUNTs per user
+    new_rfps = list(get_new_rfps(days_back=1))
+    if not new_rfps:
+        logger.info("No new RFPs, skipping daily digests")
+        return {'sent_count': 0}
+    digests = DigestIndex(daily_users).digests(new_rfps)
     
     sent_count = 0
     
-    for user in daily_users:
+    for user, rfps in digests:
         try:
-            # Get new RFPs matching user preferences
-            rfps = get_relevant_rfps_for_user(user, days_back=1)
-            
-            if rfps.count() == 0:
-                logger.info(f"No new RFPs for {user.username}, skipping email")
-                continue
-            
             # Send email
-            subject = f"ContractLink AI: {rfps.count()} New Opportunities"
+            subject = f"ContractLink AI: {len(rfps)} New Opportunities"
             message = build_email_message(user, rfps)
             
             send_mail(
@@ -56,7 +58,7 @@ def send_notification_emails():
                 user=user,
                 digest_type='daily',
                 subject=subject,
-                total_rfps=rfps.count()
+                total_rfps=len(rfps)
             )
             digest.rfps_included.set(rfps)
             
@@ -70,17 +72,20 @@ def send_notification_emails():
     return {'sent_count': sent_count}
 
 
-def get_relevant_rfps_for_user(user: User, days_back: int = 1):
+def get_new_rfps(days_back: int = 1):
     """
-    Get RFPs relevant to user's preferences.
+    Active RFPs created in the last `days_back` days.
     """
     from datetime import timedelta
     cutoff = timezone.now() - timedelta(days=days_back)
-    
-    rfps = RFP.objects.filter(
-        created_at__gte=cutoff,
-        status='active'
-    )
+    return RFP.objects.filter(created_at__gte=cutoff, status='active')
+
+
+def get_relevant_rfps_for_user(user: User, days_back: int = 1):
+    """
+    Get RFPs relevant to user's preferences (single-user view; digests use DigestIndex).
+    """
+    rfps = get_new_rfps(days_back)
     
     # Filter by preferred states
     if user.preferred_states:
@@ -103,7 +108,7 @@ def build_email_message(user: User, rfps):
     """
     message = f"""Hello {user.first_name or user.username},
 
-Here are {rfps.count()} new government procurement opportunities matching your preferences:
+Here are {len(rfps)} new government procurement opportunities matching your preferences:
 
 """
     
@@ -118,8 +123,8 @@ View: {rfp.source_url}
 ---
 """
     
-    if rfps.count() > 10:
-        message += f"\n... and {rfps.count() - 10} more opportunities.\n"
+    if len(rfps) > 10:
+        message += f"\n... and {len(rfps) - 10} more opportunities.\n"
     
     message += f"""
 View all opportunities: https://contractlink.ai/rfps
@@ -108,6 +108,7 @@ class RFP(models.Model):
             models.Index(fields=['source_state', 'status', '-posted_date']),
             models.Index(fields=['category', '-posted_date']),
             models.Index(fields=['due_date', 'status']),
+            models.Index(fields=['-posted_date', '-id']),
         ]
     
     def __str__(self):
@@ -0,0 +1,71 @@
+"""
+Pagination for RFP API.
+Cursor (keyset) pagination on (posted_date, id) so deep pages cost the same as
+the first one; ?page=N keeps the old page-number behaviour for existing links.
+"""
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import connection
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+APPROXIMATE_COUNT_TTL = 300  # seconds a fallback exact count is cached
+
+
+def approximate_count(queryset):
+    """
+    Row estimate without a full COUNT(*).
+    PostgreSQL: planner estimate from EXPLAIN. Otherwise: cached exact count.
+    """
+    sql, params = queryset.query.sql_with_params()
+    if connection.vendor == 'postgresql':
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+                plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+        except Exception:
+            pass
+    key = 'rfp_count:' + hashlib.md5((sql + repr(params)).encode('utf-8')).hexdigest()
+    return cache.get_or_set(key, queryset.count, APPROXIMATE_COUNT_TTL)
+
+
+class RFPCursorPagination(CursorPagination):
+    """
+    Keyset pagination for RFP listings.
+    Response: {next, previous, approximate_count, results}.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-posted_date', '-id')
+    legacy_page_query_param = 'page'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self._legacy = None
+        self._count_queryset = queryset
+        if self.legacy_page_query_param in request.query_params:
+            self._legacy = PageNumberPagination()
+            self._legacy.page_size = self.page_size
+            return self._legacy.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self._legacy is not None:
+            return self._legacy.get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('approximate_count', approximate_count(self._count_queryset)),
+            ('results', data),
+        ]))
+
+    def to_html(self):
+        if self._legacy is not None:
+            return self._legacy.to_html()
+        return super().to_html()
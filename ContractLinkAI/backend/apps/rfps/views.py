@@ -8,6 +8,7 @@ from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticate
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q
 from apps.rfps.models import RFP, SavedRFP, RFPActivity
+from apps.rfps.pagination import RFPCursorPagination
 from apps.rfps.serializers import (
     RFPSerializer, RFPListSerializer, SavedRFPSerializer, RFPActivitySerializer
 )
@@ -17,14 +18,16 @@ class RFPViewSet(viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for viewing RFPs.
     Supports filtering by state, category, status, and search.
+    Lists are cursor-paginated on (posted_date, id); ?page=N still works.
     """
     queryset = RFP.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = RFPCursorPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['source_state', 'source_city', 'category', 'status', 'source_type']
     search_fields = ['title', 'description', 'rfp_number', 'issuing_agency', 'keywords']
     ordering_fields = ['posted_date', 'due_date', 'estimated_value', 'view_count']
-    ordering = ['-posted_date']
+    ordering = ['-posted_date', '-id']
     
     def get_serializer_class(self):
         """Use lightweight serializer for list views."""
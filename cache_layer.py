@@ -0,0 +1,388 @@
+"""
+Two-tier application cache
+Tier 1 is a per-worker LRU dict (no I/O); tier 2 is an optional shared store
+(Redis when CACHE_REDIS_URL/REDIS_URL is set and the redis package is
+installed, otherwise a SQLite file shared by all gunicorn workers on the host).
+
+The shared tier stores JSON, never pickle: anything that can write the store
+can only plant data, not code. datetime/date/Decimal values round-trip;
+tuples come back as lists. The SQLite file lives in a private data directory
+(APP_DATA_DIR, mode 0700) and is created 0600; a store file owned by another
+user or writable by group/others is refused.
+
+Entries carry TTLs and tags. invalidate_tag() bumps a tag version in the
+shared tier; entries stamped with an older version are treated as misses, so
+ingest jobs in one worker invalidate cached data in every worker.
+
+Configuration (environment):
+    CACHE_SHARED_BACKEND  redis | sqlite | none   (default: redis if a URL is set, else sqlite)
+    CACHE_REDIS_URL / REDIS_URL
+    CACHE_SQLITE_PATH     (default: <APP_DATA_DIR>/app_cache.sqlite3)
+    APP_DATA_DIR          (default: <app dir>/instance)
+    CACHE_LOCAL_MAX_ENTRIES (default: 1024)
+"""
+import json
+import os
+import sqlite3
+import stat
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+
+_MISSING = object()
+
+# How long a worker trusts its local copy of tag versions before re-reading the shared tier
+TAG_VERSION_CHECK_SECONDS = 2.0
+
+APP_DATA_DIR = os.environ.get('APP_DATA_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                              'instance')
+
+
+def private_data_path(filename):
+    """Path of a file in the app's private data dir (created 0700); the file itself is created 0600.
+
+    Raises PermissionError if the directory or an existing file is owned by another user or is
+    writable by group/others, so a store planted by someone else is never used.
+    """
+    os.makedirs(APP_DATA_DIR, mode=0o700, exist_ok=True)
+    path = os.path.join(APP_DATA_DIR, filename)
+    for candidate in (APP_DATA_DIR, path):
+        if not os.path.exists(candidate):
+            continue
+        info = os.stat(candidate)
+        if hasattr(os, 'getuid') and info.st_uid != os.getuid():
+            raise PermissionError(f'{candidate} is owned by another user')
+        if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            raise PermissionError(f'{candidate} is writable by other users')
+    os.close(os.open(path, os.O_CREAT | os.O_RDWR, 0o600))
+    return path
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'__decimal__': str(value)}
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f'{type(value).__name__} is not cacheable in the shared tier')
+
+
+def _decode(obj):
+    if len(obj) == 1:
+        if '__datetime__' in obj:
+            return datetime.fromisoformat(obj['__datetime__'])
+        if '__date__' in obj:
+            return date.fromisoformat(obj['__date__'])
+        if '__decimal__' in obj:
+            return Decimal(obj['__decimal__'])
+    return obj
+
+
+def dumps(envelope):
+    return json.dumps(envelope, default=_encode, separators=(',', ':')).encode('utf-8')
+
+
+def loads(raw):
+    if isinstance(raw, memoryview):
+        raw = raw.tobytes()
+    return json.loads(raw, object_hook=_decode)
+
+
+class LocalLRU:
+    """Thread-safe per-process LRU of (expires_at, tag_versions, value) envelopes."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            envelope = self._data.get(key)
+            if envelope is None:
+                return None
+            if envelope[0] <= time.time():
+                self._data.pop(key, None)
+                return None
+            self._data.move_to_end(key)
+            return envelope
+
+    def set(self, key, envelope):
+        with self._lock:
+            self._data[key] = envelope
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteSharedStore:
+    """Shared tier in a local SQLite file (WAL), visible to every worker process on the host."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.chmod(path + suffix, 0o600)
+        conn.execute('''CREATE TABLE IF NOT EXISTS cache_entries
+                        (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS cache_counters
+                        (key TEXT PRIMARY KEY, value INTEGER NOT NULL)''')
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute('SELECT value FROM cache_entries WHERE key = ? AND expires_at > ?',
+                                   (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl):
+        conn = self._conn()
+        conn.execute('INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)',
+                     (key, sqlite3.Binary(value), time.time() + ttl))
+        # Opportunistic purge of expired rows keeps the file small
+        if int(time.time()) % 60 == 0:
+            conn.execute('DELETE FROM cache_entries WHERE expires_at <= ?', (time.time(),))
+
+    def delete(self, key):
+        self._conn().execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+
+    def get_counters(self, keys):
+        if not keys:
+            return {}
+        placeholders = ','.join('?' * len(keys))
+        rows = self._conn().execute(f'SELECT key, value FROM cache_counters WHERE key IN ({placeholders})',
+                                    list(keys)).fetchall()
+        return dict(rows)
+
+    def incr(self, key):
+        conn = self._conn()
+        conn.execute('''INSERT INTO cache_counters (key, value) VALUES (?, 1)
+                        ON CONFLICT(key) DO UPDATE SET value = value + 1''', (key,))
+        return conn.execute('SELECT value FROM cache_counters WHERE key = ?', (key,)).fetchone()[0]
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute('DELETE FROM cache_entries')
+
+
+class RedisSharedStore:
+    """Shared tier in Redis (or any Redis-protocol server)."""
+
+    def __init__(self, url, prefix='appcache:'):
+        import redis  # optional dependency
+        self.client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self.client.setex(self.prefix + key, max(int(ttl), 1), value)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def get_counters(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self.client.mget([self.prefix + 'ctr:' + k for k in keys])
+        return {k: int(v) for k, v in zip(keys, values) if v is not None}
+
+    def incr(self, key):
+        return int(self.client.incr(self.prefix + 'ctr:' + key))
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + '*', count=500):
+            if not key.decode('utf-8', 'ignore').startswith(self.prefix + 'ctr:'):
+                self.client.delete(key)
+
+
+class TieredCache:
+    """Per-worker LRU in front of an optional shared store, with TTLs, tags and hit/miss metrics."""
+
+    def __init__(self, shared=None, local_max_entries=1024):
+        self.local = LocalLRU(local_max_entries)
+        self.shared = shared
+        self._tag_versions = {}   # tag -> (checked_at, version)
+        self._tag_lock = threading.Lock()
+        self._metrics = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'sets': 0,
+                         'invalidations': 0, 'shared_errors': 0}
+        self._metrics_lock = threading.Lock()
+
+    # ----- metrics -----
+    def _count(self, name):
+        with self._metrics_lock:
+            self._metrics[name] += 1
+
+    def stats(self):
+        with self._metrics_lock:
+            stats = dict(self._metrics)
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['local_hits'] + stats['shared_hits']) / lookups, 3) if lookups else 0.0
+        stats['local_entries'] = len(self.local)
+        stats['shared_backend'] = type(self.shared).__name__ if self.shared else None
+        return stats
+
+    # ----- tags -----
+    def _current_tag_versions(self, tags):
+        if not tags:
+            return {}
+        now = time.time()
+        versions, stale = {}, []
+        with self._tag_lock:
+            for tag in tags:
+                cached = self._tag_versions.get(tag)
+                if cached and (self.shared is None or now - cached[0] < TAG_VERSION_CHECK_SECONDS):
+                    versions[tag] = cached[1]
+                else:
+                    stale.append(tag)
+        if stale:
+            fetched = {}
+            if self.shared is not None:
+                try:
+                    fetched = self.shared.get_counters(['tag:' + t for t in stale])
+                except Exception as e:
+                    self._count('shared_errors')
+                    print(f"⚠️  Cache tag lookup failed: {e}")
+            with self._tag_lock:
+                for tag in stale:
+                    version = fetched.get('tag:' + tag, self._tag_versions.get(tag, (0, 0))[1])
+                    self._tag_versions[tag] = (now, version)
+                    versions[tag] = version
+        return versions
+
+    def invalidate_tag(self, *tags):
+        """Invalidate every entry carrying any of these tags, in all workers."""
+        for tag in tags:
+            version = None
+            if self.shared is not None:
+                try:
+                    version = self.shared.incr('tag:' + tag)
+                except Exception as e:
+                    self._count('shared_errors')
+                    print(f"⚠️  Cache tag invalidation failed: {e}")
+            with self._tag_lock:
+                if version is None:
+                    version = self._tag_versions.get(tag, (0, 0))[1] + 1
+                self._tag_versions[tag] = (time.time(), version)
+            self._count('invalidations')
+
+    def _fresh(self, envelope):
+        expires_at, tag_versions, _ = envelope
+        if expires_at <= time.time():
+            return False
+        if not tag_versions:
+            return True
+        current = self._current_tag_versions(tag_versions.keys())
+        return all(current.get(tag, 0) == version for tag, version in tag_versions.items())
+
+    # ----- core API -----
+    def get(self, key, default=None):
+        envelope = self.local.get(key)
+        if envelope is not None and self._fresh(envelope):
+            self._count('local_hits')
+            return envelope[2]
+
+        if self.shared is not None:
+            try:
+                raw = self.shared.get(key)
+            except Exception as e:
+                raw = None
+                self._count('shared_errors')
+                print(f"⚠️  Shared cache read failed: {e}")
+            if raw is not None:
+                try:
+                    expires_at, tag_versions, value = loads(raw)
+                    envelope = (expires_at, tag_versions, value)
+                except Exception:
+                    envelope = None
+                if envelope is not None and self._fresh(envelope):
+                    self.local.set(key, envelope)
+                    self._count('shared_hits')
+                    return envelope[2]
+
+        self.local.delete(key)
+        self._count('misses')
+        return default
+
+    def set(self, key, value, ttl=300, tags=()):
+        envelope = (time.time() + ttl, self._current_tag_versions(tags), value)
+        self.local.set(key, envelope)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, dumps(envelope), ttl)
+            except Exception as e:
+                self._count('shared_errors')
+                print(f"⚠️  Shared cache write failed: {e}")
+        self._count('sets')
+
+    def delete(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            try:
+                self.shared.delete(key)
+            except Exception as e:
+                self._count('shared_errors')
+                print(f"⚠️  Shared cache delete failed: {e}")
+
+    def get_or_set(self, key, compute, ttl=300, tags=()):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value, ttl=ttl, tags=tags)
+        return value
+
+    def clear(self):
+        self.local.clear()
+        if self.shared is not None:
+            try:
+                self.shared.clear()
+            except Exception as e:
+                self._count('shared_errors')
+                print(f"⚠️  Shared cache clear failed: {e}")
+
+
+def build_shared_store():
+    """Shared tier from environment; None when disabled or unavailable."""
+    redis_url = os.environ.get('CACHE_REDIS_URL') or os.environ.get('REDIS_URL')
+    backend = os.environ.get('CACHE_SHARED_BACKEND', 'redis' if redis_url else 'sqlite').lower()
+    try:
+        if backend == 'redis' and redis_url:
+            return RedisSharedStore(redis_url)
+        if backend == 'sqlite':
+            path = os.environ.get('CACHE_SQLITE_PATH') or private_data_path('app_cache.sqlite3')
+            return SQLiteSharedStore(path)
+    except Exception as e:
+        print(f"⚠️  Shared cache tier unavailable ({backend}), using worker-local cache only: {e}")
+    return None
+
+
+app_cache = TieredCache(shared=build_shared_store(),
+                        local_max_entries=int(os.environ.get('CACHE_LOCAL_MAX_ENTRIES', 1024)))
@@ -0,0 +1,369 @@
+"""
+Atomic credit ledger
+deduct_credits / add_credits used to SELECT credits_balance, compute the new
+balance in Python and UPDATE it back, so two concurrent lead unlocks could
+both spend the same credits (lost update) or overdraw the account. Every
+balance change is now a single conditional statement:
+
+    UPDATE leads SET credits_balance = credits_balance - :amount
+    WHERE email = :email AND credits_balance >= :amount
+    RETURNING credits_balance
+
+The database applies it atomically, so no row lock is held across a Python
+round trip and concurrent debits for the same user queue only for the
+duration of that one statement.
+
+Each change is logged in credits_usage / credits_purchases in the same
+transaction. Passing an idempotency_key (a client retry token, a PayPal
+order id) makes a retried call return the original result instead of
+charging again: the ledger row is inserted with ON CONFLICT DO NOTHING on
+(user_email, idempotency_key), and a conflict rolls the balance change back.
+
+allocate_monthly_credits() credits every due subscriber set-based - a single
+data-modifying CTE on PostgreSQL, three statements in one transaction on
+SQLite - instead of a per-subscriber loop.
+
+Run `python credit_ledger.py` for a concurrency stress test comparing the
+legacy read-modify-write with the conditional update.
+"""
+from collections import namedtuple
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+LedgerResult = namedtuple('LedgerResult', 'ok balance error replayed')
+
+# Balances below this mark the low-credit alert as sent (kept from the original deduct_credits)
+LOW_CREDIT_THRESHOLD = 10
+MONTHLY_AMOUNT_PAID = 25.00
+
+
+def _is_postgres(session):
+    return session.get_bind().dialect.name == 'postgresql'
+
+
+def ensure_credit_ledger(session):
+    """Create credits_purchases / credits_usage if missing and add the ledger columns (idempotent)."""
+    pk = 'SERIAL PRIMARY KEY' if _is_postgres(session) else 'INTEGER PRIMARY KEY AUTOINCREMENT'
+    try:
+        session.execute(text(f'''CREATE TABLE IF NOT EXISTS credits_purchases
+                     (id {pk},
+                      user_email TEXT NOT NULL,
+                      credits_purchased INTEGER NOT NULL,
+                      amount_paid REAL NOT NULL,
+                      purchase_type TEXT NOT NULL,
+                      transaction_id TEXT,
+                      payment_method TEXT DEFAULT 'credit_card',
+                      payment_reference TEXT,
+                      purchase_date TEXT NOT NULL,
+                      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)'''))
+        session.execute(text(f'''CREATE TABLE IF NOT EXISTS credits_usage
+                     (id {pk},
+                      user_email TEXT NOT NULL,
+                      credits_used INTEGER NOT NULL,
+                      action_type TEXT NOT NULL,
+                      opportunity_id TEXT,
+                      opportunity_name TEXT,
+                      usage_date TEXT NOT NULL,
+                      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)'''))
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        print(f"⚠️  Credit ledger tables init error: {e}")
+        return False
+
+    for table in ('credits_purchases', 'credits_usage'):
+        for column in ('idempotency_key TEXT', 'balance_after INTEGER'):
+            try:
+                # SQLite lacks IF NOT EXISTS for ADD COLUMN
+                session.execute(text(f'ALTER TABLE {table} ADD COLUMN {column}'))
+                session.commit()
+            except Exception:
+                session.rollback()
+        try:
+            session.execute(text(f'''CREATE UNIQUE INDEX IF NOT EXISTS uq_{table}_idempotency
+                                     ON {table}(user_email, idempotency_key)'''))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"⚠️  Credit ledger index init error: {e}")
+            return False
+    return True
+
+
+def _replay(session, table, email, idempotency_key):
+    """The ledger row an earlier call with this key wrote, as a replayed result (or None)."""
+    if not idempotency_key:
+        return None
+    row = session.execute(text(f'''SELECT balance_after FROM {table}
+                                   WHERE user_email = :email AND idempotency_key = :key'''),
+                          {'email': email, 'key': idempotency_key}).fetchone()
+    if row is None:
+        return None
+    return LedgerResult(True, row.balance_after, None, True)
+
+
+def debit(session, email, amount, action_type, opportunity_id=None, opportunity_name=None, idempotency_key=None):
+    """Spend credits if the balance covers them; logs credits_usage in the same transaction (commits).
+
+    Returns LedgerResult(ok, balance, error, replayed); on 'Insufficient credits'
+    balance is the current balance.
+    """
+    if not isinstance(amount, int) or amount <= 0:
+        return LedgerResult(False, None, 'Invalid credit amount', False)
+    try:
+        row = session.execute(text('''UPDATE leads
+                                      SET credits_balance = credits_balance - :amount,
+                                          credits_used = COALESCE(credits_used, 0) + :amount,
+                                          low_credits_alert_sent = CASE WHEN credits_balance - :amount >= :low
+                                                                        THEN FALSE ELSE TRUE END
+                                      WHERE email = :email AND credits_balance >= :amount
+                                      RETURNING credits_balance'''),
+                              {'amount': amount, 'low': LOW_CREDIT_THRESHOLD, 'email': email}).fetchone()
+        if row is None:
+            session.rollback()
+            replayed = _replay(session, 'credits_usage', email, idempotency_key)
+            if replayed is not None:
+                return replayed
+            current = session.execute(text('SELECT credits_balance FROM leads WHERE email = :email'),
+                                      {'email': email}).fetchone()
+            session.rollback()
+            if current is None:
+                return LedgerResult(False, None, 'User not found', False)
+            return LedgerResult(False, current[0] or 0, 'Insufficient credits', False)
+
+        balance = row[0]
+        logged = session.execute(text('''INSERT INTO credits_usage
+                                         (user_email, credits_used, action_type, opportunity_id, opportunity_name,
+                                          usage_date, idempotency_key, balance_after)
+                                         VALUES (:email, :amount, :action_type, :opp_id, :opp_name, :usage_date,
+                                                 :key, :balance)
+                                         ON CONFLICT (user_email, idempotency_key) DO NOTHING
+                                         RETURNING id'''),
+                                 {'email': email, 'amount': amount, 'action_type': action_type,
+                                  'opp_id': opportunity_id, 'opp_name': opportunity_name,
+                                  'usage_date': datetime.now().isoformat(), 'key': idempotency_key,
+                                  'balance': balance}).fetchone()
+        if logged is None:
+            # A retry of a debit that already went through: undo this one
+            session.rollback()
+            return _replay(session, 'credits_usage', email, idempotency_key)
+        session.commit()
+        return LedgerResult(True, balance, None, False)
+    except Exception as e:
+        session.rollback()
+        print(f"Error deducting credits: {e}")
+        return LedgerResult(False, None, str(e), False)
+
+
+def credit(session, email, amount, purchase_type, amount_paid, transaction_id=None, idempotency_key=None,
+           payment_method='credit_card', payment_reference=None):
+    """Add credits and log the purchase in the same transaction (commits); returns LedgerResult."""
+    if not isinstance(amount, int) or amount <= 0:
+        return LedgerResult(False, None, 'Invalid credit amount', False)
+    now = datetime.now().isoformat()
+    try:
+        row = session.execute(text('''UPDATE leads
+                                      SET credits_balance = COALESCE(credits_balance, 0) + :amount,
+                                          last_credit_purchase_date = :now,
+                                          low_credits_alert_sent = FALSE
+                                      WHERE email = :email
+                                      RETURNING credits_balance'''),
+                              {'amount': amount, 'now': now, 'email': email}).fetchone()
+        if row is None:
+            session.rollback()
+            return LedgerResult(False, None, 'User not found', False)
+
+        balance = row[0]
+        logged = session.execute(text('''INSERT INTO credits_purchases
+                                         (user_email, credits_purchased, amount_paid, purchase_type, transaction_id,
+                                          payment_method, payment_reference, purchase_date, idempotency_key,
+                                          balance_after)
+                                         VALUES (:email, :amount, :paid, :ptype, :trans_id, :method, :reference,
+                                                 :now, :key, :balance)
+                                         ON CONFLICT (user_email, idempotency_key) DO NOTHING
+                                         RETURNING id'''),
+                                 {'email': email, 'amount': amount, 'paid': amount_paid, 'ptype': purchase_type,
+                                  'trans_id': transaction_id, 'method': payment_method,
+                                  'reference': payment_reference, 'now': now, 'key': idempotency_key,
+                                  'balance': balance}).fetchone()
+        if logged is None:
+            session.rollback()
+            return _replay(session, 'credits_purchases', email, idempotency_key)
+        session.commit()
+        return LedgerResult(True, balance, None, False)
+    except Exception as e:
+        session.rollback()
+        print(f"Error adding credits: {e}")
+        return LedgerResult(False, None, str(e), False)
+
+
+# Active subscriptions with an account that have not been credited today
+_DUE_SQLITE = '''s.status = 'active'
+                 AND (s.last_credits_allocated_date IS NULL OR date(s.last_credits_allocated_date) < date(:today))
+                 AND EXISTS (SELECT 1 FROM leads l WHERE l.email = s.email)'''
+_DUE_POSTGRES = '''s.status = 'active'
+                   AND (s.last_credits_allocated_date IS NULL
+                        OR CAST(s.last_credits_allocated_date AS DATE) < CAST(:today AS DATE))
+                   AND EXISTS (SELECT 1 FROM leads l WHERE l.email = s.email)'''
+
+
+def allocate_monthly_credits(session, today=None, amount_paid=MONTHLY_AMOUNT_PAID):
+    """Credit monthly_credits to every due subscriber in one set-based transaction; returns accounts credited."""
+    today = (today or date.today()).isoformat()
+    params = {'today': today, 'paid': amount_paid, 'trans_id': f'monthly_{today}', 'now': datetime.now().isoformat()}
+    try:
+        if _is_postgres(session):
+            # FOR UPDATE SKIP LOCKED: a concurrent run credits the rest, never the same subscription twice
+            credited = session.execute(text(f'''
+                WITH due AS (
+                    SELECT s.id, s.email, COALESCE(s.monthly_credits, 0) AS monthly_credits
+                    FROM subscriptions s
+                    WHERE {_DUE_POSTGRES}
+                    FOR UPDATE SKIP LOCKED
+                ), marked AS (
+                    UPDATE subscriptions s SET last_credits_allocated_date = :today
+                    FROM due WHERE s.id = due.id
+                    RETURNING due.email, due.monthly_credits
+                ), totals AS (
+                    SELECT email, SUM(monthly_credits) AS credits FROM marked GROUP BY email
+                ), credited AS (
+                    UPDATE leads l
+                    SET credits_balance = COALESCE(l.credits_balance, 0) + totals.credits,
+                        low_credits_alert_sent = FALSE
+                    FROM totals WHERE l.email = totals.email
+                    RETURNING l.email, totals.credits, l.credits_balance
+                )
+                INSERT INTO credits_purchases
+                    (user_email, credits_purchased, amount_paid, purchase_type, transaction_id, purchase_date,
+                     balance_after)
+                SELECT email, credits, :paid, 'monthly_subscription', :trans_id, :now, credits_balance
+                FROM credited'''), params).rowcount
+        else:
+            # SQLite: no DML in CTEs; the write transaction makes the three statements atomic
+            session.execute(text(f'''
+                INSERT INTO credits_purchases
+                    (user_email, credits_purchased, amount_paid, purchase_type, transaction_id, purchase_date,
+                     balance_after)
+                SELECT s.email, SUM(COALESCE(s.monthly_credits, 0)), :paid, 'monthly_subscription', :trans_id, :now,
+                       (SELECT COALESCE(l.credits_balance, 0) FROM leads l WHERE l.email = s.email)
+                           + SUM(COALESCE(s.monthly_credits, 0))
+                FROM subscriptions s
+                WHERE {_DUE_SQLITE}
+                GROUP BY s.email'''), params)
+            credited = session.execute(text(f'''
+                UPDATE leads
+                SET credits_balance = COALESCE(credits_balance, 0) + (
+                        SELECT SUM(COALESCE(s.monthly_credits, 0)) FROM subscriptions s
+                        WHERE s.email = leads.email AND {_DUE_SQLITE}),
+                    low_credits_alert_sent = FALSE
+                WHERE email IN (SELECT s.email FROM subscriptions s WHERE {_DUE_SQLITE})'''), params).rowcount
+            session.execute(text(f'''UPDATE subscriptions SET last_credits_allocated_date = :today
+                                     WHERE id IN (SELECT s.id FROM subscriptions s WHERE {_DUE_SQLITE})'''),
+                            params)
+        session.commit()
+        return credited
+    except Exception as e:
+        session.rollback()
+        print(f"Error allocating monthly credits: {e}")
+        return 0
+
+
+def stress_test(url=None, users=5, threads=16, debits_per_thread=200, starting_balance=1000, amount=3):
+    """Hammer a few accounts from many threads with the legacy and the ledger debit; report drift."""
+    import os
+    import tempfile
+    import threading
+    import time
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    tmp = None
+    if url is None:
+        fd, tmp = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        url = f'sqlite:///{tmp}'
+    engine = create_engine(url, pool_size=threads, max_overflow=0,
+                           connect_args={'timeout': 30} if url.startswith('sqlite') else {})
+    emails = [f'stress{i}@example.com' for i in range(users)]
+
+    def reset():
+        with Session(engine) as session:
+            session.execute(text('''CREATE TABLE IF NOT EXISTS leads
+                                    (email TEXT PRIMARY KEY, credits_balance INTEGER, credits_used INTEGER,
+                                     low_credits_alert_sent BOOLEAN, last_credit_purchase_date TEXT)'''))
+            session.execute(text('DELETE FROM leads WHERE email LIKE :pattern'), {'pattern': 'stress%'})
+            for email in emails:
+                session.execute(text('''INSERT INTO leads (email, credits_balance, credits_used)
+                                        VALUES (:email, :balance, 0)'''),
+                                {'email': email, 'balance': starting_balance})
+            session.commit()
+            ensure_credit_ledger(session)
+            session.execute(text('DELETE FROM credits_usage WHERE user_email LIKE :pattern'), {'pattern': 'stress%'})
+            session.commit()
+
+    def legacy_debit(session, email, n):
+        balance, used = session.execute(text('SELECT credits_balance, credits_used FROM leads WHERE email = :e'),
+                                        {'e': email}).fetchone()
+        if balance < n:
+            return False
+        session.execute(text('UPDATE leads SET credits_balance = :b, credits_used = :u WHERE email = :e'),
+                        {'b': balance - n, 'u': used + n, 'e': email})
+        session.execute(text('''INSERT INTO credits_usage (user_email, credits_used, action_type, usage_date)
+                                VALUES (:e, :n, 'stress', :d)'''), {'e': email, 'n': n, 'd': 'now'})
+        session.commit()
+        return True
+
+    def ledger_debit(session, email, n):
+        return debit(session, email, n, 'stress').ok
+
+    def run(label, fn):
+        reset()
+        successes = [0] * threads
+        errors = [0] * threads
+
+        def worker(index):
+            with Session(engine) as session:
+                for i in range(debits_per_thread):
+                    try:
+                        if fn(session, emails[(index + i) % users], amount):
+                            successes[index] += 1
+                    except Exception:
+                        session.rollback()
+                        errors[index] += 1
+
+        started = time.perf_counter()
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        with Session(engine) as session:
+            remaining = session.execute(text('SELECT SUM(credits_balance) FROM leads WHERE email LIKE :p'),
+                                        {'p': 'stress%'}).scalar()
+            logged = session.execute(text('SELECT COALESCE(SUM(credits_used), 0) FROM credits_usage '
+                                          'WHERE user_email LIKE :p'), {'p': 'stress%'}).scalar()
+            negative = session.execute(text('SELECT COUNT(*) FROM leads WHERE email LIKE :p AND credits_balance < 0'),
+                                       {'p': 'stress%'}).scalar()
+        spent = users * starting_balance - remaining
+        total = threads * debits_per_thread
+        print(f"{label:<28} {elapsed * 1000:8.0f} ms  {total / elapsed:8.0f} debits/s  "
+              f"ok={sum(successes)} errors={sum(errors)} logged={logged} spent={spent} "
+              f"lost={logged - spent} overdrawn={negative}")
+
+    print(f"{engine.dialect.name}: {threads} threads x {debits_per_thread} debits of {amount} "
+          f"over {users} accounts of {starting_balance}")
+    run('legacy read-modify-write', legacy_debit)
+    run('conditional UPDATE', ledger_debit)
+    engine.dispose()
+    if tmp:
+        os.remove(tmp)
+
+
+if __name__ == '__main__':
+    import os
+    import sys
+    stress_test(sys.argv[1] if len(sys.argv) > 1 else os.environ.get('CREDIT_STRESS_DATABASE_URL'))
@@ -0,0 +1,180 @@
+"""
+Client dashboard lead feed and stats
+The dashboard's first paint needs only aggregate counts (one query); the lead
+grid is fetched page by page. Each source table is read with its own
+`ORDER BY sort DESC, id DESC LIMIT page+1` plus the keyset cursor predicate
+(served by the idx_<table>_feed index from ensure_dashboard_feed_indexes), the
+few (lead_type, id, sort date) keys are merged newest first in Python, and only
+the rows on the requested page are loaded. Rows without a sort date are not
+listed. A source whose query fails is logged and left out of the page rather
+than failing the whole feed.
+"""
+from datetime import date, datetime
+
+from sqlalchemy import text, bindparam, inspect
+
+from keyset_pagination import decode_cursor, encode_cursor
+
+# lead_type -> (table, key filter, sort date expression, detail columns)
+DASHBOARD_FEED_SOURCES = {
+    'government': (
+        'federal_contracts', 'title IS NOT NULL', 'COALESCE(posted_date, created_at)',
+        '''id, title, agency, location, description, value as contract_value, deadline, naics_code,
+           posted_date as created_at, sam_gov_url as website_url'''),
+    'supply': (
+        'supply_contracts', '1=1', 'created_at',
+        '''id, title, agency, location, description, estimated_value as contract_value, bid_deadline as deadline,
+           '' as naics_code, created_at, website_url, product_category, NULL as requirements'''),
+    'commercial': (
+        'commercial_opportunities', '1=1', 'created_at',
+        '''id, business_name, business_type, location, description, monthly_value, 'Ongoing' as deadline,
+           '' as naics_code, 'Recent' as date_posted, website_url, services_needed, special_requirements'''),
+    'commercial_request': (
+        'commercial_lead_requests', "status='open'", 'created_at',
+        '''id, business_name, contact_name, email, phone, address, city, zip_code,
+           business_type, square_footage, frequency, services_needed, special_requirements, budget_range,
+           start_date, urgency, status, created_at'''),
+    'residential_request': (
+        'residential_leads', "status='new'", 'created_at',
+        '''id, homeowner_name, address, city, zip_code, property_type, bedrooms, bathrooms, square_footage,
+           contact_email, contact_phone, estimated_value, cleaning_frequency, services_needed, special_requirements,
+           status, created_at'''),
+}
+
+
+def existing_tables(session):
+    """Names of tables present in the current database."""
+    return set(inspect(session.get_bind()).get_table_names())
+
+
+def ensure_dashboard_feed_indexes(session):
+    """(sort date DESC, id DESC) index per feed table, partial on the feed filter (idempotent)."""
+    tables = existing_tables(session)
+    created = 0
+    for table, where, sort_expr, _ in DASHBOARD_FEED_SOURCES.values():
+        if table not in tables:
+            continue
+        partial = '' if where == '1=1' else f' WHERE {where}'
+        try:
+            session.execute(text(f'''CREATE INDEX IF NOT EXISTS idx_{table}_feed
+                                    ON {table} (({sort_expr}) DESC, id DESC){partial}'''))
+            session.commit()
+            created += 1
+        except Exception as e:
+            session.rollback()
+            print(f"⚠️  Could not create dashboard feed index on {table}: {e}")
+    return created
+
+
+def dashboard_stats(session, user_email, today):
+    """All dashboard counters in a single round trip.
+
+    Tables that don't exist yet count as 0.
+    """
+    tables = existing_tables(session)
+
+    def count(table, where='1=1'):
+        if table not in tables:
+            return '0'
+        return f'(SELECT COUNT(*) FROM {table} WHERE {where})'
+
+    feed_total = ' + '.join(count(table, where) for table, where, _, _ in DASHBOARD_FEED_SOURCES.values())
+    row = session.execute(text(f'''
+        SELECT
+            {count('federal_contracts')} AS government_contracts,
+            {count('federal_contracts', "deadline IS NOT NULL AND CAST(deadline AS TEXT) NOT IN ('', 'Rolling')")} AS upcoming_contracts,
+            {count('supply_contracts', "status = 'open'")} AS supply_contracts,
+            {count('commercial_lead_requests', "status = 'open'")} AS commercial_leads,
+            {count('residential_leads', "status = 'new'")} AS residential_leads,
+            {count('commercial_lead_requests', "urgency = 'emergency' AND status = 'open'")} AS emergency_count,
+            {count('commercial_lead_requests', "urgency = 'urgent' AND status = 'open'")} AS urgent_count,
+            {count('saved_searches', 'user_email = :email')} AS saved_searches_count,
+            {count('saved_leads', 'user_email = :email')} AS saved_leads_count,
+            {count('user_activity', "user_email = :email AND action_type = 'viewed_lead' AND DATE(created_at) = :today")} AS leads_viewed_today,
+            {count('saved_leads', 'user_email = :email AND DATE(saved_at) = :today')} AS leads_saved_today,
+            {feed_total} AS feed_total
+    '''), {'email': user_email, 'today': today}).mappings().fetchone()
+
+    stats = {k: int(v or 0) for k, v in dict(row).items()}
+    stats['quick_wins'] = stats['emergency_count'] + stats['urgent_count'] + min(stats['upcoming_contracts'], 20)
+    stats['total_leads'] = (stats['government_contracts'] + stats['supply_contracts']
+                            + stats['commercial_leads'] + stats['residential_leads'])
+    return stats
+
+
+def _merge_key(value):
+    """Comparable sort date: PostgreSQL returns date/datetime objects, SQLite the stored text."""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return value
+
+
+def _cursor_predicate(sort_expr, lead_type, cursor_type):
+    """Rows of one source that come after the cursor in (sort DESC, lead_type DESC, id DESC) order."""
+    if lead_type < cursor_type:
+        return f' AND {sort_expr} <= :cursor_sort'
+    if lead_type > cursor_type:
+        return f' AND {sort_expr} < :cursor_sort'
+    return f' AND ({sort_expr} < :cursor_sort OR ({sort_expr} = :cursor_sort AND id < :cursor_id))'
+
+
+def fetch_dashboard_page(session, cursor=None, limit=24, lead_types=None):
+    """One page of the merged lead feed, newest first.
+
+    Returns ([(lead_type, row), ...], next_cursor).
+    """
+    tables = existing_tables(session)
+    after = decode_cursor(cursor)
+    params = {'feed_limit': limit + 1}
+    if after:
+        cursor_type, _, cursor_id = str(after[1]).rpartition(':')
+        try:
+            params.update({'cursor_sort': after[0], 'cursor_id': int(cursor_id)})
+        except ValueError:
+            after = None
+
+    keys = []
+    for lead_type, (table, where, sort_expr, _) in DASHBOARD_FEED_SOURCES.items():
+        if table not in tables or (lead_types and lead_type not in lead_types):
+            continue
+        sql = (f"SELECT id AS lead_id, {sort_expr} AS sort_date FROM {table} "
+               f"WHERE {where} AND {sort_expr} IS NOT NULL")
+        if after:
+            sql += _cursor_predicate(sort_expr, lead_type, cursor_type)
+        sql += f' ORDER BY {sort_expr} DESC, id DESC LIMIT :feed_limit'
+        try:
+            keys.extend((lead_type, row.lead_id, row.sort_date) for row in session.execute(text(sql), params))
+        except Exception as e:
+            session.rollback()
+            print(f"⚠️  Dashboard feed skipped {table}: {e}")
+    if not keys:
+        return [], None
+
+    keys.sort(key=lambda key: (_merge_key(key[2]), key[0], key[1]), reverse=True)
+    has_more = len(keys) > limit
+    keys = keys[:limit]
+    next_cursor = None
+    if has_more:
+        lead_type, lead_id, sort_date = keys[-1]
+        next_cursor = encode_cursor(_merge_key(sort_date), f'{lead_type}:{lead_id}')
+
+    # Load full rows for just this page, one query per lead type present
+    ids_by_type = {}
+    for lead_type, lead_id, _ in keys:
+        ids_by_type.setdefault(lead_type, []).append(lead_id)
+    rows_by_key = {}
+    for lead_type, ids in ids_by_type.items():
+        table, _, _, columns = DASHBOARD_FEED_SOURCES[lead_type]
+        stmt = text(f'SELECT {columns} FROM {table} WHERE id IN :ids').bindparams(bindparam('ids', expanding=True))
+        try:
+            for row in session.execute(stmt, {'ids': ids}).fetchall():
+                rows_by_key[(lead_type, row[0])] = row
+        except Exception as e:
+            session.rollback()
+            print(f"⚠️  Dashboard feed could not load {table} rows: {e}")
+
+    page = [(lead_type, rows_by_key[(lead_type, lead_id)])
+            for lead_type, lead_id, _ in keys if (lead_type, lead_id) in rows_by_key]
+    return page, next_cursor
@@ -8,12 +8,25 @@ import csv
 import json
 import zipfile
 import io
+import tempfile
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 import logging
 
+from keyword_matcher import CLEANING_STRICT
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bulk award archives are downloaded in chunks of this size to a temp file on disk
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# Contracts handed to the ingest sink per call (matches federal_ingest.UPSERT_CHUNK_SIZE)
+INGEST_BATCH_SIZE = 500
+
+# Column names vary between USAspending's custom-download and award-data-archive files
+_NAICS_COLUMNS = ('NAICS Code', 'naics_code')
+_STATE_COLUMNS = ('Place of Performance State Code', 'pop_state_code', 'primary_place_of_performance_state_code')
+
 
 class DataGovBulkFetcher:
     """Fetch federal contract data from Data.gov bulk files"""
@@ -35,33 +48,35 @@ class DataGovBulkFetcher:
             '561790',  # Other Services to Buildings and Dwellings
         ]
         
-        # Strict cleaning keywords for description filtering
-        self.cleaning_keywords = [
-            'janitor', 'cleaning', 'custodial', 'housekeeping',
-            'sanitiz', 'disinfect', 'sweeping', 'mopping'
-        ]
+        # Strict cleaning keywords for description filtering (see keyword_matcher.CLEANING_STRICT)
+        self.cleaning_keywords = CLEANING_STRICT.keywords
         
         # Virginia state codes
         self.va_state_codes = ['VA', 'Virginia']
+        self.last_fetch_ok = False
     
-    def fetch_usaspending_contracts(self, days_back=90):
+    def fetch_usaspending_contracts(self, days_back=90, start_date=None, end_date=None):
         """
         Fetch contracts from USAspending.gov bulk download API
         
         Args:
             days_back: How many days back to search (default 90 for bulk data)
+            start_date/end_date: Explicit action_date window (incremental syncs);
+                overrides days_back when given
         
         Returns:
-            List of contract dictionaries ready for database insertion
+            List of contract dictionaries ready for database insertion.
+            self.last_fetch_ok tells an empty window apart from a failed request.
         """
         logger.info("📦 Fetching bulk contract data from USAspending.gov...")
         
         contracts = []
+        self.last_fetch_ok = False
         
         try:
             # Calculate date range (search longer period for bulk data)
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days_back)
+            end_date = end_date or datetime.now()
+            start_date = start_date or (end_date - timedelta(days=days_back))
             
             # Use the award search API instead of bulk download for smaller datasets
             search_url = 'https://api.usaspending.gov/api/v2/search/spending_by_award/'
@@ -103,6 +118,7 @@ class DataGovBulkFetcher:
             )
             
             if response.status_code == 200:
+                self.last_fetch_ok = True
                 result = response.json()
                 awards = result.get('results', [])
                 
@@ -138,7 +154,7 @@ class DataGovBulkFetcher:
                     elif naics and any(naics.startswith(code) for code in self.naics_codes):
                         cleaning_contracts.append(contract)
                     # PRIORITY 3: Strict cleaning keywords in description
-                    elif any(keyword in naics_desc or keyword in title for keyword in self.cleaning_keywords):
+                    elif CLEANING_STRICT.search(naics_desc) or CLEANING_STRICT.search(title):
                         cleaning_contracts.append(contract)
                     # PRIORITY 4: Related service contracts (landscaping/grounds)
                     elif 'landscap' in naics_desc or 'grounds' in naics_desc or naics.startswith('5617'):
@@ -248,35 +264,107 @@ class DataGovBulkFetcher:
         
         return datasets
     
+    @contextmanager
+    def _open_bulk_source(self, url):
+        """Yield a seekable binary file for a URL or local path.
+
+        Remote files are streamed to a temporary file in DOWNLOAD_CHUNK_SIZE
+        pieces, so memory stays flat no matter how large the archive is.
+        """
+        if os.path.exists(url):
+            with open(url, 'rb') as fh:
+                yield fh
+            return
+        logger.info(f"📥 Downloading: {url[:100]}...")
+        with requests.get(url, stream=True, timeout=120) as response:
+            response.raise_for_status()
+            with tempfile.TemporaryFile() as tmp:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    if chunk:
+                        tmp.write(chunk)
+                tmp.seek(0)
+                yield tmp
+
+    def iter_bulk_csv_rows(self, url):
+        """Yield CSV rows (dicts) from a bulk file, one at a time.
+
+        ZIP archives are read member by member as streams; every .csv member
+        is parsed (award archives are often split into several files).
+        """
+        with self._open_bulk_source(url) as fh:
+            if zipfile.is_zipfile(fh):
+                fh.seek(0)
+                with zipfile.ZipFile(fh) as archive:
+                    members = [m for m in archive.namelist() if m.lower().endswith('.csv')] or archive.namelist()[:1]
+                    for member in members:
+                        with archive.open(member) as raw:
+                            text_stream = io.TextIOWrapper(raw, encoding='utf-8-sig', errors='replace', newline='')
+                            yield from csv.DictReader(text_stream)
+            else:
+                fh.seek(0)
+                text_stream = io.TextIOWrapper(fh, encoding='utf-8-sig', errors='replace', newline='')
+                try:
+                    yield from csv.DictReader(text_stream)
+                finally:
+                    # Don't let the wrapper close the underlying temp file twice
+                    text_stream.detach()
+
+    @staticmethod
+    def _row_value(row, columns):
+        for col in columns:
+            value = row.get(col)
+            if value:
+                return str(value).strip()
+        return ''
+
+    def iter_bulk_contracts(self, url, naics_prefixes=None, states=None):
+        """Yield parsed contracts from a bulk CSV/ZIP, filtering by NAICS and state in the stream.
+
+        Args:
+            naics_prefixes: NAICS code prefixes to keep (default: self.naics_codes); pass () to keep all
+            states: Place-of-performance state codes to keep; None keeps all states
+        """
+        naics_prefixes = self.naics_codes if naics_prefixes is None else tuple(naics_prefixes)
+        states = {s.upper() for s in states} if states else None
+        for row in self.iter_bulk_csv_rows(url):
+            if naics_prefixes and not self._row_value(row, _NAICS_COLUMNS).startswith(tuple(naics_prefixes)):
+                continue
+            if states and self._row_value(row, _STATE_COLUMNS).upper() not in states:
+                continue
+            contract = self._parse_usaspending_row(row)
+            if contract:
+                yield contract
+
+    def ingest_bulk_file(self, url, sink, batch_size=INGEST_BATCH_SIZE, naics_prefixes=None, states=None):
+        """Stream a bulk file into `sink` in batches (e.g. a bulk_upsert_federal_contracts wrapper).
+
+        Only one batch of parsed contracts is held in memory at a time.
+        Returns {'rows_kept', 'batches'}.
+        """
+        stats = {'rows_kept': 0, 'batches': 0}
+        batch = []
+        for contract in self.iter_bulk_contracts(url, naics_prefixes=naics_prefixes, states=states):
+            batch.append(contract)
+            if len(batch) >= batch_size:
+                sink(batch)
+                stats['rows_kept'] += len(batch)
+                stats['batches'] += 1
+                batch = []
+        if batch:
+            sink(batch)
+            stats['rows_kept'] += len(batch)
+            stats['batches'] += 1
+        logger.info(f"✅ Streamed {stats['rows_kept']} contracts from bulk file in {stats['batches']} batch(es)")
+        return stats
+
     def _download_and_parse_csv(self, url):
         """Download and parse CSV file from URL"""
         contracts = []
         
         try:
-            logger.info(f"📥 Downloading: {url[:100]}...")
-            response = requests.get(url, timeout=120)
-            
-            if response.status_code == 200:
-                # Handle potential zip files
-                if url.endswith('.zip'):
-                    zip_file = zipfile.ZipFile(io.BytesIO(response.content))
-                    csv_filename = zip_file.namelist()[0]
-                    csv_content = zip_file.read(csv_filename).decode('utf-8')
-                else:
-                    csv_content = response.text
-                
-                # Parse CSV
-                reader = csv.DictReader(io.StringIO(csv_content))
-                
-                for row in reader:
-                    contract = self._parse_usaspending_row(row)
-                    if contract:
-                        contracts.append(contract)
-                        
-                logger.info(f"✅ Parsed {len(contracts)} contracts from CSV")
-            else:
-                logger.error(f"❌ Error downloading file: {response.status_code}")
-                
+            # Parsed incrementally; only rows for our NAICS codes are kept
+            contracts = list(self.iter_bulk_contracts(url))
+            logger.info(f"✅ Parsed {len(contracts)} contracts from CSV")
         except Exception as e:
             logger.error(f"❌ Error parsing CSV: {e}")
         
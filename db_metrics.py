@@ -0,0 +1,129 @@
+"""
+Per-request database metrics
+Counts the statements, time and pool checkouts each request spends in the
+database, returns them to the client as X-DB-Queries / Server-Timing headers
+and keeps per-endpoint aggregates for /admin/db-request-stats, so a handler
+that starts issuing extra round trips shows up as a regression.
+
+Also builds the SQLAlchemy pool options (SQLALCHEMY_ENGINE_OPTIONS).
+
+Configuration (environment):
+    DB_POOL_SIZE          persistent connections per process (default: 5, PostgreSQL only)
+    DB_MAX_OVERFLOW       extra connections under load (default: 5, PostgreSQL only)
+    DB_POOL_TIMEOUT       seconds to wait for a free connection (default: 10)
+    DB_POOL_RECYCLE       reconnect connections older than this (default: 280, below
+                          typical server/proxy idle timeouts)
+    DB_POOL_PRE_PING      test connections on checkout (default: 1)
+    DB_QUERY_HEADERS      send X-DB-Queries / Server-Timing headers (default: 1)
+    DB_QUERY_WARN         log requests running more statements than this (default: 40)
+"""
+import os
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+QUERY_HEADERS = os.environ.get('DB_QUERY_HEADERS', '1') == '1'
+QUERY_WARN = int(os.environ.get('DB_QUERY_WARN', 40))
+
+
+def engine_options(database_uri):
+    """Pool configuration for SQLALCHEMY_ENGINE_OPTIONS."""
+    options = {
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') == '1',
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 280)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    }
+    if database_uri.startswith(('postgres', 'postgresql')):
+        options['pool_size'] = int(os.environ.get('DB_POOL_SIZE', 5))
+        options['max_overflow'] = int(os.environ.get('DB_MAX_OVERFLOW', 5))
+    return options
+
+
+class DBRequestMetrics:
+    """Statement/time/checkout counters per request, aggregated per endpoint (this process only)."""
+
+    def __init__(self, warn_threshold=None, headers=None):
+        self.warn_threshold = QUERY_WARN if warn_threshold is None else warn_threshold
+        self.headers = QUERY_HEADERS if headers is None else headers
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def init_app(self, app, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+        event.listen(engine, 'checkout', self._checkout)
+        app.after_request(self._finish_request)
+
+    @staticmethod
+    def _current():
+        """[statements, seconds, checkouts] for the active request, or None outside one."""
+        if not has_request_context():
+            return None
+        stats = g.get('_db_stats')
+        if stats is None:
+            stats = g._db_stats = [0, 0.0, 0]
+        return stats
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        stats = self._current()
+        if stats is None:
+            return
+        started = conn.info.get('_query_started')
+        stats[0] += 1
+        if started:
+            stats[1] += time.perf_counter() - started.pop()
+
+    def _checkout(self, dbapi_connection, connection_record, connection_proxy):
+        stats = self._current()
+        if stats is not None:
+            stats[2] += 1
+
+    def _finish_request(self, response):
+        statements, seconds, checkouts = g.get('_db_stats') or (0, 0.0, 0)
+        endpoint = request.endpoint or 'unknown'
+        self.record(endpoint, statements, seconds, checkouts)
+        if self.headers:
+            response.headers['X-DB-Queries'] = str(statements)
+            response.headers.add('Server-Timing', f'db;dur={seconds * 1000:.1f};desc="{statements} queries"')
+        if self.warn_threshold and statements > self.warn_threshold:
+            print(f"⚠️  {endpoint} ran {statements} database statements ({seconds * 1000:.0f} ms)")
+        return response
+
+    def record(self, endpoint, statements, seconds, checkouts):
+        with self._lock:
+            entry = self._endpoints.setdefault(endpoint, {'requests': 0, 'statements': 0, 'max_statements': 0,
+                                                          'db_seconds': 0.0, 'checkouts': 0,
+                                                          'no_db_requests': 0})
+            entry['requests'] += 1
+            entry['statements'] += statements
+            entry['max_statements'] = max(entry['max_statements'], statements)
+            entry['db_seconds'] += seconds
+            entry['checkouts'] += checkouts
+            if not checkouts:
+                entry['no_db_requests'] += 1
+
+    def stats(self):
+        """Per-endpoint averages, busiest endpoints first."""
+        with self._lock:
+            items = [(name, dict(entry)) for name, entry in self._endpoints.items()]
+        result = {}
+        for name, entry in sorted(items, key=lambda item: -item[1]['statements']):
+            requests = entry['requests']
+            entry['avg_statements'] = round(entry['statements'] / requests, 2)
+            entry['avg_db_ms'] = round(entry['db_seconds'] * 1000 / requests, 2)
+            entry['db_seconds'] = round(entry['db_seconds'], 3)
+            result[name] = entry
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+db_request_metrics = DBRequestMetrics()
@@ -0,0 +1,259 @@
+"""
+Per-subscriber digest matching
+The daily briefing sent the same ten leads to every subscriber, and
+per-subscriber matching (the Django digest task's get_relevant_rfps_for_user)
+costs a query per user. DigestIndex inverts the problem: every subscriber
+filter - an alert-enabled saved search, else the subscriber's preferences,
+else "everything" - is indexed once by the values it asks for:
+
+    state 'VA'      -> {filters that want VA}
+    NAICS '5617'    -> {filters that want 5617*}
+    category        -> {filters that want it}
+    keyword 'floor' -> {filters that want it}   (one KeywordMatcher for all)
+
+A new lead is matched by looking up its own state, NAICS prefixes, category
+and keyword hits; a filter matches when it was hit on every facet it
+constrains and the lead meets its minimum value. Filters that constrain no
+facet sit in one list sorted by minimum value and are answered with a bisect.
+Work per lead is proportional to the filters it actually hits, so generating
+the digests for a batch scales with the new leads, not users x queries.
+
+Accepted filter keys (saved search JSON / preference columns):
+  states, state, locations, location              two-letter state codes
+  naics, naics_codes, naics_code                  codes or prefixes
+  categories, category, lead_types, contract_types
+  min_value, min_contract_value, minimum_contract_value
+  keywords, keyword, q, query
+Lists may be JSON arrays, Python lists or comma-separated strings; location
+values that are not state codes (city names) are ignored.
+"""
+import json
+import re
+from bisect import bisect_right
+from collections import namedtuple
+
+from sqlalchemy import text
+
+from keyword_matcher import KeywordMatcher
+
+SubscriberFilter = namedtuple('SubscriberFilter', 'email name states naics categories min_value keywords')
+LeadFields = namedtuple('LeadFields', 'state naics category value text')
+
+_FILTER_KEYS = {
+    'states': ('states', 'state', 'locations', 'location', 'preferred_locations', 'preferred_states'),
+    'naics': ('naics', 'naics_codes', 'naics_code'),
+    'categories': ('categories', 'category', 'lead_types', 'contract_types', 'preferred_contract_types',
+                   'preferred_categories'),
+    'min_value': ('min_value', 'min_contract_value', 'minimum_contract_value'),
+    'keywords': ('keywords', 'keyword', 'q', 'query'),
+}
+
+_STATE_RE = re.compile(r'\b([A-Z]{2})\b')
+_NUMBER_RE = re.compile(r'(\d+(?:\.\d+)?)\s*([kKmM])?')
+
+
+def _as_list(value):
+    if value is None or value == '':
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return [v for v in value if v not in (None, '')]
+    if isinstance(value, str):
+        stripped = value.strip()
+        if stripped.startswith('['):
+            try:
+                return _as_list(json.loads(stripped))
+            except ValueError:
+                pass
+        return [part.strip() for part in stripped.split(',') if part.strip()]
+    return [value]
+
+
+def parse_value(value):
+    """Dollar amount from a number or text like '$1,250,000', '250K' or '$50K - $100K' (lower bound)."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    m = _NUMBER_RE.search(str(value).replace(',', ''))
+    if not m:
+        return None
+    amount = float(m.group(1))
+    suffix = (m.group(2) or '').lower()
+    return amount * (1000 if suffix == 'k' else 1000000 if suffix == 'm' else 1)
+
+
+def parse_filters(email, filters, name=None):
+    """SubscriberFilter from a saved search / preferences mapping."""
+    if isinstance(filters, str):
+        try:
+            filters = json.loads(filters) if filters else {}
+        except ValueError:
+            filters = {}
+    filters = filters or {}
+
+    def values(field):
+        found = []
+        for key in _FILTER_KEYS[field]:
+            found.extend(_as_list(filters.get(key)))
+        return found
+
+    states = {str(v).strip().upper() for v in values('states')}
+    min_values = [parse_value(v) for v in values('min_value')]
+    return SubscriberFilter(
+        email=email,
+        name=name,
+        states=tuple(sorted(s for s in states if len(s) == 2 and s.isalpha())),
+        naics=tuple(sorted({re.sub(r'\D', '', str(v)) for v in values('naics')} - {''})),
+        categories=tuple(sorted({str(v).strip().lower() for v in values('categories')})),
+        min_value=max([v for v in min_values if v] or [0]),
+        keywords=tuple(sorted({str(v).strip().lower() for v in values('keywords')} - {''})),
+    )
+
+
+def subscriber_filters(emails, saved_searches=(), preferences=()):
+    """One or more filters per subscriber.
+
+    saved_searches: (email, name, filters) rows with alerts enabled;
+    preferences: (email, {column: value}) rows. A subscriber's saved searches
+    win over their preferences; with neither, they get every lead.
+    """
+    emails = list(dict.fromkeys(e for e in emails if e))
+    wanted = set(emails)
+    by_email = {}
+    for email, name, filters in saved_searches:
+        if email in wanted:
+            by_email.setdefault(email, []).append(parse_filters(email, filters, name=name))
+    for email, columns in preferences:
+        if email in wanted and email not in by_email:
+            parsed = parse_filters(email, columns, name='preferences')
+            if parsed.states or parsed.naics or parsed.categories or parsed.min_value or parsed.keywords:
+                by_email[email] = [parsed]
+    result = []
+    for email in emails:
+        result.extend(by_email.get(email) or [parse_filters(email, {})])
+    return result
+
+
+def load_subscriber_filters(session, emails):
+    """subscriber_filters() for these subscribers from saved_searches and user_preferences."""
+    saved = []
+    try:
+        saved = [(row.user_email, row.search_name, row.search_filters) for row in session.execute(text('''
+            SELECT user_email, search_name, search_filters FROM saved_searches
+            WHERE alert_enabled = TRUE ORDER BY id'''))]
+    except Exception as e:
+        session.rollback()
+        print(f"⚠️  Saved searches unavailable for digests: {e}")
+    preferences = []
+    try:
+        preferences = [(row.user_email, dict(row._mapping)) for row in session.execute(text('''
+            SELECT user_email, preferred_locations, preferred_contract_types, min_contract_value
+            FROM user_preferences'''))]
+    except Exception:
+        # Older deployments created user_preferences without these columns
+        session.rollback()
+    return subscriber_filters(emails, saved, preferences)
+
+
+def lead_fields(lead):
+    """LeadFields for a lead dict (federal_contracts rows, briefing leads, new-lead notifications)."""
+    get = lead.get
+    state = (get('state') or '').strip().upper()
+    if len(state) != 2:
+        found = _STATE_RE.findall(str(get('location') or ''))
+        state = found[-1] if found else None
+    naics = []
+    for key in ('naics', 'naics_code', 'naics_codes'):
+        naics.extend(re.sub(r'\D', '', str(v)) for v in _as_list(get(key)))
+    category = get('category') or get('lead_type')
+    value = None
+    for key in ('estimated_value', 'value', 'monthly_value', 'contract_value'):
+        value = parse_value(get(key))
+        if value is not None:
+            break
+    words = ' '.join(str(get(key)) for key in ('title', 'project', 'business_name', 'business_type', 'agency',
+                                               'description', 'services_needed') if get(key))
+    return LeadFields(state, tuple(n for n in naics if n), (category or '').strip().lower() or None, value, words)
+
+
+class DigestIndex:
+    """Subscriber filters indexed by the values they ask for."""
+
+    FACETS = ('states', 'naics', 'categories', 'keywords')
+
+    def __init__(self, filters):
+        self.filters = list(filters)
+        self._facets = {facet: {} for facet in self.FACETS}
+        self._required = []
+        open_filters = []
+        for fid, f in enumerate(self.filters):
+            required = 0
+            for facet in self.FACETS:
+                values = getattr(f, facet)
+                if values:
+                    required += 1
+                    for value in values:
+                        self._facets[facet].setdefault(value, []).append(fid)
+            self._required.append(required)
+            if not required:
+                open_filters.append((f.min_value or 0, fid))
+        open_filters.sort()
+        self._open_values = [value for value, _ in open_filters]
+        self._open_ids = [fid for _, fid in open_filters]
+        keywords = list(self._facets['keywords'])
+        self._keywords = KeywordMatcher(keywords) if keywords else None
+
+    def __len__(self):
+        return len(self.filters)
+
+    def match(self, fields):
+        """Ids of the filters a lead (LeadFields) satisfies."""
+        value = fields.value
+        # Unconstrained filters: everything up to the lead's value
+        upto = bisect_right(self._open_values, value if value is not None else 0)
+        matched = set(self._open_ids[:upto])
+
+        hits = {}
+        lookups = (
+            ('states', (fields.state,) if fields.state else ()),
+            ('naics', {code[:n] for code in fields.naics for n in range(2, len(code) + 1)}),
+            ('categories', (fields.category,) if fields.category else ()),
+            ('keywords', self._keywords.found(fields.text) if self._keywords and fields.text else ()),
+        )
+        for facet, values in lookups:
+            index = self._facets[facet]
+            facet_hits = set()
+            for v in values:
+                facet_hits.update(index.get(v, ()))
+            for fid in facet_hits:
+                hits[fid] = hits.get(fid, 0) + 1
+        for fid, count in hits.items():
+            if count == self._required[fid]:
+                minimum = self.filters[fid].min_value
+                if not minimum or (value is not None and value >= minimum):
+                    matched.add(fid)
+        return matched
+
+    def digests(self, leads, fields=lead_fields):
+        """{email: [matching leads in input order]} for subscribers with at least one match."""
+        result = {}
+        for lead in leads:
+            emails = {self.filters[fid].email for fid in self.match(fields(lead))}
+            for email in emails:
+                result.setdefault(email, []).append(lead)
+        return result
+
+
+def group_digests(digests):
+    """[(leads, emails)]: subscribers with identical digests grouped so each is rendered once."""
+    groups = {}
+    for email, leads in digests.items():
+        key = tuple(id(lead) for lead in leads)
+        if key not in groups:
+            groups[key] = (leads, [])
+        groups[key][1].append(email)
+    return list(groups.values())
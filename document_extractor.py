@@ -89,6 +89,62 @@ def extract_text_from_file(file_path):
     except Exception as e:
         return False, "", f"Extraction error: {str(e)}"
 
+def count_pages(file_path):
+    """Number of extraction pages in a file (PDF pages; DOCX and TXT are one page)"""
+    if Path(file_path).suffix.lower() != '.pdf':
+        return 1
+    try:
+        import PyPDF2
+        with open(file_path, 'rb') as file:
+            return len(PyPDF2.PdfReader(file).pages)
+    except ImportError:
+        import pdfplumber
+        with pdfplumber.open(file_path) as pdf:
+            return len(pdf.pages)
+
+def _page_text(page):
+    try:
+        return (page.extract_text() or '').strip()
+    except Exception as e:
+        # One unreadable page should not lose the rest of the document
+        print(f"Error extracting PDF page: {e}")
+        return ''
+
+def extract_page_range(file_path, start, stop):
+    """
+    Extract pages [start, stop) of a document as a list of strings
+    Used by document_pipeline in worker processes, so unlike the helpers above
+    errors are raised instead of being returned as text.
+    """
+    file_ext = Path(file_path).suffix.lower()
+    if file_ext == '.pdf':
+        try:
+            import PyPDF2
+            with open(file_path, 'rb') as file:
+                pages = PyPDF2.PdfReader(file).pages
+                return [_page_text(pages[i]) for i in range(start, min(stop, len(pages)))]
+        except ImportError:
+            import pdfplumber
+            with pdfplumber.open(file_path) as pdf:
+                return [_page_text(pdf.pages[i]) for i in range(start, min(stop, len(pdf.pages)))]
+    if start > 0:
+        return []
+    if file_ext == '.docx':
+        from docx import Document
+        return ["\n".join(paragraph.text for paragraph in Document(file_path).paragraphs).strip()]
+    if file_ext == '.doc':
+        # python-docx can't open legacy Word files; keep the readable runs of a raw read
+        with open(file_path, 'r', errors='ignore') as file:
+            return [file.read().strip()]
+    if file_ext == '.txt':
+        try:
+            with open(file_path, 'r', encoding='utf-8') as file:
+                return [file.read().strip()]
+        except UnicodeDecodeError:
+            with open(file_path, 'r', encoding='latin-1') as file:
+                return [file.read().strip()]
+    raise ValueError(f"Unsupported file format: {file_ext}")
+
 def clean_extracted_text(text, max_length=50000):
     """
     Clean and normalize extracted text
@@ -0,0 +1,311 @@
+"""
+Asynchronous document extraction
+Bid documents, RFP uploads and capability statements used to be parsed inside
+the upload request, holding a gunicorn worker for as long as PyPDF2 took over
+a large RFP. Upload handlers now store the file and call request_extraction():
+
+- the file is hashed (SHA-256); if that content was extracted before, the
+  stored pages are reused and the upload costs one query;
+- otherwise a document_extractions row is queued together with an
+  'extract_document' background job (job_queue). The job parses the file in a
+  process pool, a batch of pages per task, and writes each batch to
+  document_pages (page number + character offset into the joined text) as it
+  arrives, so status polls see pages_done grow and a retry after a crash
+  starts from a clean slate.
+
+Rows that reference an upload by file_hash (user_bid_documents,
+capability_statements) get their text column filled in by fill_document_text()
+once the job finishes; upload handlers insert that row before calling
+request_extraction() so the job cannot finish first.
+
+Every user who uploads a given content is recorded in document_uploaders, and
+only they (or an admin) can read its status and text - see
+can_read_extraction().
+
+Parser processes are started with forkserver (spawn where that is missing), so
+they never inherit a forked copy of the web worker's threads, locks or
+database connections.
+
+Configuration (environment):
+    DOCUMENT_EXTRACT_PROCESSES   parser processes per web/worker process (default: 2,
+                                 0 = parse in the job thread)
+    DOCUMENT_PAGE_BATCH          pages per parser task and per commit (default: 10)
+    DOCUMENT_BATCH_TIMEOUT       seconds allowed for one batch (default: 120)
+    DOCUMENT_TEXT_MAX_CHARS      text copied into the referencing rows (default: 50000)
+"""
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import text
+
+from document_extractor import clean_extracted_text, count_pages, extract_page_range
+from job_queue import ACTIVE_STATUSES, DONE, FAILED, get_job, submit_job
+
+JOB_KIND = 'extract_document'
+
+EXTRACT_PROCESSES = int(os.environ.get('DOCUMENT_EXTRACT_PROCESSES', 2))
+PAGE_BATCH = max(1, int(os.environ.get('DOCUMENT_PAGE_BATCH', 10)))
+BATCH_TIMEOUT = int(os.environ.get('DOCUMENT_BATCH_TIMEOUT', 120))
+TEXT_MAX_CHARS = int(os.environ.get('DOCUMENT_TEXT_MAX_CHARS', 50000))
+
+# Pages are joined with this separator; char_offset accounts for it
+PAGE_SEPARATOR = '\n'
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def ensure_document_tables(session):
+    """Create document_extractions / document_pages (idempotent)."""
+    try:
+        session.execute(text('''CREATE TABLE IF NOT EXISTS document_extractions
+                     (file_hash TEXT PRIMARY KEY,
+                      file_ext TEXT,
+                      status TEXT NOT NULL DEFAULT 'queued',
+                      job_id TEXT,
+                      page_count INTEGER,
+                      pages_done INTEGER DEFAULT 0,
+                      char_count INTEGER DEFAULT 0,
+                      error TEXT,
+                      created_at TIMESTAMP,
+                      finished_at TIMESTAMP)'''))
+        session.execute(text('''CREATE TABLE IF NOT EXISTS document_pages
+                     (file_hash TEXT NOT NULL,
+                      page_no INTEGER NOT NULL,
+                      char_offset INTEGER NOT NULL,
+                      text TEXT,
+                      PRIMARY KEY (file_hash, page_no))'''))
+        session.execute(text('''CREATE TABLE IF NOT EXISTS document_uploaders
+                     (file_hash TEXT NOT NULL,
+                      user_email TEXT NOT NULL,
+                      PRIMARY KEY (file_hash, user_email))'''))
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        print(f"⚠️  Document extraction tables init error: {e}")
+        return False
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_extraction(session, file_hash):
+    """Extraction status as a dict, or None if this content was never submitted."""
+    row = session.execute(text('''SELECT file_hash, file_ext, status, job_id, page_count, pages_done, char_count,
+                                         error, created_at, finished_at
+                                  FROM document_extractions WHERE file_hash = :hash'''),
+                          {'hash': file_hash}).fetchone()
+    return dict(row._mapping) if row is not None else None
+
+
+def can_read_extraction(session, file_hash, user_email):
+    """True if user_email uploaded this content (admins are checked by the caller)."""
+    if not user_email:
+        return False
+    return session.execute(text('''SELECT 1 FROM document_uploaders
+                                   WHERE file_hash = :hash AND user_email = :email'''),
+                           {'hash': file_hash, 'email': user_email}).first() is not None
+
+
+def _record_uploader(session, file_hash, user_email):
+    if not user_email:
+        return
+    session.execute(text('''INSERT INTO document_uploaders (file_hash, user_email) VALUES (:hash, :email)
+                            ON CONFLICT (file_hash, user_email) DO NOTHING'''),
+                    {'hash': file_hash, 'email': user_email})
+    session.commit()
+
+
+def extraction_text(session, file_hash, max_chars=None):
+    """Joined page text of a finished extraction ('' if none)."""
+    params = {'hash': file_hash}
+    limit = ''
+    if max_chars:
+        # Only the pages that start inside the requested prefix
+        limit = ' AND char_offset < :max_chars'
+        params['max_chars'] = max_chars
+    rows = session.execute(text(f'''SELECT text FROM document_pages WHERE file_hash = :hash{limit}
+                                    ORDER BY page_no'''), params).fetchall()
+    joined = PAGE_SEPARATOR.join(row.text or '' for row in rows)
+    return joined[:max_chars] if max_chars else joined
+
+
+def request_extraction(session, path, user_email=None, file_hash=None):
+    """Reuse or queue the extraction of a stored upload; returns its status dict (commits).
+
+    A failed extraction, or one whose job died, is queued again with this path.
+    """
+    file_hash = file_hash or file_sha256(path)
+    _record_uploader(session, file_hash, user_email)
+    existing = get_extraction(session, file_hash)
+    if existing is not None:
+        if existing['status'] == DONE:
+            return existing
+        if existing['status'] in ACTIVE_STATUSES and existing['job_id']:
+            job = get_job(session, existing['job_id'])
+            if job is not None and job['status'] in ACTIVE_STATUSES:
+                return existing
+
+    params = {'file_hash': file_hash, 'path': path}
+    if existing is None:
+        try:
+            session.execute(text('''INSERT INTO document_extractions (file_hash, file_ext, status, created_at)
+                                    VALUES (:hash, :ext, 'queued', :now)'''),
+                            {'hash': file_hash, 'ext': Path(path).suffix.lower(), 'now': datetime.utcnow()})
+            session.commit()
+        except Exception:
+            # Same content uploaded concurrently; the other request queued it
+            session.rollback()
+            return get_extraction(session, file_hash) or request_extraction(session, path, user_email, file_hash)
+
+    job_id = submit_job(session, JOB_KIND, params, user_email=user_email, dedupe_key=f'{JOB_KIND}:{file_hash}')
+    session.execute(text('''UPDATE document_extractions
+                            SET status = 'queued', job_id = :job, error = NULL, file_ext = :ext
+                            WHERE file_hash = :hash AND status != 'done' '''),
+                    {'job': job_id, 'ext': Path(path).suffix.lower(), 'hash': file_hash})
+    session.commit()
+    return get_extraction(session, file_hash)
+
+
+def _executor(processes=None):
+    """This process's parser pool (created lazily, recreated after a fork), or None to parse inline."""
+    global _pool, _pool_pid
+    processes = EXTRACT_PROCESSES if processes is None else processes
+    if processes <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context(method))
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _reset_executor():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _submit(pool, fn, *args):
+    if pool is not None:
+        return pool.submit(fn, *args)
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def run_extraction(session, file_hash, path, progress=None, processes=None, batch=None, timeout=None):
+    """Parse a file into document_pages, committing each batch of pages as it completes.
+
+    Up to two batches per parser process are in flight; they are written in page
+    order. Returns {file_hash, page_count, char_count}; raises (after marking the
+    extraction failed) if the file cannot be parsed.
+    """
+    batch = batch or PAGE_BATCH
+    timeout = BATCH_TIMEOUT if timeout is None else timeout
+    processes = EXTRACT_PROCESSES if processes is None else processes
+    pool = _executor(processes)
+    session.execute(text('''UPDATE document_extractions SET status = 'running', pages_done = 0, char_count = 0,
+                                   error = NULL WHERE file_hash = :hash'''), {'hash': file_hash})
+    # A retried job rewrites the pages from scratch
+    session.execute(text('DELETE FROM document_pages WHERE file_hash = :hash'), {'hash': file_hash})
+    session.commit()
+    try:
+        page_count = _submit(pool, count_pages, path).result(timeout=timeout)
+        session.execute(text('UPDATE document_extractions SET page_count = :count WHERE file_hash = :hash'),
+                        {'count': page_count, 'hash': file_hash})
+        session.commit()
+
+        starts = list(range(0, page_count, batch))
+        window = max(2, 2 * processes)
+        pending = [_submit(pool, extract_page_range, path, start, start + batch) for start in starts[:window]]
+        next_start = len(pending)
+        page_no = 0
+        offset = 0
+        while pending:
+            pages = pending.pop(0).result(timeout=timeout)
+            if next_start < len(starts):
+                pending.append(_submit(pool, extract_page_range, path, starts[next_start], starts[next_start] + batch))
+                next_start += 1
+            for page_text in pages:
+                session.execute(text('''INSERT INTO document_pages (file_hash, page_no, char_offset, text)
+                                        VALUES (:hash, :page, :offset, :text)'''),
+                                {'hash': file_hash, 'page': page_no, 'offset': offset, 'text': page_text})
+                offset += len(page_text) + len(PAGE_SEPARATOR)
+                page_no += 1
+            char_count = max(offset - len(PAGE_SEPARATOR), 0)
+            session.execute(text('''UPDATE document_extractions SET pages_done = :done, char_count = :chars
+                                    WHERE file_hash = :hash'''),
+                            {'done': page_no, 'chars': char_count, 'hash': file_hash})
+            session.commit()
+            if progress is not None:
+                progress(pages_done=page_no, page_count=page_count)
+
+        session.execute(text('''UPDATE document_extractions SET status = 'done', page_count = :count,
+                                       finished_at = :now WHERE file_hash = :hash'''),
+                        {'count': page_no, 'now': datetime.utcnow(), 'hash': file_hash})
+        session.commit()
+        return {'file_hash': file_hash, 'page_count': page_no, 'char_count': max(offset - len(PAGE_SEPARATOR), 0)}
+    except Exception as e:
+        session.rollback()
+        if isinstance(e, BrokenProcessPool):
+            _reset_executor()
+        session.execute(text('''UPDATE document_extractions SET status = 'failed', error = :error,
+                                       finished_at = :now WHERE file_hash = :hash'''),
+                        {'error': (str(e) or e.__class__.__name__)[:500], 'now': datetime.utcnow(),
+                         'hash': file_hash})
+        session.commit()
+        raise
+
+
+def fill_document_text(session, file_hash, targets, max_chars=None):
+    """Copy the cleaned text into each (table, column) row with this file_hash that has none yet."""
+    max_chars = TEXT_MAX_CHARS if max_chars is None else max_chars
+    cleaned = clean_extracted_text(extraction_text(session, file_hash, max_chars), max_chars)
+    for table, column in targets:
+        try:
+            session.execute(text(f'''UPDATE {table} SET {column} = :text
+                                     WHERE file_hash = :hash AND ({column} IS NULL OR {column} = '')'''),
+                            {'text': cleaned, 'hash': file_hash})
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"⚠️  Could not store extracted text in {table}: {e}")
+    return cleaned
+
+
+def extraction_payload(extraction):
+    """JSON-friendly status for upload responses and /api/documents/<hash>."""
+    if extraction is None:
+        return {'status': FAILED, 'error': 'Document not found'}
+    payload = {
+        'file_hash': extraction['file_hash'],
+        'status': extraction['status'],
+        'page_count': extraction['page_count'],
+        'pages_done': extraction['pages_done'] or 0,
+        'char_count': extraction['char_count'] or 0,
+        'job_id': extraction['job_id'],
+    }
+    if extraction['status'] == FAILED:
+        payload['error'] = extraction['error'] or 'Text extraction failed'
+    return payload
+
@@ -2,11 +2,10 @@
 # Handles transactional emails for password resets, admin notifications, etc.
 
 import os
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 
+from mail_dispatcher import mail_dispatcher
+
 def send_email(to_email, subject, html_content, text_content=None):
     """
     Send an email using SMTP configuration from environment variables
@@ -18,46 +17,11 @@ def send_email(to_email, subject, html_content, text_content=None):
         text_content: Plain text email body (optional, falls back to HTML)
     
     Returns:
-        bool: True if email sent successfully, False otherwise
+        bool: True if email was queued (or sent), False otherwise
     """
-    try:
-        # Get SMTP settings from environment
-        smtp_host = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
-        smtp_port = int(os.getenv('EMAIL_PORT', '587'))
-        smtp_user = os.getenv('EMAIL_USER')
-        smtp_password = os.getenv('EMAIL_PASSWORD')
-        from_email = os.getenv('EMAIL_FROM', smtp_user)
-        from_name = os.getenv('EMAIL_FROM_NAME', 'ContractLink AI')
-        
-        if not smtp_user or not smtp_password:
-            print("Warning: EMAIL_USER or EMAIL_PASSWORD not configured. Email not sent.")
-            return False
-        
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = f"{from_name} <{from_email}>"
-        msg['To'] = to_email
-        
-        # Add plain text and HTML parts
-        if text_content:
-            part1 = MIMEText(text_content, 'plain')
-            msg.attach(part1)
-        
-        part2 = MIMEText(html_content, 'html')
-        msg.attach(part2)
-        
-        # Send email
-        with smtplib.SMTP(smtp_host, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_password)
-            server.send_message(msg)
-        
-        return True
-        
-    except Exception as e:
-        print(f"Error sending email to {to_email}: {e}")
-        return False
+    # Queued through the shared SMTP pool (EMAIL_HOST/EMAIL_USER/EMAIL_PASSWORD
+    # settings, 'notifications' provider); True once the message is queued
+    return mail_dispatcher.send(to_email, subject, html=html_content, body=text_content, provider='notifications')
 
 
 def send_password_reset_email(user_email, new_password, admin_email):
@@ -251,59 +215,60 @@ def send_proposal_review_notification(admin_emails, proposal_data):
     """
     subject = f"New Proposal Review Request - {proposal_data.get('contract_title', 'Untitled')[:50]}"
     
-    for admin_email in admin_emails:
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
-                .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }}
-                .info-box {{ background: white; border-left: 4px solid #667eea; padding: 15px; margin: 15px 0; }}
-                .label {{ font-weight: bold; color: #667eea; }}
-                .urgent {{ background: #fff3cd; border-left-color: #ffc107; }}
-                .button {{ display: inline-block; background: #667eea; color: white; padding: 12px 30px; text-decoration: none; border-radius: 5px; margin: 20px 0; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>📝 Proposal Review Request</h1>
-                </div>
-                <div class="content">
-                    <p>A client has requested proposal review assistance:</p>
-                    
-                    <div class="info-box {('urgent' if proposal_data.get('urgency') == 'high' else '')}">
-                        <p><span class="label">Client:</span> {proposal_data.get('client_name', 'N/A')}</p>
-                        <p><span class="label">Email:</span> {proposal_data.get('client_email', 'N/A')}</p>
-                        <p><span class="label">Contract:</span> {proposal_data.get('contract_title', 'N/A')}</p>
-                        <p><span class="label">Due Date:</span> {proposal_data.get('due_date', 'N/A')}</p>
-                        <p><span class="label">Urgency:</span> {proposal_data.get('urgency', 'normal').upper()}</p>
-                    </div>
-                    
-                    <p><span class="label">Request Details:</span><br>{proposal_data.get('review_notes', 'No additional notes provided.')}</p>
-                    
-                    <p style="text-align: center;">
-                        <a href="{os.getenv('APP_URL', 'https://contractlink.ai')}/admin-enhanced?section=proposals" class="button">
-                            View Proposal Request
-                        </a>
-                    </p>
-                    
-                    <p><strong>Action Required:</strong></p>
-                    <ul>
-                        <li>Review the proposal submission</li>
-                        <li>Contact client to schedule review session</li>
-                        <li>Provide feedback within 48 hours</li>
-                    </ul>
+    # The same content for every specialist: rendered once, queued as one message
+    html_content = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+            .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
+            .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }}
+            .info-box {{ background: white; border-left: 4px solid #667eea; padding: 15px; margin: 15px 0; }}
+            .label {{ font-weight: bold; color: #667eea; }}
+            .urgent {{ background: #fff3cd; border-left-color: #ffc107; }}
+            .button {{ display: inline-block; background: #667eea; color: white; padding: 12px 30px; text-decoration: none; border-radius: 5px; margin: 20px 0; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>📝 Proposal Review Request</h1>
+            </div>
+            <div class="content">
+                <p>A client has requested proposal review assistance:</p>
+                
+                <div class="info-box {('urgent' if proposal_data.get('urgency') == 'high' else '')}">
+                    <p><span class="label">Client:</span> {proposal_data.get('client_name', 'N/A')}</p>
+                    <p><span class="label">Email:</span> {proposal_data.get('client_email', 'N/A')}</p>
+                    <p><span class="label">Contract:</span> {proposal_data.get('contract_title', 'N/A')}</p>
+                    <p><span class="label">Due Date:</span> {proposal_data.get('due_date', 'N/A')}</p>
+                    <p><span class="label">Urgency:</span> {proposal_data.get('urgency', 'normal').upper()}</p>
                 </div>
+                
+                <p><span class="label">Request Details:</span><br>{proposal_data.get('review_notes', 'No additional notes provided.')}</p>
+                
+                <p style="text-align: center;">
+                    <a href="{os.getenv('APP_URL', 'https://contractlink.ai')}/admin-enhanced?section=proposals" class="button">
+                        View Proposal Request
+                    </a>
+                </p>
+                
+                <p><strong>Action Required:</strong></p>
+                <ul>
+                    <li>Review the proposal submission</li>
+                    <li>Contact client to schedule review session</li>
+                    <li>Provide feedback within 48 hours</li>
+                </ul>
             </div>
-        </body>
-        </html>
-        """
-        
-        send_email(admin_email, subject, html_content)
+        </div>
+    </body>
+    </html>
+    """
+
+    mail_dispatcher.send_batch(admin_emails, subject, html=html_content, provider='notifications',
+                               segment='proposal_review')
 
 
 # Export all notification functions
@@ -0,0 +1,103 @@
+"""
+Per-user entitlements
+The subscription status, active plan and unread message count that page
+handlers, access decorators and the template context processor each used to
+query separately are loaded in one round trip, cached per user for a short
+TTL in app_cache, and memoized for the rest of the request in flask.g (see
+current_entitlements() in app.py).
+
+Cached entries are tagged entitlements:<user_id> (and entitlements), so
+payment webhooks, cancellations and admin changes drop them in every worker
+through invalidate_entitlements().
+
+Configuration (environment):
+    ENTITLEMENT_CACHE_SECONDS   per-user cache TTL (default: 60, 0 = no cache)
+"""
+import os
+
+from sqlalchemy import text
+
+CACHE_SECONDS = int(os.environ.get('ENTITLEMENT_CACHE_SECONDS', 60))
+
+# Everything a page needs about the signed-in user, in one query
+_ENTITLEMENT_SQL = '''
+    SELECT l.subscription_status,
+           (SELECT s.plan_type FROM subscriptions s
+            WHERE s.email = :email AND s.status = 'active'
+            ORDER BY s.created_at DESC LIMIT 1) AS plan_type,
+           (SELECT COUNT(*) FROM messages m
+            WHERE m.recipient_id = l.id AND (m.is_read = FALSE OR m.is_read IS NULL)) AS unread_messages
+    FROM leads l WHERE l.id = :user_id
+'''
+
+
+def entitlement_tag(user_id=None):
+    return f'entitlements:{user_id}' if user_id is not None else 'entitlements'
+
+
+class Entitlements:
+    """What the signed-in user (or an anonymous visitor) may see."""
+
+    def __init__(self, user_id=None, email=None, is_admin=False, subscription_status=None, plan_type=None,
+                 unread_messages=0):
+        self.user_id = user_id
+        self.email = email
+        self.is_admin = bool(is_admin)
+        self.subscription_status = subscription_status
+        self.plan_type = plan_type
+        self.unread_messages = unread_messages or 0
+
+    @property
+    def is_authenticated(self):
+        return self.user_id is not None
+
+    @property
+    def is_paid(self):
+        """Admins and paid subscribers get full access."""
+        return self.is_admin or self.subscription_status == 'paid'
+
+    @property
+    def is_annual(self):
+        """Admins and users with an active annual plan."""
+        return self.is_admin or self.plan_type == 'annual'
+
+
+def fetch_entitlement_row(session, user_id, email):
+    """{subscription_status, plan_type, unread_messages} for a user, or None if the user is gone."""
+    try:
+        row = session.execute(text(_ENTITLEMENT_SQL), {'user_id': user_id, 'email': email}).fetchone()
+        if row is None:
+            return None
+        return {'subscription_status': row.subscription_status, 'plan_type': row.plan_type,
+                'unread_messages': row.unread_messages or 0}
+    except Exception as e:
+        # subscriptions/messages missing on a partial schema: fall back to the status alone
+        session.rollback()
+        print(f"⚠️  Entitlement query fallback: {e}")
+    try:
+        row = session.execute(text('SELECT subscription_status FROM leads WHERE id = :user_id'),
+                              {'user_id': user_id}).fetchone()
+    except Exception as e:
+        session.rollback()
+        print(f"⚠️  Entitlement lookup failed: {e}")
+        return None
+    if row is None:
+        return None
+    return {'subscription_status': row[0], 'plan_type': None, 'unread_messages': 0}
+
+
+def load_entitlements(session, cache, user_id=None, email=None, is_admin=False, ttl=None):
+    """Entitlements for a user, served from the per-user cache when fresh."""
+    if user_id is None:
+        return Entitlements(is_admin=is_admin)
+    ttl = CACHE_SECONDS if ttl is None else ttl
+    if ttl <= 0 or cache is None:
+        return Entitlements(user_id, email, is_admin, **(fetch_entitlement_row(session, user_id, email) or {}))
+    key = f'entitlements:{user_id}:{email}'
+    data = cache.get(key)
+    if data is None:
+        data = fetch_entitlement_row(session, user_id, email)
+        if data is not None:
+            # Failed lookups are not cached
+            cache.set(key, data, ttl=ttl, tags=(entitlement_tag(), entitlement_tag(user_id)))
+    return Entitlements(user_id, email, is_admin, **(data or {}))
@@ -0,0 +1,270 @@
+"""
+Buffered analytics event writer
+Activity, lead click/view, search history and admin audit rows used to be
+INSERTed and committed one at a time on the request path - two or three
+commits (and fsyncs) for some pages. Handlers now call event_writer.emit(),
+which appends the row to a bounded in-process buffer and returns; a background
+thread writes the buffer in multi-row batches (COPY on PostgreSQL, a single
+executemany INSERT elsewhere), one transaction per event kind per batch.
+
+The buffer never grows past EVENT_BUFFER_SIZE events. When it is full a new
+event is dropped (EVENT_OVERFLOW=drop) or the caller waits up to
+EVENT_BLOCK_SECONDS for room (EVENT_OVERFLOW=block) and is then dropped;
+events emitted with required=True (the admin audit trail) are written inline
+instead of being dropped. stats() reports the enqueued/written/dropped/blocked/
+failed counters (/admin/event-writer-stats).
+
+Buffered events are flushed when the process exits (atexit, and gunicorn's
+worker_exit hook).
+
+Configuration (environment):
+    EVENT_WRITER_ENABLED   0 = write every event synchronously (scripts, debugging) (default: 1)
+    EVENT_BUFFER_SIZE      events held in memory per process (default: 10000)
+    EVENT_BATCH_SIZE       events written per batch (default: 500)
+    EVENT_FLUSH_SECONDS    max delay before a buffered event is written (default: 2)
+    EVENT_OVERFLOW         'drop' or 'block' when the buffer is full (default: drop)
+    EVENT_BLOCK_SECONDS    longest wait for room under 'block' (default: 0.05)
+"""
+import atexit
+import io
+import os
+import threading
+from collections import deque
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+ENABLED = os.environ.get('EVENT_WRITER_ENABLED', '1') == '1'
+BUFFER_SIZE = int(os.environ.get('EVENT_BUFFER_SIZE', 10000))
+BATCH_SIZE = int(os.environ.get('EVENT_BATCH_SIZE', 500))
+FLUSH_SECONDS = float(os.environ.get('EVENT_FLUSH_SECONDS', 2))
+OVERFLOW = os.environ.get('EVENT_OVERFLOW', 'drop')
+BLOCK_SECONDS = float(os.environ.get('EVENT_BLOCK_SECONDS', 0.05))
+
+
+def _copy_value(value):
+    """Encode one value for COPY ... FROM STDIN (text format)."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat(sep=' ') if isinstance(value, datetime) else value.isoformat()
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+class EventWriter:
+    """Bounded buffer of (kind, row) events written in batches by a daemon thread."""
+
+    def __init__(self, engine=None, capacity=None, batch_size=None, flush_seconds=None, overflow=None,
+                 block_seconds=None, enabled=None):
+        self.engine = engine
+        self.capacity = BUFFER_SIZE if capacity is None else capacity
+        self.batch_size = BATCH_SIZE if batch_size is None else batch_size
+        self.flush_seconds = FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        self.overflow = OVERFLOW if overflow is None else overflow
+        self.block_seconds = BLOCK_SECONDS if block_seconds is None else block_seconds
+        self.enabled = ENABLED if enabled is None else enabled
+        self._tables = {}
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        # Serialises writes between the background thread and flush()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._thread_pid = None
+        self._stopping = False
+        self._counters = {'enqueued': 0, 'written': 0, 'dropped': 0, 'blocked': 0, 'failed': 0, 'inline': 0,
+                          'batches': 0, 'copy_batches': 0}
+        self._last_flush = None
+        self._last_error = None
+
+    def init_app(self, app, engine):
+        self.engine = engine
+        atexit.register(self.close)
+        app.extensions['event_writer'] = self
+
+    def register_table(self, table, columns, timestamp=None, kind=None):
+        """Declare an event kind (default: the table name) and the columns it writes.
+
+        `timestamp` names a column filled with the emit time when not given.
+        """
+        self._tables[kind or table] = (table, tuple(columns), timestamp)
+
+    # -- producer side -----------------------------------------------------
+
+    def emit(self, kind, required=False, **values):
+        """Queue one row of a registered event kind; returns False if it was dropped. Never raises."""
+        try:
+            _table, columns, timestamp = self._tables[kind]
+            if timestamp and values.get(timestamp) is None:
+                values[timestamp] = datetime.utcnow()
+            row = tuple(values.get(column) for column in columns)
+        except Exception as e:
+            print(f"⚠️  Event {kind} rejected: {e}")
+            return False
+
+        if not self.enabled:
+            return self._write_inline(kind, row)
+
+        with self._lock:
+            if len(self._buffer) >= self.capacity and not required and self.overflow == 'block':
+                self._counters['blocked'] += 1
+                self._not_full.wait_for(lambda: len(self._buffer) < self.capacity, timeout=self.block_seconds)
+            if len(self._buffer) >= self.capacity:
+                if not required:
+                    self._counters['dropped'] += 1
+                    return False
+                full = True
+            else:
+                full = False
+                self._buffer.append((kind, row))
+                self._counters['enqueued'] += 1
+                if len(self._buffer) >= self.batch_size:
+                    self._not_empty.notify()
+        if full:
+            # Audit events are not dropped: write this one ourselves
+            return self._write_inline(kind, row)
+        self._ensure_thread()
+        return True
+
+    def _write_inline(self, kind, row):
+        with self._lock:
+            self._counters['inline'] += 1
+        with self._write_lock:
+            return self._write_events([(kind, row)]) == 1
+
+    # -- consumer side -----------------------------------------------------
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread_pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='event-writer', daemon=True)
+            self._thread.start()
+
+    def _take(self, limit):
+        with self._lock:
+            count = min(limit, len(self._buffer))
+            batch = [self._buffer.popleft() for _ in range(count)]
+            if batch:
+                self._not_full.notify_all()
+            return batch
+
+    def _run(self):
+        while True:
+            with self._lock:
+                self._not_empty.wait_for(lambda: self._stopping or len(self._buffer) >= self.batch_size,
+                                         timeout=self.flush_seconds)
+                stopping = self._stopping
+            self._drain()
+            if stopping:
+                return
+
+    def _drain(self):
+        """Write everything buffered right now, a batch at a time; returns rows written."""
+        written = 0
+        with self._write_lock:
+            while True:
+                batch = self._take(self.batch_size)
+                if not batch:
+                    break
+                written += self._write_events(batch)
+        return written
+
+    def _write_events(self, events):
+        by_kind = {}
+        for kind, row in events:
+            by_kind.setdefault(kind, []).append(row)
+        written = 0
+        for kind, rows in by_kind.items():
+            table = self._tables[kind][0]
+            try:
+                used_copy = self._write_rows(table, self._tables[kind][1], rows)
+                written += len(rows)
+                with self._lock:
+                    self._counters['written'] += len(rows)
+                    self._counters['batches'] += 1
+                    if used_copy:
+                        self._counters['copy_batches'] += 1
+            except Exception as e:
+                with self._lock:
+                    self._counters['failed'] += len(rows)
+                    self._last_error = f'{table}: {e}'
+                print(f"⚠️  Event writer could not write {len(rows)} {table} row(s): {e}")
+        self._last_flush = datetime.utcnow()
+        return written
+
+    def _write_rows(self, table, columns, rows):
+        """One transaction per batch; True if it went through COPY."""
+        if self.engine.dialect.name == 'postgresql':
+            try:
+                self._copy_rows(table, columns, rows)
+                return True
+            except Exception as e:
+                print(f"⚠️  COPY into {table} failed, falling back to INSERT: {e}")
+        placeholders = ', '.join(f':{column}' for column in columns)
+        with self.engine.begin() as conn:
+            conn.execute(text(f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({placeholders})'),
+                         [dict(zip(columns, row)) for row in rows])
+        return False
+
+    def _copy_rows(self, table, columns, rows):
+        data = ''.join('\t'.join(_copy_value(value) for value in row) + '\n' for row in rows)
+        sql = f'COPY {table} ({", ".join(columns)}) FROM STDIN'
+        raw = self.engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            if hasattr(cursor, 'copy'):
+                # psycopg 3
+                with cursor.copy(sql) as copy:
+                    copy.write(data)
+            else:
+                # psycopg2
+                cursor.copy_expert(sql, io.StringIO(data))
+            raw.commit()
+        except Exception:
+            raw.rollback()
+            raise
+        finally:
+            raw.close()
+
+    # -- lifecycle -----------------------------------------------------------
+
+    def flush(self):
+        """Write all buffered events now (from the calling thread); returns rows written."""
+        return self._drain()
+
+    def close(self, timeout=10):
+        """Stop the background thread and flush what is left (process shutdown)."""
+        thread = self._thread
+        with self._lock:
+            self._stopping = True
+            self._not_empty.notify_all()
+        if thread is not None and thread.is_alive() and self._thread_pid == os.getpid():
+            thread.join(timeout)
+        if self._buffer and self.engine is not None:
+            self._drain()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['buffered'] = len(self._buffer)
+        stats.update({
+            'capacity': self.capacity,
+            'batch_size': self.batch_size,
+            'flush_seconds': self.flush_seconds,
+            'overflow': self.overflow,
+            'enabled': self.enabled,
+            'writer_alive': bool(self._thread is not None and self._thread.is_alive()),
+            'last_flush': self._last_flush.isoformat() if self._last_flush else None,
+            'last_error': self._last_error,
+        })
+        return stats
+
+
+event_writer = EventWriter()
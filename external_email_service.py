@@ -5,14 +5,12 @@ Secure SMTP/TLS email sending with HTML support, tracking, and error handling.
 
 import os
 import smtplib
-import ssl
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 from typing import Optional, Dict, Any
 from sqlalchemy import text
 
 from app import db
+from mail_dispatcher import mail_dispatcher
 
 
 class ExternalEmailService:
@@ -150,38 +148,19 @@ class ExternalEmailService:
         
         # Send email via SMTP
         try:
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = f"{self.from_name} <{self.from_email}>"
-            msg['To'] = to_email
-            
             # Add priority header
+            headers = {}
             if priority == 'high':
-                msg['X-Priority'] = '1'
-                msg['X-MSMail-Priority'] = 'High'
+                headers = {'X-Priority': '1', 'X-MSMail-Priority': 'High'}
             elif priority == 'low':
-                msg['X-Priority'] = '5'
-                msg['X-MSMail-Priority'] = 'Low'
-            
-            # Attach plain text version
-            text_part = MIMEText(message_body, 'plain', 'utf-8')
-            msg.attach(text_part)
-            
-            # Attach HTML version if provided
-            if message_html:
-                html_part = MIMEText(message_html, 'html', 'utf-8')
-                msg.attach(html_part)
-            
-            # Create secure SSL context
-            context = ssl.create_default_context()
+                headers = {'X-Priority': '5', 'X-MSMail-Priority': 'Low'}
             
-            # Connect and send
-            print(f"[EMAIL] Connecting to {self.smtp_host}:{self.smtp_port}")
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                server.starttls(context=context)  # Secure with TLS
-                server.login(self.smtp_user, self.smtp_password)
-                server.send_message(msg)
+            # Send over the shared, already logged-in SMTP session (mail_dispatcher
+            # 'external' provider) instead of connect + STARTTLS + login per message.
+            # Stays synchronous: the admin gets the delivery result immediately.
+            print(f"[EMAIL] Sending via {self.smtp_host}:{self.smtp_port} (pooled)")
+            mail_dispatcher.deliver_now('external', to_email, subject, html=message_html, body=message_body,
+                                        sender=(self.from_name, self.from_email), headers=headers)
             
             # Update database record as sent
             db.session.execute(text("""
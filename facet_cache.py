@@ -0,0 +1,145 @@
+"""
+Facet cache for lead listing filters (departments, cities, ...)
+Facets are materialized into the lead_facets table by the ingest jobs, so every
+gunicorn worker reads the same small indexed table instead of running
+SELECT DISTINCT over the lead tables on each page render.
+"""
+import threading
+import time
+from datetime import date
+from sqlalchemy import text
+
+from federal_relevance import LISTING_WHERE_SQL as FEDERAL_LISTING_WHERE_SQL
+
+# Per-process memo in front of lead_facets (seconds). Ingest jobs clear the
+# local memo immediately; other workers pick up the new rows within the TTL.
+FACET_MEMO_TTL = 60
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+
+def ensure_facet_table(session):
+    """Create the lead_facets table (idempotent)."""
+    try:
+        session.execute(text('''CREATE TABLE IF NOT EXISTS lead_facets
+                     (source TEXT NOT NULL,
+                      facet TEXT NOT NULL,
+                      value TEXT NOT NULL,
+                      item_count INTEGER DEFAULT 0,
+                      refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                      PRIMARY KEY (source, facet, value))'''))
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        print(f"⚠️  Facet table init error: {e}")
+        return False
+
+
+def city_from_location(location):
+    """Extract the city from 'City, ST' style location strings; None for state-only values."""
+    if not location or ',' not in location:
+        return None
+    parts = [p.strip() for p in location.split(',')]
+    if len(parts) >= 2 and parts[0]:
+        return parts[0]
+    return None
+
+
+def _replace_facet(session, source, facet, counts):
+    session.execute(text('DELETE FROM lead_facets WHERE source = :source AND facet = :facet'),
+                    {'source': source, 'facet': facet})
+    if counts:
+        session.execute(text('''INSERT INTO lead_facets (source, facet, value, item_count)
+                                VALUES (:source, :facet, :value, :item_count)'''),
+                        [{'source': source, 'facet': facet, 'value': value, 'item_count': count}
+                         for value, count in counts.items()])
+
+
+def rebuild_federal_facets(session):
+    """Recompute department and city facets for /federal-contracts.
+
+    Counts are the contracts the listing would show per value as of the rebuild
+    (the same federal_relevance predicate).
+    Returns {facet: number_of_values}.
+    """
+    params = {'today': date.today().isoformat()}
+    departments = {}
+    for row in session.execute(text(f'''
+        SELECT department,
+               SUM(CASE WHEN {FEDERAL_LISTING_WHERE_SQL} THEN 1 ELSE 0 END) AS open_count
+        FROM federal_contracts
+        WHERE department IS NOT NULL AND department != ''
+        GROUP BY department
+    '''), params).fetchall():
+        departments[row.department] = int(row.open_count or 0)
+
+    cities = {}
+    for row in session.execute(text(f'''
+        SELECT location,
+               SUM(CASE WHEN {FEDERAL_LISTING_WHERE_SQL} THEN 1 ELSE 0 END) AS open_count
+        FROM federal_contracts
+        WHERE location IS NOT NULL AND location != ''
+        GROUP BY location
+    '''), params).fetchall():
+        city = city_from_location(row.location)
+        if city:
+            cities[city] = cities.get(city, 0) + int(row.open_count or 0)
+
+    try:
+        _replace_facet(session, 'federal', 'department', departments)
+        _replace_facet(session, 'federal', 'city', cities)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    invalidate_facets('federal')
+    return {'department': len(departments), 'city': len(cities)}
+
+
+# Rebuild functions per source, used when a facet is read before any ingest ran
+FACET_BUILDERS = {
+    'federal': rebuild_federal_facets,
+}
+
+
+def invalidate_facets(source=None):
+    """Drop this worker's memoized facets (all sources when source is None)."""
+    with _memo_lock:
+        for key in list(_memo.keys()):
+            if source is None or key[0] == source:
+                _memo.pop(key, None)
+
+
+def get_facet_counts(session, source, facet):
+    """Return an ordered {value: count} dict for a facet, built on first use if missing."""
+    key = (source, facet)
+    now = time.time()
+    with _memo_lock:
+        cached = _memo.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+    rows = session.execute(text('''
+        SELECT value, item_count FROM lead_facets
+        WHERE source = :source AND facet = :facet
+        ORDER BY value
+    '''), {'source': source, 'facet': facet}).fetchall()
+    if not rows and source in FACET_BUILDERS:
+        FACET_BUILDERS[source](session)
+        rows = session.execute(text('''
+            SELECT value, item_count FROM lead_facets
+            WHERE source = :source AND facet = :facet
+            ORDER BY value
+        '''), {'source': source, 'facet': facet}).fetchall()
+
+    counts = {row.value: int(row.item_count or 0) for row in rows}
+    with _memo_lock:
+        _memo[key] = (now + FACET_MEMO_TTL, counts)
+    return counts
+
+
+def get_facet_values(session, source, facet):
+    """Sorted facet values (for filter dropdowns)."""
+    return list(get_facet_counts(session, source, facet).keys())
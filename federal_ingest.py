@@ -0,0 +1,187 @@
+"""
+Bulk upsert for federal_contracts
+Shared by the SAM.gov, Data.gov bulk and USAspending ingest jobs: contracts are
+normalized once, then written in chunks (one existence lookup + one
+multi-row INSERT ... VALUES (...), (...) ON CONFLICT (notice_id) per chunk)
+instead of a SELECT and an INSERT/UPDATE per award. The multi-row statement
+matters on PostgreSQL: psycopg2's executemany still costs one round trip per row.
+"""
+import re
+from sqlalchemy import text, bindparam, inspect, table, column
+from sqlalchemy.dialects import postgresql, sqlite
+
+FEDERAL_CONTRACT_COLUMNS = (
+    'title', 'agency', 'department', 'location', 'value', 'deadline', 'description',
+    'naics_code', 'sam_gov_url', 'notice_id', 'set_aside', 'posted_date',
+)
+# Columns compared to decide whether an existing row actually changed
+_COMPARED_COLUMNS = tuple(c for c in FEDERAL_CONTRACT_COLUMNS if c != 'notice_id')
+
+UPSERT_CHUNK_SIZE = 500
+
+_ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}')
+
+
+def _normalize_date(value):
+    """ISO date string or None (the column is DATE on PostgreSQL; 'Open'/'TBD' become NULL)."""
+    if value is None:
+        return None
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y-%m-%d')
+    value = str(value).strip()
+    return value[:10] if _ISO_DATE.match(value) else None
+
+
+def normalize_federal_contract(contract):
+    """Return a dict with exactly FEDERAL_CONTRACT_COLUMNS, or None if it can't be stored."""
+    notice_id = str(contract.get('notice_id') or '').strip()
+    title = str(contract.get('title') or '').strip()
+    if not notice_id or not title:
+        return None
+    row = {}
+    for col in FEDERAL_CONTRACT_COLUMNS:
+        value = contract.get(col)
+        if isinstance(value, str):
+            value = value.strip()
+        row[col] = value
+    row['notice_id'] = notice_id
+    row['title'] = title
+    row['agency'] = row['agency'] or 'Unknown Agency'
+    row['sam_gov_url'] = row['sam_gov_url'] or 'https://sam.gov/content/opportunities'
+    row['deadline'] = _normalize_date(row['deadline'])
+    row['posted_date'] = _normalize_date(row['posted_date'])
+    if row['naics_code'] is not None:
+        row['naics_code'] = str(row['naics_code'])
+    return row
+
+
+def ensure_notice_id_index(session):
+    """Unique index ON CONFLICT (notice_id) relies on (older tables may predate the UNIQUE constraint)."""
+    try:
+        session.execute(text('''CREATE UNIQUE INDEX IF NOT EXISTS idx_federal_contracts_notice_id
+                                ON federal_contracts(notice_id)'''))
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        print(f"⚠️  Could not create unique notice_id index (duplicates present?): {e}")
+        return False
+
+
+def _as_comparable(value):
+    return None if value is None else str(value)
+
+
+def _upsert_sql(on_conflict, reset_relevance):
+    cols = ', '.join(FEDERAL_CONTRACT_COLUMNS)
+    values = ', '.join(':' + c for c in FEDERAL_CONTRACT_COLUMNS)
+    sql = f'INSERT INTO federal_contracts ({cols}) VALUES ({values}) ON CONFLICT (notice_id) '
+    if on_conflict == 'ignore':
+        return sql + 'DO NOTHING'
+    assignments = [f'{c} = excluded.{c}' for c in _COMPARED_COLUMNS]
+    if reset_relevance:
+        # Content changed: let classify_pending_federal_contracts() re-evaluate it
+        assignments.append('relevance_version = 0')
+    return sql + 'DO UPDATE SET ' + ', '.join(assignments)
+
+
+def _multirow_upsert(dialect_name, on_conflict, reset_relevance):
+    """Build f(rows) -> one INSERT ... VALUES statement with an ON CONFLICT (notice_id) clause.
+
+    Returns None for dialects without ON CONFLICT support (the caller falls back
+    to an executemany of _upsert_sql()).
+    """
+    insert = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}.get(dialect_name)
+    if insert is None:
+        return None
+    extra = ('relevance_version',) if reset_relevance else ()
+    contracts = table('federal_contracts', *(column(c) for c in FEDERAL_CONTRACT_COLUMNS + extra))
+
+    def build(rows):
+        stmt = insert(contracts).values(rows)
+        if on_conflict == 'ignore':
+            return stmt.on_conflict_do_nothing(index_elements=['notice_id'])
+        assignments = {c: stmt.excluded[c] for c in _COMPARED_COLUMNS}
+        if reset_relevance:
+            # Content changed: let classify_pending_federal_contracts() re-evaluate it
+            assignments['relevance_version'] = 0
+        return stmt.on_conflict_do_update(index_elements=['notice_id'], set_=assignments)
+    return build
+
+
+def bulk_upsert_federal_contracts(session, contracts, on_conflict='update', chunk_size=UPSERT_CHUNK_SIZE):
+    """Upsert contract dicts into federal_contracts keyed on notice_id.
+
+    on_conflict='update' rewrites existing rows whose content changed;
+    on_conflict='ignore' leaves existing rows untouched.
+
+    Returns {'inserted', 'updated', 'skipped', 'failed', 'inserted_notice_ids'}.
+    Unchanged or ignored existing rows count as skipped, as do records without
+    a notice_id/title. Commits once per chunk; a chunk that fails is retried
+    row by row so only the offending rows count as failed.
+    """
+    summary = {'inserted': 0, 'updated': 0, 'skipped': 0, 'failed': 0, 'inserted_notice_ids': []}
+
+    rows, seen = [], set()
+    for contract in contracts:
+        row = normalize_federal_contract(contract)
+        if row is None or row['notice_id'] in seen:
+            summary['skipped'] += 1
+            continue
+        seen.add(row['notice_id'])
+        rows.append(row)
+    if not rows:
+        return summary
+
+    columns = {c['name'] for c in inspect(session.get_bind()).get_columns('federal_contracts')}
+    reset_relevance = 'relevance_version' in columns
+    multirow = _multirow_upsert(session.get_bind().dialect.name, on_conflict, reset_relevance)
+    upsert = text(_upsert_sql(on_conflict, reset_relevance))
+    lookup = text(f"SELECT notice_id, {', '.join(_COMPARED_COLUMNS)} FROM federal_contracts "
+                  "WHERE notice_id IN :ids").bindparams(bindparam('ids', expanding=True))
+
+    def write(batch):
+        """Upsert the new/changed rows of batch and commit; returns (inserted notice_ids, updated, skipped)."""
+        existing = {r.notice_id: r for r in session.execute(lookup, {'ids': [r['notice_id'] for r in batch]})}
+        to_write, inserted_ids, updated = [], [], 0
+        for row in batch:
+            current = existing.get(row['notice_id'])
+            if current is None:
+                to_write.append(row)
+                inserted_ids.append(row['notice_id'])
+            elif on_conflict == 'update' and any(
+                    _as_comparable(getattr(current, c)) != _as_comparable(row[c]) for c in _COMPARED_COLUMNS):
+                to_write.append(row)
+                updated += 1
+        if to_write and multirow is not None:
+            session.execute(multirow(to_write))
+        elif to_write:
+            session.execute(upsert, to_write)
+        session.commit()
+        return inserted_ids, updated, len(batch) - len(to_write)
+
+    def record(result):
+        inserted_ids, updated, skipped = result
+        summary['inserted'] += len(inserted_ids)
+        summary['updated'] += updated
+        summary['skipped'] += skipped
+        summary['inserted_notice_ids'].extend(inserted_ids)
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        try:
+            record(write(chunk))
+            continue
+        except Exception as e:
+            session.rollback()
+            print(f"⚠️  Federal upsert chunk {start // chunk_size + 1} failed ({len(chunk)} rows), "
+                  f"retrying row by row: {e}")
+        # One bad row must not drop the rest of the chunk
+        for row in chunk:
+            try:
+                record(write([row]))
+            except Exception as e:
+                session.rollback()
+                summary['failed'] += 1
+                print(f"⚠️  Federal upsert skipped {row['notice_id']}: {e}")
+    return summary
@@ -0,0 +1,145 @@
+"""
+Relevance classification for federal_contracts
+Computed once at ingest into indexed is_relevant/category columns so the
+/federal-contracts listing walks a partial index in page order instead of
+running LOWER(title) NOT LIKE scans.
+"""
+from sqlalchemy import text
+
+from keyword_matcher import CLEANING, KeywordMatcher
+
+# Bump when the rules below (or the version of the shared cleaning keyword set)
+# change; rows classified under an older version are picked up again by
+# classify_pending_federal_contracts().
+RELEVANCE_VERSION = 3
+
+# Title fragments that exclude a notice from the listing -> exclusion category
+TITLE_EXCLUSIONS = [
+    ('award', 'excluded_awarded'),
+    ('cancel', 'excluded_cancelled'),
+    ('inactive', 'excluded_inactive'),
+    ('construction', 'excluded_construction'),
+    ('engineering', 'excluded_construction'),
+    ('launcher', 'excluded_research'),
+    ('vehicle', 'excluded_research'),
+    ('research', 'excluded_research'),
+    ('development', 'excluded_research'),
+    ('accelerator', 'excluded_research'),
+]
+
+_EXCLUSION_MATCHER = KeywordMatcher([fragment for fragment, _category in TITLE_EXCLUSIONS])
+
+CLEANING_KEYWORDS = CLEANING.keywords
+
+CLEANING_NAICS_PREFIXES = ('5617',)
+
+# Listing predicate, shared by the listing and its facet counts. Kept to the
+# indexed column alone: rows are classified at ingest, and rows written by other
+# paths are picked up by the 5-minute classify_pending_federal_contracts() job.
+LISTABLE_SQL = 'is_relevant = TRUE'
+
+# Open notices as listed on /federal-contracts (and counted by its facets); binds :today
+LISTING_WHERE_SQL = f'{LISTABLE_SQL} AND deadline IS NOT NULL AND deadline >= :today'
+
+# Listing order (newest first); idx_federal_contracts_listing is built on it
+LISTING_SORT_SQL = 'COALESCE(posted_date, created_at)'
+
+
+def matches_cleaning_keywords(text_value):
+    return CLEANING.search(text_value)
+
+
+def classify_federal_contract(title, description=None, naics_code=None):
+    """Return (is_relevant, category) for a federal contract notice.
+
+    Exclusions mirror the historical /federal-contracts title blacklist; the
+    remaining rows are tagged 'cleaning' or 'general' for filtering.
+    """
+    if _EXCLUSION_MATCHER.search(title):
+        excluded = _EXCLUSION_MATCHER.found(title)
+        # First rule in list order wins, as before
+        for fragment, category in TITLE_EXCLUSIONS:
+            if fragment in excluded:
+                return False, category
+    naics = str(naics_code or '').strip()
+    if naics.startswith(CLEANING_NAICS_PREFIXES) or matches_cleaning_keywords(title) or matches_cleaning_keywords(description):
+        return True, 'cleaning'
+    return True, 'general'
+
+
+def ensure_relevance_columns(session):
+    """Add is_relevant/category/relevance_version columns and the listing indexes (idempotent)."""
+    is_postgres = session.get_bind().dialect.name == 'postgresql'
+    bool_type = 'BOOLEAN' if is_postgres else 'INTEGER'
+    try:
+        if is_postgres:
+            existing = {r[0] for r in session.execute(text('''
+                SELECT column_name FROM information_schema.columns WHERE table_name = 'federal_contracts'
+            ''')).fetchall()}
+        else:
+            existing = {r[1] for r in session.execute(text('PRAGMA table_info(federal_contracts)')).fetchall()}
+        if not existing:
+            return False
+
+        for col, definition in [
+            ('is_relevant', bool_type),
+            ('category', 'TEXT'),
+            ('relevance_version', 'INTEGER DEFAULT 0'),
+        ]:
+            if col not in existing:
+                session.execute(text(f'ALTER TABLE federal_contracts ADD COLUMN {col} {definition}'))
+
+        session.execute(text('''CREATE INDEX IF NOT EXISTS idx_federal_contracts_relevance_version
+                                ON federal_contracts(relevance_version)'''))
+        # Serves the /federal-contracts pages: the listing predicate and order, with deadline for the
+        # open-notice filter (replaces the (is_relevant, deadline, posted_date) index, which needed a sort)
+        session.execute(text(f'''CREATE INDEX IF NOT EXISTS idx_federal_contracts_listing
+                                 ON federal_contracts (({LISTING_SORT_SQL}) DESC, id DESC, deadline)
+                                 WHERE {LISTABLE_SQL} AND deadline IS NOT NULL'''))
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        print(f"⚠️  Federal relevance columns init error: {e}")
+        return False
+
+
+def classify_pending_federal_contracts(session, batch_size=1000, max_batches=None, reclassify_all=False):
+    """Backfill job: classify rows that were never classified (or under an older rule version).
+
+    Runs after every ingest and at startup; safe to call repeatedly.
+    Returns the number of rows classified.
+    """
+    if reclassify_all:
+        session.execute(text('UPDATE federal_contracts SET relevance_version = 0'))
+        session.commit()
+
+    classified = 0
+    batches = 0
+    last_id = 0
+    while max_batches is None or batches < max_batches:
+        rows = session.execute(text('''
+            SELECT id, title, description, naics_code
+            FROM federal_contracts
+            WHERE (relevance_version IS NULL OR relevance_version < :version) AND id > :last_id
+            ORDER BY id
+            LIMIT :limit
+        '''), {'version': RELEVANCE_VERSION, 'last_id': last_id, 'limit': batch_size}).fetchall()
+        if not rows:
+            break
+
+        updates = []
+        for row in rows:
+            is_relevant, category = classify_federal_contract(row.title, row.description, row.naics_code)
+            updates.append({'id': row.id, 'is_relevant': is_relevant, 'category': category, 'version': RELEVANCE_VERSION})
+        session.execute(text('''
+            UPDATE federal_contracts
+            SET is_relevant = :is_relevant, category = :category, relevance_version = :version
+            WHERE id = :id
+        '''), updates)
+        session.commit()
+
+        classified += len(rows)
+        batches += 1
+        last_id = rows[-1].id
+    return classified
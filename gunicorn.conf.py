@@ -1,8 +1,58 @@
 import os
+import subprocess
+import sys
 
 bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
 workers = 2
 timeout = 120  # Increased from 30 to 120 seconds for database initialization
 keepalive = 2
 max_requests = 100
-max_requests_jitter = 10
\ No newline at end of file
+max_requests_jitter = 10
+
+# Web workers only serve requests; scheduled ingest and queued jobs run in a
+# separate scheduler process (scheduler_service.py) so they never share a GIL
+# with request handling. Set SCHEDULER_MODE=external to run that process yourself.
+os.environ.setdefault('SCHEDULER_MODE', 'process')
+if os.environ['SCHEDULER_MODE'] == 'process':
+    os.environ.setdefault('JOB_WORKER_THREADS', '0')
+
+# Schema migrations run once here, in the master, before any worker starts;
+# workers only check the schema version on import (see schema_migrations.py).
+os.environ.setdefault('SCHEMA_AUTO_MIGRATE', '0')
+
+_scheduler_process = None
+
+
+def on_starting(server):
+    if os.environ.get('RUN_MIGRATIONS_ON_START', '1') != '1':
+        return
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrate.py')
+    result = subprocess.run([sys.executable, script])
+    if result.returncode != 0:
+        server.log.error("Schema migrations failed; workers will start against the current schema")
+
+
+def when_ready(server):
+    global _scheduler_process
+    if os.environ.get('SCHEDULER_MODE') != 'process':
+        return
+    env = dict(os.environ, SCHEDULER_MODE='service',
+               JOB_WORKER_THREADS=os.environ.get('SCHEDULER_JOB_WORKER_THREADS', '1'))
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scheduler_service.py')
+    _scheduler_process = subprocess.Popen([sys.executable, script], env=env)
+    server.log.info(f"Started scheduler process (pid {_scheduler_process.pid})")
+
+
+def on_exit(server):
+    if _scheduler_process is not None and _scheduler_process.poll() is None:
+        _scheduler_process.terminate()
+        try:
+            _scheduler_process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            _scheduler_process.kill()
+
+
+def worker_exit(server, worker):
+    # Write the analytics events still buffered in this worker (max_requests recycles workers often)
+    from event_writer import event_writer
+    event_writer.close()
@@ -0,0 +1,210 @@
+"""
+Conditional-GET cache for portal scraping
+Shared by every scraper base (national_scrapers.BaseScraper, VirginiaLocalGovScraper,
+scrape_city_portals). For each (source, url) it remembers the ETag, Last-Modified,
+a SHA-256 of the body and the parsed result of the last run, all in one SQLite
+file so every worker/process on the host shares it.
+
+A run sends If-None-Match / If-Modified-Since; a 304, or a 200 whose body hash
+matches, returns the stored parse result instead of running BeautifulSoup again.
+Per-source daily counters (fetched / not_modified / unchanged / changed) show
+how much of a run was skipped.
+
+Configuration (environment):
+    SCRAPER_HTTP_CACHE_PATH   (default: <tmpdir>/scraper_http_cache.sqlite3)
+    SCRAPER_HTTP_CACHE        set to 0 to disable
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date
+
+import requests
+
+NOT_MODIFIED = 'not_modified'
+UNCHANGED = 'unchanged'
+CHANGED = 'changed'
+
+
+class PageState:
+    """Outcome of one conditional fetch."""
+
+    def __init__(self, source, url, status, content_hash):
+        self.source = source
+        self.url = url
+        self.status = status
+        self.content_hash = content_hash
+
+    @property
+    def unchanged(self):
+        return self.status in (NOT_MODIFIED, UNCHANGED)
+
+
+class HTTPCache:
+    """ETag / Last-Modified / body-hash store with cached parse results."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute('''CREATE TABLE IF NOT EXISTS http_cache
+                        (source TEXT NOT NULL, url TEXT NOT NULL, etag TEXT, last_modified TEXT,
+                         content_hash TEXT, result TEXT, result_hash TEXT, checked_at REAL,
+                         PRIMARY KEY (source, url))''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS http_cache_stats
+                        (source TEXT NOT NULL, day TEXT NOT NULL, fetched INTEGER DEFAULT 0,
+                         not_modified INTEGER DEFAULT 0, unchanged INTEGER DEFAULT 0, changed INTEGER DEFAULT 0,
+                         PRIMARY KEY (source, day))''')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def conditional_headers(self, source, url):
+        """If-None-Match / If-Modified-Since for a page, only when its parse result is stored."""
+        row = self._conn().execute('''SELECT etag, last_modified FROM http_cache
+                                      WHERE source = ? AND url = ? AND result IS NOT NULL
+                                        AND result_hash = content_hash''', (source, url)).fetchone()
+        headers = {}
+        if row:
+            if row[0]:
+                headers['If-None-Match'] = row[0]
+            if row[1]:
+                headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def observe(self, source, url, status_code, headers, body):
+        """Record a response (200 or 304) and classify it as changed / unchanged / not_modified."""
+        conn = self._conn()
+        row = conn.execute('SELECT content_hash FROM http_cache WHERE source = ? AND url = ?',
+                           (source, url)).fetchone()
+        previous_hash = row[0] if row else None
+        etag = headers.get('ETag') or headers.get('etag')
+        last_modified = headers.get('Last-Modified') or headers.get('last-modified')
+        now = time.time()
+
+        if status_code == 304:
+            status, content_hash = NOT_MODIFIED, previous_hash
+            conn.execute('UPDATE http_cache SET checked_at = ? WHERE source = ? AND url = ?', (now, source, url))
+        else:
+            content_hash = hashlib.sha256(body or b'').hexdigest()
+            status = UNCHANGED if content_hash == previous_hash else CHANGED
+            conn.execute('''INSERT INTO http_cache (source, url, etag, last_modified, content_hash, checked_at)
+                            VALUES (?, ?, ?, ?, ?, ?)
+                            ON CONFLICT(source, url) DO UPDATE SET
+                                etag = excluded.etag, last_modified = excluded.last_modified,
+                                content_hash = excluded.content_hash, checked_at = excluded.checked_at''',
+                         (source, url, etag, last_modified, content_hash, now))
+        self._count(source, status)
+        return PageState(source, url, status, content_hash)
+
+    def cached_result(self, state):
+        """Parse result stored for this exact body, or None."""
+        if state is None or not state.content_hash:
+            return None
+        row = self._conn().execute('''SELECT result FROM http_cache
+                                      WHERE source = ? AND url = ? AND result_hash = ?''',
+                                   (state.source, state.url, state.content_hash)).fetchone()
+        if not row or row[0] is None:
+            return None
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            return None
+
+    def store_result(self, state, result):
+        try:
+            payload = json.dumps(result, default=str)
+        except (TypeError, ValueError):
+            return
+        self._conn().execute('UPDATE http_cache SET result = ?, result_hash = ? WHERE source = ? AND url = ?',
+                             (payload, state.content_hash, state.source, state.url))
+
+    def parse(self, state, parse, *args):
+        """Return the stored result when the page is unchanged, else run parse(*args) and store it."""
+        if state is not None and state.unchanged:
+            cached = self.cached_result(state)
+            if cached is not None:
+                return cached
+        result = parse(*args)
+        if state is not None:
+            self.store_result(state, result)
+        return result
+
+    def _count(self, source, status):
+        column = {NOT_MODIFIED: 'not_modified', UNCHANGED: 'unchanged', CHANGED: 'changed'}[status]
+        self._conn().execute(f'''INSERT INTO http_cache_stats (source, day, fetched, {column}) VALUES (?, ?, 1, 1)
+                                 ON CONFLICT(source, day) DO UPDATE SET
+                                     fetched = fetched + 1, {column} = {column} + 1''',
+                             (source, date.today().isoformat()))
+
+    def stats(self, day=None):
+        """{source: {'fetched', 'not_modified', 'unchanged', 'changed', 'skipped_pct'}} for one day (default today)."""
+        rows = self._conn().execute('''SELECT source, fetched, not_modified, unchanged, changed
+                                       FROM http_cache_stats WHERE day = ? ORDER BY source''',
+                                    ((day or date.today()).isoformat(),)).fetchall()
+        stats = {}
+        for source, fetched, not_modified, unchanged, changed in rows:
+            stats[source] = {'fetched': fetched, 'not_modified': not_modified, 'unchanged': unchanged,
+                             'changed': changed,
+                             'skipped_pct': round(100.0 * (not_modified + unchanged) / fetched, 1) if fetched else 0.0}
+        return stats
+
+
+_http_cache = None
+_http_cache_lock = threading.Lock()
+
+
+def get_http_cache():
+    """Process-wide cache, or None when disabled/unavailable."""
+    global _http_cache
+    if os.environ.get('SCRAPER_HTTP_CACHE', '1') == '0':
+        return None
+    with _http_cache_lock:
+        if _http_cache is None:
+            path = os.environ.get('SCRAPER_HTTP_CACHE_PATH') or os.path.join(
+                tempfile.gettempdir(), 'scraper_http_cache.sqlite3')
+            try:
+                _http_cache = HTTPCache(path)
+            except Exception as e:
+                print(f"⚠️  Scraper HTTP cache unavailable: {e}")
+                return None
+        return _http_cache
+
+
+def conditional_get(source, url, headers=None, timeout=30, get=None):
+    """GET through the shared cache with the requests library.
+
+    Returns (response, page_state); response may be a 304 (body-less) when the
+    page hasn't changed, and page_state is None when the cache is disabled or
+    the status wasn't 200/304.
+    """
+    cache = get_http_cache()
+    request_headers = dict(headers or {})
+    if cache is not None:
+        request_headers.update(cache.conditional_headers(source, url))
+    response = (get or requests.get)(url, headers=request_headers, timeout=timeout)
+    state = None
+    if cache is not None and response.status_code in (200, 304):
+        try:
+            state = cache.observe(source, url, response.status_code, response.headers, response.content)
+        except Exception as e:
+            print(f"⚠️  Scraper HTTP cache update failed for {url}: {e}")
+    return response, state
+
+
+def parse_with_cache(state, parse, *args):
+    """parse(*args), or the stored result when state says the page is unchanged."""
+    cache = get_http_cache()
+    if cache is None or state is None:
+        return parse(*args)
+    return cache.parse(state, parse, *args)
@@ -0,0 +1,294 @@
+"""
+Persistent background job queue
+Long-running work (live RFP scraping for /api/find-city-rfps and
+/api/fetch-rfps-by-state) is recorded in the background_jobs table and run by
+worker threads instead of inside the gunicorn request. The endpoint returns a
+job id immediately; clients poll /api/jobs/<id> for status, progress and the
+final result.
+
+Jobs are claimed with a conditional UPDATE (status = 'queued'), so any number
+of workers - threads in each gunicorn worker, or a dedicated
+`python job_worker.py` process - can share the table safely. Running jobs
+heartbeat; a job whose worker died is re-queued after JOB_STALE_SECONDS.
+
+Deduplicated submissions share one job, so every submitter is recorded in
+job_subscribers and may poll it (can_read_job).
+
+Configuration (environment):
+    JOB_WORKER_THREADS   worker threads per web process (default: 1, 0 = external worker only)
+    JOB_POLL_SECONDS     idle poll interval (default: 2)
+    JOB_STALE_SECONDS    heartbeat age after which a running job is re-queued (default: 900)
+    JOB_MAX_ATTEMPTS     attempts before a job is marked failed (default: 2)
+"""
+import json
+import os
+import socket
+import threading
+import traceback
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', 2))
+STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', 900))
+MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 2))
+
+
+def ensure_job_table(session):
+    """Create the background_jobs table (idempotent)."""
+    try:
+        session.execute(text('''CREATE TABLE IF NOT EXISTS background_jobs
+                     (id TEXT PRIMARY KEY,
+                      kind TEXT NOT NULL,
+                      params TEXT,
+                      status TEXT NOT NULL DEFAULT 'queued',
+                      dedupe_key TEXT,
+                      user_email TEXT,
+                      progress TEXT,
+                      result TEXT,
+                      error TEXT,
+                      attempts INTEGER DEFAULT 0,
+                      worker_id TEXT,
+                      created_at TIMESTAMP,
+                      started_at TIMESTAMP,
+                      heartbeat_at TIMESTAMP,
+                      finished_at TIMESTAMP)'''))
+        session.execute(text('''CREATE INDEX IF NOT EXISTS idx_background_jobs_status
+                                ON background_jobs(status, created_at)'''))
+        session.execute(text('''CREATE INDEX IF NOT EXISTS idx_background_jobs_dedupe
+                                ON background_jobs(dedupe_key, status)'''))
+        session.execute(text('''CREATE TABLE IF NOT EXISTS job_subscribers
+                     (job_id TEXT NOT NULL,
+                      user_email TEXT NOT NULL,
+                      PRIMARY KEY (job_id, user_email))'''))
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        print(f"⚠️  Background job table init error: {e}")
+        return False
+
+
+def _loads(value):
+    if value is None:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return None
+
+
+def submit_job(session, kind, params=None, user_email=None, dedupe_key=None, reuse_seconds=0):
+    """Queue a job and return its id (commits).
+
+    With a dedupe_key, an identical job that is still queued/running - or that
+    finished successfully within reuse_seconds - is returned instead of queueing
+    a new one, so repeated clicks share one scrape.
+    """
+    if dedupe_key:
+        existing = session.execute(text('''SELECT id FROM background_jobs
+                                           WHERE dedupe_key = :key AND status IN ('queued', 'running')
+                                           ORDER BY created_at DESC LIMIT 1'''),
+                                   {'key': dedupe_key}).fetchone()
+        if existing is None and reuse_seconds:
+            existing = session.execute(text('''SELECT id FROM background_jobs
+                                               WHERE dedupe_key = :key AND status = 'done'
+                                                 AND finished_at >= :since
+                                               ORDER BY finished_at DESC LIMIT 1'''),
+                                       {'key': dedupe_key,
+                                        'since': datetime.utcnow() - timedelta(seconds=reuse_seconds)}).fetchone()
+        if existing is not None:
+            _record_subscriber(session, existing.id, user_email)
+            return existing.id
+
+    job_id = uuid.uuid4().hex
+    session.execute(text('''INSERT INTO background_jobs (id, kind, params, status, dedupe_key, user_email, created_at)
+                            VALUES (:id, :kind, :params, 'queued', :key, :email, :now)'''),
+                    {'id': job_id, 'kind': kind, 'params': json.dumps(params or {}, default=str),
+                     'key': dedupe_key, 'email': user_email, 'now': datetime.utcnow()})
+    _record_subscriber(session, job_id, user_email)
+    return job_id
+
+
+def _record_subscriber(session, job_id, user_email):
+    if user_email:
+        session.execute(text('''INSERT INTO job_subscribers (job_id, user_email) VALUES (:id, :email)
+                                ON CONFLICT (job_id, user_email) DO NOTHING'''),
+                        {'id': job_id, 'email': user_email})
+    session.commit()
+
+
+def can_read_job(session, job_id, user_email):
+    """True if user_email submitted (or was deduplicated onto) this job; admins are checked by the caller."""
+    if not user_email:
+        return False
+    return session.execute(text('''SELECT 1 FROM job_subscribers
+                                   WHERE job_id = :id AND user_email = :email'''),
+                           {'id': job_id, 'email': user_email}).first() is not None
+
+
+def get_job(session, job_id):
+    """Job as a dict (params/progress/result decoded), or None."""
+    row = session.execute(text('''SELECT id, kind, params, status, user_email, progress, result, error,
+                                         attempts, created_at, started_at, finished_at
+                                  FROM background_jobs WHERE id = :id'''), {'id': job_id}).fetchone()
+    if row is None:
+        return None
+    job = dict(row._mapping)
+    for key in ('params', 'progress', 'result'):
+        job[key] = _loads(job[key])
+    return job
+
+
+def requeue_stale_jobs(session, stale_seconds=None, max_attempts=None):
+    """Re-queue running jobs whose worker stopped heartbeating; fail them after max_attempts (commits)."""
+    cutoff = datetime.utcnow() - timedelta(seconds=STALE_SECONDS if stale_seconds is None else stale_seconds)
+    max_attempts = MAX_ATTEMPTS if max_attempts is None else max_attempts
+    failed = session.execute(text('''UPDATE background_jobs
+                                     SET status = 'failed', error = 'worker stopped responding', finished_at = :now
+                                     WHERE status = 'running' AND heartbeat_at < :cutoff AND attempts >= :max'''),
+                             {'now': datetime.utcnow(), 'cutoff': cutoff, 'max': max_attempts}).rowcount
+    requeued = session.execute(text('''UPDATE background_jobs SET status = 'queued', worker_id = NULL
+                                       WHERE status = 'running' AND heartbeat_at < :cutoff'''),
+                               {'cutoff': cutoff}).rowcount
+    session.commit()
+    return requeued, failed
+
+
+def claim_next_job(session, worker_id, kinds=None):
+    """Atomically move the oldest queued job to running for this worker; returns the job dict or None."""
+    kind_filter = ''
+    params = {}
+    if kinds:
+        names = [f':k{i}' for i in range(len(kinds))]
+        kind_filter = f" AND kind IN ({', '.join(names)})"
+        params = {f'k{i}': kind for i, kind in enumerate(kinds)}
+
+    for _ in range(5):
+        candidate = session.execute(text(f'''SELECT id FROM background_jobs WHERE status = 'queued'{kind_filter}
+                                              ORDER BY created_at LIMIT 1'''), params).fetchone()
+        if candidate is None:
+            session.commit()
+            return None
+        now = datetime.utcnow()
+        claimed = session.execute(text('''UPDATE background_jobs
+                                          SET status = 'running', worker_id = :worker, attempts = attempts + 1,
+                                              started_at = :now, heartbeat_at = :now
+                                          WHERE id = :id AND status = 'queued' '''),
+                                  {'worker': worker_id, 'now': now, 'id': candidate.id}).rowcount
+        session.commit()
+        if claimed == 1:
+            return get_job(session, candidate.id)
+        # Another worker won the race; try the next one
+    return None
+
+
+def update_job_progress(session, job_id, progress):
+    """Store a progress dict and refresh the heartbeat (commits)."""
+    try:
+        session.execute(text('''UPDATE background_jobs SET progress = :progress, heartbeat_at = :now
+                                WHERE id = :id'''),
+                        {'progress': json.dumps(progress, default=str), 'now': datetime.utcnow(), 'id': job_id})
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        print(f"⚠️  Job {job_id} progress update failed: {e}")
+
+
+def finish_job(session, job_id, result=None, error=None):
+    """Mark a job done (with its JSON result) or failed (with an error message) (commits)."""
+    session.execute(text('''UPDATE background_jobs
+                            SET status = :status, result = :result, error = :error,
+                                finished_at = :now, heartbeat_at = :now
+                            WHERE id = :id'''),
+                    {'status': FAILED if error else DONE,
+                     'result': None if result is None else json.dumps(result, default=str),
+                     'error': error, 'now': datetime.utcnow(), 'id': job_id})
+    session.commit()
+
+
+class JobContext:
+    """Passed to handlers: the job id/params and a progress() reporter."""
+
+    def __init__(self, session, job):
+        self.session = session
+        self.id = job['id']
+        self.params = job['params'] or {}
+        self._progress = {}
+
+    def progress(self, **fields):
+        self._progress.update(fields)
+        update_job_progress(self.session, self.id, self._progress)
+
+
+class JobWorker:
+    """Polls background_jobs and runs registered handlers inside the Flask app context.
+
+    handlers: {kind: fn(params, job_context) -> JSON-serialisable result}
+    """
+
+    def __init__(self, app, db, handlers, poll_seconds=None, worker_id=None):
+        self.app = app
+        self.db = db
+        self.handlers = handlers
+        self.poll_seconds = POLL_SECONDS if poll_seconds is None else poll_seconds
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self._stop = threading.Event()
+
+    def run_once(self):
+        """Claim and run at most one job; returns its id or None when the queue is empty."""
+        with self.app.app_context():
+            session = self.db.session
+            try:
+                requeue_stale_jobs(session)
+                job = claim_next_job(session, self.worker_id, kinds=list(self.handlers))
+            except Exception as e:
+                session.rollback()
+                print(f"⚠️  Job queue poll failed: {e}")
+                return None
+            if job is None:
+                return None
+
+            print(f"⚙️  Job {job['id']} ({job['kind']}) started on {self.worker_id}")
+            try:
+                result = self.handlers[job['kind']](job['params'] or {}, JobContext(session, job))
+                finish_job(session, job['id'], result=result)
+                print(f"✅ Job {job['id']} ({job['kind']}) finished")
+            except Exception as e:
+                session.rollback()
+                traceback.print_exc()
+                try:
+                    finish_job(session, job['id'], error=str(e) or e.__class__.__name__)
+                except Exception as finish_error:
+                    session.rollback()
+                    print(f"⚠️  Could not record failure for job {job['id']}: {finish_error}")
+                print(f"❌ Job {job['id']} ({job['kind']}) failed: {e}")
+            return job['id']
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            if self.run_once() is None:
+                self._stop.wait(self.poll_seconds)
+
+    def stop(self):
+        self._stop.set()
+
+
+def start_job_workers(app, db, handlers, count=None):
+    """Start `count` daemon worker threads in this process (JOB_WORKER_THREADS, default 1)."""
+    count = int(os.environ.get('JOB_WORKER_THREADS', 1)) if count is None else count
+    workers = []
+    for i in range(count):
+        worker = JobWorker(app, db, handlers)
+        threading.Thread(target=worker.run_forever, name=f'job-worker-{i}', daemon=True).start()
+        workers.append(worker)
+    if workers:
+        print(f"⚙️  Started {len(workers)} background job worker thread(s)")
+    return workers
@@ -0,0 +1,292 @@
+"""
+Durable scheduler for recurring ingest jobs
+Replaces the per-source `schedule` loops. Every recurring job has a row in
+scheduled_jobs holding its next run, a lease, and timing metrics, so:
+
+- any number of scheduler processes (one per container) can run; a due job is
+  claimed with a conditional UPDATE on its lease and only one of them runs it
+- a crashed run just lets its lease expire (no lock file to clean up)
+- next_run_at survives restarts: a run missed while the service was down is
+  run once (coalesced) when it comes back, unless the job opts out of catch-up
+- at most SCHEDULER_MAX_CONCURRENT jobs run at once per scheduler
+
+Under gunicorn the scheduler runs as its own process (scheduler_service.py,
+started from gunicorn.conf.py), so ingest never shares a GIL with the web
+workers. `python app.py` runs it as a thread instead.
+
+Configuration (environment):
+    SCHEDULER_MODE            thread | process | external | service | off (default: thread)
+    SCHEDULER_MAX_CONCURRENT  jobs run at once per scheduler (default: 2)
+    SCHEDULER_POLL_SECONDS    how often due jobs are checked (default: 30)
+    SCHEDULER_LEASE_SECONDS   lease length, renewed while a job runs (default: 600)
+"""
+import os
+import socket
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+MAX_CONCURRENT = int(os.environ.get('SCHEDULER_MAX_CONCURRENT', 2))
+POLL_SECONDS = float(os.environ.get('SCHEDULER_POLL_SECONDS', 30))
+LEASE_SECONDS = int(os.environ.get('SCHEDULER_LEASE_SECONDS', 600))
+
+
+class ScheduledJob:
+    """A recurring job: run `func` daily at each HH:MM in `times` (server local time),
+    or every `every_minutes`."""
+
+    def __init__(self, name, func, times=None, every_minutes=None, enabled=True, catchup=True,
+                 description=''):
+        if not times and not every_minutes:
+            raise ValueError(f"Scheduled job {name} needs times or every_minutes")
+        self.name = name
+        self.func = func
+        self.times = sorted(times or [])
+        self.every_minutes = every_minutes
+        self.enabled = enabled
+        self.catchup = catchup
+        self.description = description
+
+    @property
+    def schedule(self):
+        return f'every {self.every_minutes}m' if self.every_minutes else 'daily ' + ','.join(self.times)
+
+    def next_run(self, after):
+        """First scheduled time strictly after `after`."""
+        if self.every_minutes:
+            return after + timedelta(minutes=self.every_minutes)
+        candidates = []
+        for hhmm in self.times:
+            hour, minute = (int(part) for part in hhmm.split(':'))
+            run_at = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if run_at <= after:
+                run_at += timedelta(days=1)
+            candidates.append(run_at)
+        return min(candidates)
+
+
+def ensure_scheduler_tables(session):
+    """Create the scheduled_jobs table (idempotent)."""
+    try:
+        session.execute(text('''CREATE TABLE IF NOT EXISTS scheduled_jobs
+                     (name TEXT PRIMARY KEY,
+                      schedule TEXT,
+                      enabled INTEGER DEFAULT 1,
+                      next_run_at TIMESTAMP,
+                      lease_owner TEXT,
+                      lease_expires_at TIMESTAMP,
+                      last_started_at TIMESTAMP,
+                      last_finished_at TIMESTAMP,
+                      last_status TEXT,
+                      last_error TEXT,
+                      last_duration_seconds REAL,
+                      total_duration_seconds REAL DEFAULT 0,
+                      run_count INTEGER DEFAULT 0,
+                      failure_count INTEGER DEFAULT 0)'''))
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        print(f"⚠️  Scheduler table init error: {e}")
+        return False
+
+
+def sync_job_definitions(session, jobs, now=None):
+    """Insert rows for new jobs, apply each definition's enabled flag and reschedule
+    jobs whose schedule changed; persisted next runs are otherwise kept (commits)."""
+    now = now or datetime.now()
+    existing = {r.name: r for r in session.execute(text('SELECT name, schedule, next_run_at FROM scheduled_jobs'))}
+    for job in jobs:
+        row = existing.get(job.name)
+        params = {'name': job.name, 'schedule': job.schedule, 'enabled': 1 if job.enabled else 0,
+                  'next_run': job.next_run(now)}
+        if row is None:
+            session.execute(text('''INSERT INTO scheduled_jobs (name, schedule, enabled, next_run_at)
+                                    VALUES (:name, :schedule, :enabled, :next_run)'''), params)
+        elif row.schedule != job.schedule or row.next_run_at is None:
+            session.execute(text('''UPDATE scheduled_jobs SET schedule = :schedule, enabled = :enabled,
+                                        next_run_at = :next_run
+                                    WHERE name = :name'''), params)
+        else:
+            session.execute(text('UPDATE scheduled_jobs SET enabled = :enabled WHERE name = :name'), params)
+    session.commit()
+
+
+def claim_job(session, name, owner, now=None, lease_seconds=None):
+    """Take the lease on a due, enabled, unleased job; True if this owner got it (commits)."""
+    now = now or datetime.now()
+    claimed = session.execute(text('''UPDATE scheduled_jobs
+                                      SET lease_owner = :owner, lease_expires_at = :expires, last_started_at = :now
+                                      WHERE name = :name AND enabled = 1 AND next_run_at <= :now
+                                        AND (lease_expires_at IS NULL OR lease_expires_at < :now)'''),
+                              {'owner': owner, 'expires': now + timedelta(seconds=lease_seconds or LEASE_SECONDS),
+                               'now': now, 'name': name}).rowcount
+    session.commit()
+    return claimed == 1
+
+
+def renew_lease(session, name, owner, now=None, lease_seconds=None):
+    now = now or datetime.now()
+    session.execute(text('''UPDATE scheduled_jobs SET lease_expires_at = :expires
+                            WHERE name = :name AND lease_owner = :owner'''),
+                    {'expires': now + timedelta(seconds=lease_seconds or LEASE_SECONDS), 'name': name,
+                     'owner': owner})
+    session.commit()
+
+
+def record_run(session, name, owner, started_at, finished_at, next_run_at, error=None):
+    """Release the lease, store timing metrics and the next run (commits)."""
+    duration = (finished_at - started_at).total_seconds()
+    session.execute(text('''UPDATE scheduled_jobs
+                            SET lease_owner = NULL, lease_expires_at = NULL, next_run_at = :next_run,
+                                last_finished_at = :finished, last_status = :status, last_error = :error,
+                                last_duration_seconds = :duration,
+                                total_duration_seconds = COALESCE(total_duration_seconds, 0) + :duration,
+                                run_count = COALESCE(run_count, 0) + 1,
+                                failure_count = COALESCE(failure_count, 0) + :failed
+                            WHERE name = :name AND lease_owner = :owner'''),
+                    {'next_run': next_run_at, 'finished': finished_at, 'status': 'failed' if error else 'ok',
+                     'error': error, 'duration': duration, 'failed': 1 if error else 0, 'name': name,
+                     'owner': owner})
+    session.commit()
+
+
+def trigger_job(session, name, now=None):
+    """Make a job due immediately (commits)."""
+    session.execute(text('UPDATE scheduled_jobs SET next_run_at = :now WHERE name = :name'),
+                    {'now': now or datetime.now(), 'name': name})
+    session.commit()
+
+
+def set_job_enabled(session, name, enabled):
+    session.execute(text('UPDATE scheduled_jobs SET enabled = :enabled WHERE name = :name'),
+                    {'enabled': 1 if enabled else 0, 'name': name})
+    session.commit()
+
+
+def get_job_metrics(session):
+    """Per-job schedule, lease and timing metrics."""
+    rows = session.execute(text('''SELECT name, schedule, enabled, next_run_at, lease_owner, lease_expires_at,
+                                          last_started_at, last_finished_at, last_status, last_error,
+                                          last_duration_seconds, total_duration_seconds, run_count, failure_count
+                                   FROM scheduled_jobs ORDER BY name''')).fetchall()
+    metrics = []
+    for row in rows:
+        job = dict(row._mapping)
+        job['enabled'] = bool(job['enabled'])
+        job['running'] = job['lease_owner'] is not None
+        job['avg_duration_seconds'] = (round(job['total_duration_seconds'] / job['run_count'], 2)
+                                       if job['run_count'] else None)
+        metrics.append(job)
+    return metrics
+
+
+class Scheduler:
+    """Runs due ScheduledJobs (inside the Flask app context) on a bounded thread pool."""
+
+    def __init__(self, app, db, jobs, max_concurrent=None, poll_seconds=None, lease_seconds=None,
+                 owner=None, clock=datetime.now):
+        self.app = app
+        self.db = db
+        self.jobs = {job.name: job for job in jobs}
+        self.max_concurrent = max_concurrent or MAX_CONCURRENT
+        self.poll_seconds = POLL_SECONDS if poll_seconds is None else poll_seconds
+        self.lease_seconds = lease_seconds or LEASE_SECONDS
+        self.owner = owner or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self.clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix='scheduled-job')
+        self._running = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self):
+        """Create/sync the job rows; call once before tick()/run_forever()."""
+        with self.app.app_context():
+            ensure_scheduler_tables(self.db.session)
+            sync_job_definitions(self.db.session, self.jobs.values(), self.clock())
+
+    def tick(self):
+        """Renew leases of running jobs and start due ones while slots are free; returns names started."""
+        started = []
+        with self.app.app_context():
+            session = self.db.session
+            now = self.clock()
+            try:
+                with self._lock:
+                    running = list(self._running)
+                for name in running:
+                    renew_lease(session, name, self.owner, now, self.lease_seconds)
+
+                due = session.execute(text('''SELECT name, next_run_at FROM scheduled_jobs
+                                              WHERE enabled = 1 AND next_run_at <= :now
+                                                AND (lease_expires_at IS NULL OR lease_expires_at < :now)
+                                              ORDER BY next_run_at'''), {'now': now}).fetchall()
+                session.commit()
+                for row in due:
+                    job = self.jobs.get(row.name)
+                    if job is None or row.name in running:
+                        continue
+                    if len(running) + len(started) >= self.max_concurrent:
+                        break
+                    if not job.catchup and self._missed(row.next_run_at, now):
+                        # Missed while down and the job doesn't catch up: skip to the next slot
+                        session.execute(text('UPDATE scheduled_jobs SET next_run_at = :next WHERE name = :name'),
+                                        {'next': job.next_run(now), 'name': job.name})
+                        session.commit()
+                        continue
+                    if claim_job(session, job.name, self.owner, now, self.lease_seconds):
+                        with self._lock:
+                            self._running[job.name] = self._executor.submit(self._run, job)
+                        started.append(job.name)
+            except Exception as e:
+                session.rollback()
+                print(f"⚠️  Scheduler tick failed: {e}")
+        return started
+
+    def _missed(self, next_run_at, now):
+        if isinstance(next_run_at, str):
+            next_run_at = datetime.fromisoformat(next_run_at)
+        return (now - next_run_at).total_seconds() > max(self.poll_seconds * 2, 120)
+
+    def _run(self, job):
+        started_at = self.clock()
+        error = None
+        print(f"⏰ Scheduled job {job.name} started")
+        try:
+            with self.app.app_context():
+                job.func()
+        except Exception as e:
+            traceback.print_exc()
+            error = str(e) or e.__class__.__name__
+        finished_at = self.clock()
+        try:
+            with self.app.app_context():
+                record_run(self.db.session, job.name, self.owner, started_at, finished_at,
+                           job.next_run(finished_at), error)
+        except Exception as e:
+            print(f"⚠️  Could not record run of {job.name}: {e}")
+        finally:
+            with self._lock:
+                self._running.pop(job.name, None)
+        status = f"failed: {error}" if error else "finished"
+        print(f"{'❌' if error else '✅'} Scheduled job {job.name} {status} in {(finished_at - started_at).total_seconds():.1f}s")
+
+    def wait_idle(self, timeout=None):
+        """Block until no job is running (tests / shutdown)."""
+        with self._lock:
+            futures = list(self._running.values())
+        for future in futures:
+            future.result(timeout=timeout)
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            self.tick()
+            self._stop.wait(self.poll_seconds)
+
+    def stop(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,34 @@
+"""
+Dedicated background job worker
+Runs queued jobs (live RFP searches) from the background_jobs table in its own
+process, so scraping never competes with web requests. Start it alongside the
+web service and set JOB_WORKER_THREADS=0 on the web process:
+
+    python job_worker.py [THREADS]
+"""
+import os
+import sys
+import threading
+
+# The web app's in-process worker threads are not needed here
+os.environ.setdefault('JOB_WORKER_THREADS', '0')
+
+from app import app, db, JOB_HANDLERS  # noqa: E402
+from job_queue import JobWorker  # noqa: E402
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    workers = [JobWorker(app, db, JOB_HANDLERS) for _ in range(threads)]
+    print(f"⚙️  Job worker running {threads} thread(s) for: {', '.join(JOB_HANDLERS)}")
+    for worker in workers[1:]:
+        threading.Thread(target=worker.run_forever, daemon=True).start()
+    try:
+        workers[0].run_forever()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.stop()
+
+
+if __name__ == '__main__':
+    main()
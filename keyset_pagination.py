@@ -0,0 +1,117 @@
+"""
+Keyset (cursor) pagination for lead listings
+Pages are addressed by an opaque cursor holding the (sort value, id) of the
+row at the page boundary, so page N costs the same as page 1 (no OFFSET scan),
+and totals come from planner estimates or a short-lived cached COUNT instead
+of a COUNT(*) on every request.
+"""
+import base64
+import json
+import threading
+import time
+from sqlalchemy import text
+
+# Seconds an exact COUNT(*) is reused when the planner can't estimate (SQLite)
+COUNT_CACHE_TTL = 300
+
+_count_cache = {}
+_count_lock = threading.Lock()
+
+
+def encode_cursor(sort_value, row_id):
+    """Opaque URL-safe cursor for a (sort value, id) boundary."""
+    sort_value = None if sort_value is None else str(sort_value)
+    raw = json.dumps([sort_value, row_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (sort_value, id) from a cursor, or None if missing/malformed."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except Exception:
+        return None
+    if not isinstance(row_id, (int, str)) or not isinstance(sort_value, (str, type(None))):
+        return None
+    return sort_value, row_id
+
+
+def keyset_page(session, columns_sql, from_where_sql, params, sort_expr, id_expr='id',
+                after=None, before=None, limit=25):
+    """Fetch one page of a listing ordered by (sort_expr DESC, id_expr DESC).
+
+    from_where_sql must be a 'FROM ... WHERE ...' fragment (use 'WHERE 1=1' when
+    unfiltered). `after` continues to the next (older) page, `before` goes back
+    to the previous (newer) page; both are cursors from an earlier call.
+    sort_expr must not be NULL for listed rows.
+
+    Returns (rows, next_cursor, prev_cursor); cursors are None at either end.
+    """
+    params = dict(params or {})
+    after_key = decode_cursor(after)
+    before_key = None if after_key else decode_cursor(before)
+    sql = f'SELECT {columns_sql}, {sort_expr} AS keyset_sort, {id_expr} AS keyset_id {from_where_sql}'
+
+    if before_key:
+        sql += f' AND ({sort_expr} > :keyset_sort OR ({sort_expr} = :keyset_sort AND {id_expr} > :keyset_id))'
+        sql += f' ORDER BY {sort_expr} ASC, {id_expr} ASC'
+        params.update({'keyset_sort': before_key[0], 'keyset_id': before_key[1]})
+    else:
+        if after_key:
+            sql += f' AND ({sort_expr} < :keyset_sort OR ({sort_expr} = :keyset_sort AND {id_expr} < :keyset_id))'
+            params.update({'keyset_sort': after_key[0], 'keyset_id': after_key[1]})
+        sql += f' ORDER BY {sort_expr} DESC, {id_expr} DESC'
+    sql += ' LIMIT :keyset_limit'
+    params['keyset_limit'] = limit + 1
+
+    rows = session.execute(text(sql), params).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if before_key:
+        rows.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, after_key is not None
+
+    next_cursor = encode_cursor(rows[-1].keyset_sort, rows[-1].keyset_id) if rows and has_next else None
+    prev_cursor = encode_cursor(rows[0].keyset_sort, rows[0].keyset_id) if rows and has_prev else None
+    return rows, next_cursor, prev_cursor
+
+
+def approximate_count(session, from_where_sql, params=None):
+    """Approximate row count for a 'FROM ... WHERE ...' fragment.
+
+    PostgreSQL: the planner's row estimate (no table scan).
+    Other dialects: exact COUNT(*), cached per query/params for COUNT_CACHE_TTL.
+    """
+    params = dict(params or {})
+    if session.get_bind().dialect.name == 'postgresql':
+        try:
+            plan = session.execute(text(f'EXPLAIN (FORMAT JSON) SELECT 1 {from_where_sql}'), params).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+        except Exception as e:
+            session.rollback()
+            print(f"⚠️  Planner row estimate failed, falling back to COUNT: {e}")
+
+    key = (from_where_sql, tuple(sorted((k, str(v)) for k, v in params.items())))
+    now = time.time()
+    with _count_lock:
+        cached = _count_cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+    total = session.execute(text(f'SELECT COUNT(*) {from_where_sql}'), params).scalar() or 0
+    with _count_lock:
+        _count_cache[key] = (now + COUNT_CACHE_TTL, total)
+    return total
+
+
+def invalidate_counts():
+    """Drop cached counts (call after bulk ingests)."""
+    with _count_lock:
+        _count_cache.clear()
@@ -0,0 +1,260 @@
+"""
+Compiled multi-keyword matching
+Relevance filters (federal_relevance, the national scrapers, the Data.gov
+fetcher, the local government scraper) and the RFP / proposal compliance scans
+each looped `any(keyword in text_lower for keyword in ...)` over their own copy
+of the keyword list. KeywordMatcher compiles a keyword list once and scans a
+text in a single pass:
+
+- with pyahocorasick installed, an Aho-Corasick automaton (C, cost independent
+  of the number of keywords);
+- otherwise one regular expression with the keywords factored into a trie.
+  CPython's substring search beats the regex engine for short lists, so
+  without the automaton search() on lists under REGEX_MIN_KEYWORDS still uses
+  `in` (on a text lowered once) and only matches()/counts() use the regex.
+
+Matching is case-insensitive substring matching, exactly like the `in` checks
+it replaces ('janitor' matches 'Janitorial'), and matches() reports every
+occurrence of every keyword, overlapping ones included. Keywords listed in
+word_start only match at the start of a word ('porter' matches 'Porters' but
+not 'transporter' or 'supporter').
+
+Shared keyword sets are registered by name with a version; code that stores
+results computed from a set (federal_relevance.RELEVANCE_VERSION) bumps its own
+version when the set's version changes.
+
+Run `python keyword_matcher.py` for a benchmark on 100k synthetic descriptions.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+try:
+    import ahocorasick  # type: ignore
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    ahocorasick = None
+    AHOCORASICK_AVAILABLE = False
+
+Match = namedtuple('Match', 'keyword start end')
+
+# Below this many keywords, plain substring checks are faster than the regex
+REGEX_MIN_KEYWORDS = 32
+
+
+def _trie_pattern(keywords):
+    """Alternation with shared prefixes factored out; the longest keyword at a position wins."""
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for ch in keyword:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        if len(branches) == 1 and '' not in node:
+            return branches[0]
+        group = '(?:' + '|'.join(branches) + ')'
+        return group + '?' if '' in node else group
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """A keyword list compiled for single-pass, case-insensitive substring matching."""
+
+    def __init__(self, keywords, name=None, version=1, use_automaton=None, word_start=()):
+        seen = []
+        for keyword in keywords:
+            keyword = keyword.lower()
+            if keyword and keyword not in seen:
+                seen.append(keyword)
+        if not seen:
+            raise ValueError('KeywordMatcher needs at least one keyword')
+        self.keywords = tuple(seen)
+        self.word_start = frozenset(keyword.lower() for keyword in word_start) & set(self.keywords)
+        self._free_keywords = tuple(keyword for keyword in self.keywords if keyword not in self.word_start)
+        self._word_start_search = None
+        if self.word_start:
+            self._word_start_search = re.compile(
+                r'\b(?:' + '|'.join(re.escape(keyword) for keyword in sorted(self.word_start)) + ')').search
+        self.name = name
+        self.version = version
+        use_automaton = AHOCORASICK_AVAILABLE if use_automaton is None else use_automaton
+        self._automaton = None
+        if use_automaton:
+            automaton = ahocorasick.Automaton()
+            for keyword in self.keywords:
+                automaton.add_word(keyword, keyword)
+            automaton.make_automaton()
+            self._automaton = automaton
+        else:
+            pattern = _trie_pattern(self.keywords)
+            self._search = re.compile(pattern).search
+            # Zero-width lookahead so a match is tried at every position
+            self._scan = re.compile(f'(?=({pattern}))').finditer
+            # The regex reports the longest keyword starting at a position; shorter
+            # keywords that are prefixes of it start there too
+            self._prefixes = {keyword: tuple(other for other in self.keywords
+                                             if other != keyword and keyword.startswith(other))
+                              for keyword in self.keywords}
+
+    @property
+    def backend(self):
+        if self._automaton is not None:
+            return 'aho-corasick'
+        return 'regex' if len(self.keywords) >= REGEX_MIN_KEYWORDS else 'substring'
+
+    def search(self, text):
+        """True if any keyword occurs in text."""
+        if not text:
+            return False
+        lowered = text.lower()
+        if self._automaton is not None:
+            for end, keyword in self._automaton.iter(lowered):
+                if self._at_word_start(lowered, keyword, end - len(keyword) + 1):
+                    return True
+            return False
+        if len(self.keywords) < REGEX_MIN_KEYWORDS:
+            if any(keyword in lowered for keyword in self._free_keywords):
+                return True
+            return self._word_start_search is not None and self._word_start_search(lowered) is not None
+        if self.word_start:
+            return bool(self.matches(text))
+        return self._search(lowered) is not None
+
+    def _at_word_start(self, lowered, keyword, start):
+        return keyword not in self.word_start or start == 0 or not (lowered[start - 1].isalnum()
+                                                                    or lowered[start - 1] == '_')
+
+    def matches(self, text):
+        """Every keyword occurrence as Match(keyword, start, end), ordered by position.
+
+        Offsets index text.lower(), which equals text for ASCII input.
+        """
+        if not text:
+            return []
+        lowered = text.lower()
+        if self._automaton is not None:
+            found = [Match(keyword, end - len(keyword) + 1, end + 1) for end, keyword in self._automaton.iter(lowered)]
+        else:
+            found = []
+            for m in self._scan(lowered):
+                keyword = m.group(1)
+                start = m.start()
+                found.append(Match(keyword, start, start + len(keyword)))
+                found.extend(Match(prefix, start, start + len(prefix)) for prefix in self._prefixes[keyword])
+        if self.word_start:
+            found = [match for match in found if self._at_word_start(lowered, match.keyword, match.start)]
+        found.sort(key=lambda match: (match.start, -len(match.keyword)))
+        return found
+
+    def counts(self, text):
+        """{keyword: occurrences} for the keywords present in text."""
+        result = {}
+        for match in self.matches(text):
+            result[match.keyword] = result.get(match.keyword, 0) + 1
+        return result
+
+    def found(self, text):
+        """Set of distinct keywords present in text."""
+        return set(self.counts(text))
+
+    def score(self, text, weights=None):
+        """Share (0-1) of the keyword list present in text, optionally weighted per keyword."""
+        present = self.found(text)
+        if weights is None:
+            return len(present) / len(self.keywords)
+        total = sum(weights.get(keyword, 1) for keyword in self.keywords)
+        return sum(weights.get(keyword, 1) for keyword in present) / total if total else 0.0
+
+    def __repr__(self):
+        label = f'{self.name} v{self.version}' if self.name else f'{len(self.keywords)} keywords'
+        return f'<KeywordMatcher {label} ({self.backend})>'
+
+
+_KEYWORD_SETS = {}
+
+
+def register_keyword_set(name, version, keywords, word_start=()):
+    """Compile and register a shared, versioned keyword set; returns its matcher."""
+    matcher = KeywordMatcher(keywords, name=name, version=version, word_start=word_start)
+    _KEYWORD_SETS[name] = matcher
+    return matcher
+
+
+def get_keyword_set(name):
+    return _KEYWORD_SETS[name]
+
+
+@lru_cache(maxsize=256)
+def _cached_matcher(keywords, word_start):
+    return KeywordMatcher(keywords, word_start=word_start)
+
+
+def matcher_for(keywords, word_start=()):
+    """Matcher for an ad-hoc keyword list (per-source lists), compiled once per distinct list."""
+    return _cached_matcher(tuple(keywords), tuple(sorted(word_start)))
+
+
+# Cleaning/janitorial relevance: one list for every lead source.
+# v2 merged the federal_relevance, national scraper and Data.gov lists;
+# v3 stopped 'porter' matching inside transporter/supporter.
+CLEANING = register_keyword_set('cleaning', 3, [
+    'janitor', 'custodial', 'cleaning', 'housekeeping', 'porter', 'trash',
+    'sanitation', 'sanitiz', 'disinfect', 'floor care', 'carpet', 'window cleaning',
+    'sweeping', 'mopping', 'facilities maintenance', 'building maintenance',
+    'environmental services',
+], word_start=['porter'])
+
+# Data.gov bulk awards outside the cleaning NAICS codes are only taken on these
+# unambiguous terms; the broader CLEANING set would pull in trash haulage,
+# carpet sales and general building maintenance.
+CLEANING_STRICT = register_keyword_set('cleaning_strict', 1, [
+    'janitor', 'cleaning', 'custodial', 'housekeeping',
+    'sanitiz', 'disinfect', 'sweeping', 'mopping',
+])
+
+
+def benchmark(records=100000, seed=7):
+    """Compare the matcher with the any(keyword in text) loop it replaces."""
+    import random
+    import time
+
+    rng = random.Random(seed)
+    vocabulary = ['repair', 'services', 'contract', 'hvac', 'roof', 'supply', 'office', 'equipment', 'building',
+                  'support', 'engineering', 'software', 'network', 'vehicle', 'parts', 'medical', 'training',
+                  'security', 'guard', 'food', 'lodging', 'the', 'of', 'and', 'for', 'base', 'annual']
+    texts = []
+    for _ in range(records):
+        words = [rng.choice(vocabulary) for _ in range(rng.randint(8, 60))]
+        if rng.random() < 0.05:
+            words.insert(rng.randrange(len(words)), 'Janitorial')
+        texts.append(' '.join(words).title())
+
+    def timed(label, fn):
+        started = time.perf_counter()
+        hits = fn()
+        elapsed = time.perf_counter() - started
+        print(f"{label:<40} {elapsed * 1000:8.1f} ms  ({hits} matches)")
+        return elapsed
+
+    for size in (len(CLEANING.keywords), 60):
+        keywords = list(CLEANING.keywords) + [f'{w}-{i}' for i, w in enumerate(vocabulary * 3)][:size - len(CLEANING.keywords)]
+        print(f"\n{records} descriptions, {len(keywords)} keywords")
+        baseline = timed('any(keyword in text)', lambda: sum(
+            1 for t in texts if (lambda lower: any(k in lower for k in keywords))(t.lower())))
+        for use_automaton in ([False, True] if AHOCORASICK_AVAILABLE else [False]):
+            matcher = KeywordMatcher(keywords, use_automaton=use_automaton)
+            elapsed = timed(f'KeywordMatcher.search ({matcher.backend})',
+                            lambda: sum(1 for t in texts if matcher.search(t)))
+            print(f"{'':<40} {baseline / elapsed:8.2f}x")
+    if not AHOCORASICK_AVAILABLE:
+        print("\npyahocorasick not installed - substring/regex fallback only")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -2,12 +2,13 @@
 Local Virginia Government Website Scraper
 Fetches real cleaning contract opportunities from city/county procurement pages
 """
-import requests
 from bs4 import BeautifulSoup
 import re
 from datetime import datetime, timedelta
 import logging
 from urllib.parse import urljoin
+from http_cache import conditional_get, parse_with_cache
+from keyword_matcher import matcher_for
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -99,24 +100,32 @@ class VirginiaLocalGovScraper:
         contracts = []
         
         try:
-            response = requests.get(info['url'], headers=self.headers, timeout=10)
-            response.raise_for_status()
+            response, page_state = conditional_get('va_local_gov', info['url'], headers=self.headers, timeout=10)
+            if response.status_code != 304:
+                response.raise_for_status()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Look for contract listings (common patterns in government sites)
-            contract_elements = self._find_contract_elements(soup)
-            
-            for element in contract_elements:
-                contract = self._parse_contract_element(element, city, info)
-                if contract and self._is_cleaning_related(contract, info['keywords']):
-                    contracts.append(contract)
+            # Unchanged page (304 / same body hash): reuse the last run's contracts
+            contracts = parse_with_cache(page_state, self._parse_city_page, response, city, info)
             
         except Exception as e:
             logger.error(f"Error scraping {city}: {e}")
         
         return contracts
     
+    def _parse_city_page(self, response, city, info):
+        """Extract cleaning contracts from a fetched city procurement page"""
+        contracts = []
+        soup = BeautifulSoup(response.content, 'html.parser')
+        
+        # Look for contract listings (common patterns in government sites)
+        contract_elements = self._find_contract_elements(soup)
+        
+        for element in contract_elements:
+            contract = self._parse_contract_element(element, city, info)
+            if contract and self._is_cleaning_related(contract, info['keywords']):
+                contracts.append(contract)
+        return contracts
+    
     def _find_contract_elements(self, soup):
         """Find contract listing elements using common patterns"""
         elements = []
@@ -285,17 +294,9 @@ class VirginiaLocalGovScraper:
     
     def _is_cleaning_related(self, contract, keywords):
         """Check if contract is related to cleaning services"""
-        title = contract.get('title', '').lower()
-        description = contract.get('description', '').lower()
-        
-        combined_text = f"{title} {description}"
-        
-        # Check if any cleaning-related keyword is present
-        for keyword in keywords:
-            if keyword in combined_text:
-                return True
-        
-        return False
+        combined_text = f"{contract.get('title', '')} {contract.get('description', '')}"
+        # Per-source keyword lists are compiled once (keyword_matcher)
+        return matcher_for(keywords).search(combined_text)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,625 @@
+"""
+Pooled SMTP delivery and persistent outbound mail queue
+Every sender (Flask-Mail in app.py, email_notifications, src/email_service,
+external_email_service) used to open a new SMTP connection, STARTTLS and log
+in for each message, and bulk notifications looped over subscribers inside
+the request or scheduled job. All of them now go through mail_dispatcher:
+
+- the SMTP accounts those senders were configured with (MAIL_*, EMAIL_*,
+  SMTP_* variables) are registered as named providers: 'default',
+  'notifications', 'gmail' and 'external';
+- SMTP sessions are pooled per account (host, port, user): a logged-in
+  connection is reused for up to MAIL_MAX_PER_CONNECTION messages, closed
+  after MAIL_IDLE_SECONDS idle, and replaced transparently when the server
+  has dropped it;
+- each account has a token-bucket rate limit (MAIL_RATE_PER_SECOND, burst
+  MAIL_BURST) so bulk sends stay under the provider's limits;
+- once init_app() has a database, send()/send_batch() only write the
+  message to mail_messages (body stored once) and one mail_outbox row per
+  envelope, then queue a 'deliver_mail' background job (job_queue). The job -
+  and the 'mail_outbox' scheduled sweep, which also picks up retries - drain
+  the outbox through the pool, MAIL_POOL_SIZE messages at a time per account.
+  Transient failures are retried with exponential backoff (MAIL_RETRY_SECONDS,
+  doubled per attempt, up to MAIL_MAX_ATTEMPTS); 5xx rejections fail at once.
+- send_batch() renders nothing per recipient: a segment (one subject/body for
+  many recipients) is one mail_messages row; send_segments() calls a render
+  function once per segment.
+
+Without a database (scripts, MAIL_QUEUE_ENABLED=0) send() delivers
+immediately through the same pool.
+
+Stored bodies carry password-reset links and temporary passwords, so they are
+not kept: once every envelope of a message is sent or has failed for good,
+its html/body columns are set to NULL (subject and headers stay for the admin
+outbox view). purge_finished(), run daily by the 'mail_retention' scheduled
+job, deletes sent/failed rows older than MAIL_RETENTION_DAYS and scrubs any
+finished message that still has content.
+
+Configuration (environment):
+    MAIL_QUEUE_ENABLED       0 = deliver inline instead of queueing (default: 1)
+    MAIL_POOL_SIZE           SMTP connections per account (default: 2)
+    MAIL_MAX_PER_CONNECTION  messages per connection before it is recycled (default: 100)
+    MAIL_IDLE_SECONDS        idle connections older than this are closed (default: 60)
+    MAIL_RATE_PER_SECOND     messages per second per account (default: 10)
+    MAIL_BURST               token bucket size (default: 20)
+    MAIL_MAX_ATTEMPTS        delivery attempts before a message is failed (default: 5)
+    MAIL_RETRY_SECONDS       delay before the first retry (default: 60)
+    MAIL_CLAIM_BATCH         outbox rows claimed per drain step (default: 200)
+    MAIL_STALE_SECONDS       'sending' rows older than this are re-queued (default: 600)
+    MAIL_RETENTION_DAYS      sent/failed outbox rows are deleted after this many days (default: 30)
+"""
+import json
+import os
+import smtplib
+import socket
+import ssl
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import formataddr
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+from token_bucket import TokenBucket
+
+QUEUE_ENABLED = os.environ.get('MAIL_QUEUE_ENABLED', '1') == '1'
+POOL_SIZE = int(os.environ.get('MAIL_POOL_SIZE', 2))
+MAX_PER_CONNECTION = int(os.environ.get('MAIL_MAX_PER_CONNECTION', 100))
+IDLE_SECONDS = float(os.environ.get('MAIL_IDLE_SECONDS', 60))
+RATE_PER_SECOND = float(os.environ.get('MAIL_RATE_PER_SECOND', 10))
+BURST = int(os.environ.get('MAIL_BURST', 20))
+MAX_ATTEMPTS = int(os.environ.get('MAIL_MAX_ATTEMPTS', 5))
+RETRY_SECONDS = int(os.environ.get('MAIL_RETRY_SECONDS', 60))
+CLAIM_BATCH = int(os.environ.get('MAIL_CLAIM_BATCH', 200))
+STALE_SECONDS = int(os.environ.get('MAIL_STALE_SECONDS', 600))
+RETENTION_DAYS = int(os.environ.get('MAIL_RETENTION_DAYS', 30))
+
+JOB_KIND = 'deliver_mail'
+
+QUEUED = 'queued'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+Provider = namedtuple('Provider', 'name host port username password sender use_tls use_ssl timeout')
+
+
+def _is_postgres(session):
+    return session.get_bind().dialect.name == 'postgresql'
+
+
+def ensure_mail_tables(session):
+    """Create mail_messages / mail_outbox (idempotent)."""
+    pk = 'SERIAL PRIMARY KEY' if _is_postgres(session) else 'INTEGER PRIMARY KEY AUTOINCREMENT'
+    try:
+        session.execute(text('''CREATE TABLE IF NOT EXISTS mail_messages
+                     (id TEXT PRIMARY KEY,
+                      provider TEXT NOT NULL,
+                      sender TEXT,
+                      reply_to TEXT,
+                      subject TEXT,
+                      html TEXT,
+                      body TEXT,
+                      headers TEXT,
+                      segment TEXT,
+                      created_at TIMESTAMP)'''))
+        session.execute(text(f'''CREATE TABLE IF NOT EXISTS mail_outbox
+                     (id {pk},
+                      message_id TEXT NOT NULL,
+                      recipient TEXT NOT NULL,
+                      cc TEXT,
+                      bcc TEXT,
+                      status TEXT NOT NULL DEFAULT 'queued',
+                      attempts INTEGER DEFAULT 0,
+                      next_attempt_at TIMESTAMP,
+                      claimed_by TEXT,
+                      claimed_at TIMESTAMP,
+                      last_error TEXT,
+                      sent_at TIMESTAMP,
+                      created_at TIMESTAMP)'''))
+        session.execute(text('''CREATE INDEX IF NOT EXISTS idx_mail_outbox_due
+                                ON mail_outbox(status, next_attempt_at)'''))
+        session.execute(text('''CREATE INDEX IF NOT EXISTS idx_mail_outbox_message
+                                ON mail_outbox(message_id)'''))
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        print(f"⚠️  Mail outbox tables init error: {e}")
+        return False
+
+
+def _addresses(value):
+    """Comma-separated string or list of addresses -> list."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [address.strip() for address in value if address and address.strip()]
+
+
+def _sender(value):
+    """Flask-Mail style (name, address) tuples -> 'Name <address>'."""
+    if isinstance(value, (tuple, list)):
+        return formataddr(tuple(value))
+    return value
+
+
+def build_message(sender, to, subject, html=None, body=None, cc=None, reply_to=None, headers=None):
+    message = EmailMessage()
+    message['Subject'] = subject or ''
+    message['From'] = sender
+    message['To'] = ', '.join(_addresses(to))
+    if cc:
+        message['Cc'] = ', '.join(_addresses(cc))
+    if reply_to:
+        message['Reply-To'] = reply_to
+    for name, value in (headers or {}).items():
+        message[name] = value
+    if body is not None:
+        message.set_content(body)
+        if html is not None:
+            message.add_alternative(html, subtype='html')
+    else:
+        message.set_content(html or '', subtype='html')
+    return message
+
+
+def is_permanent_error(error):
+    """5xx rejections of the recipient, sender or data are not worth retrying."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    code = getattr(error, 'smtp_code', None)
+    return (isinstance(error, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError))
+            and code is not None and code >= 500)
+
+
+def smtp_connect(provider):
+    """Open, secure and authenticate one SMTP session."""
+    context = ssl.create_default_context()
+    if provider.use_ssl:
+        server = smtplib.SMTP_SSL(provider.host, provider.port, timeout=provider.timeout, context=context)
+    else:
+        server = smtplib.SMTP(provider.host, provider.port, timeout=provider.timeout)
+        if provider.use_tls:
+            server.starttls(context=context)
+    if provider.username:
+        server.login(provider.username, provider.password)
+    return server
+
+
+class _Connection:
+    def __init__(self, server):
+        self.server = server
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPPool:
+    """Up to `size` logged-in SMTP sessions for one account, reused across messages."""
+
+    def __init__(self, provider, size=None, max_per_connection=None, idle_seconds=None, connect=None):
+        self.provider = provider
+        self.size = POOL_SIZE if size is None else max(1, size)
+        self.max_per_connection = MAX_PER_CONNECTION if max_per_connection is None else max_per_connection
+        self.idle_seconds = IDLE_SECONDS if idle_seconds is None else idle_seconds
+        self._connect = connect or smtp_connect
+        self._idle = []
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.sent = 0
+
+    def _checkout(self):
+        now = time.monotonic()
+        stale = []
+        connection = None
+        with self._lock:
+            while self._idle:
+                candidate = self._idle.pop()
+                if now - candidate.last_used > self.idle_seconds:
+                    stale.append(candidate)
+                else:
+                    connection = candidate
+                    break
+        for old in stale:
+            self._quit(old)
+        if connection is None:
+            connection = _Connection(self._connect(self.provider))
+            with self._lock:
+                self.opened += 1
+        return connection
+
+    def _checkin(self, connection):
+        connection.last_used = time.monotonic()
+        if connection.sent >= self.max_per_connection:
+            self._quit(connection)
+            return
+        with self._lock:
+            self._idle.append(connection)
+
+    @staticmethod
+    def _quit(connection):
+        try:
+            connection.server.quit()
+        except Exception:
+            try:
+                connection.server.close()
+            except Exception:
+                pass
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            connection = self._checkout()
+            try:
+                yield connection
+            except Exception:
+                self._quit(connection)
+                raise
+            self._checkin(connection)
+        finally:
+            self._slots.release()
+
+    def send(self, message, from_addr, to_addrs):
+        """Send one message, reconnecting once if the pooled session was dropped by the server."""
+        for attempt in (1, 2):
+            try:
+                with self.connection() as connection:
+                    connection.server.send_message(message, from_addr=from_addr, to_addrs=to_addrs)
+                    connection.sent += 1
+                with self._lock:
+                    self.sent += 1
+                return
+            except (smtplib.SMTPServerDisconnected, ConnectionError) as e:
+                if attempt == 2:
+                    raise
+                print(f"⚠️  SMTP session to {self.provider.host} dropped ({e}); reconnecting")
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            self._quit(connection)
+
+    def stats(self):
+        with self._lock:
+            return {'size': self.size, 'idle': len(self._idle), 'opened': self.opened, 'sent': self.sent}
+
+
+class MailDispatcher:
+    """Providers, their pools and rate limits, and the mail_outbox queue."""
+
+    def __init__(self, engine=None, queue_enabled=None, pool_size=None, rate_per_second=None, burst=None,
+                 connect=None, submit_job=None):
+        self.engine = engine
+        self.queue_enabled = QUEUE_ENABLED if queue_enabled is None else queue_enabled
+        self.pool_size = POOL_SIZE if pool_size is None else pool_size
+        self.rate_per_second = RATE_PER_SECOND if rate_per_second is None else rate_per_second
+        self.burst = BURST if burst is None else burst
+        self._connect = connect
+        self._submit_job = submit_job
+        self._providers = {}
+        self._pools = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+
+    def init_app(self, app, engine, submit_job=None):
+        self.engine = engine
+        if submit_job is not None:
+            self._submit_job = submit_job
+        app.extensions['mail_dispatcher'] = self
+
+    # -- providers ------------------------------------------------------------
+
+    def register_provider(self, name, host, port=587, username=None, password=None, sender=None, use_tls=True,
+                          use_ssl=False, timeout=30):
+        self._providers[name] = Provider(name, host, int(port), username or None, password or None,
+                                         _sender(sender) or username, use_tls, use_ssl, timeout)
+
+    def has_provider(self, name):
+        provider = self._providers.get(name)
+        return bool(provider and provider.host and provider.username and provider.password)
+
+    def _pool(self, provider):
+        # Providers that log in to the same account share one pool and one rate limit
+        key = (provider.host, provider.port, provider.username)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = SMTPPool(provider, size=self.pool_size, connect=self._connect)
+                self._buckets[key] = TokenBucket(self.rate_per_second, capacity=self.burst)
+            return pool, self._buckets[key]
+
+    # -- sending ----------------------------------------------------------------
+
+    def deliver_now(self, provider_name, to, subject, html=None, body=None, sender=None, cc=None, bcc=None,
+                    reply_to=None, headers=None):
+        """Send synchronously through the pool; raises smtplib errors."""
+        provider = self._providers[provider_name]
+        sender = _sender(sender) or provider.sender
+        message = build_message(sender, to, subject, html=html, body=body, cc=cc, reply_to=reply_to,
+                                 headers=headers)
+        pool, bucket = self._pool(provider)
+        bucket.acquire()
+        pool.send(message, provider.username or sender, _addresses(to) + _addresses(cc) + _addresses(bcc))
+
+    def send(self, to, subject, html=None, body=None, provider='default', sender=None, cc=None, bcc=None,
+             reply_to=None, headers=None):
+        """Queue (or, without a database, deliver) one message; returns True unless it could not be."""
+        if not self.has_provider(provider):
+            print(f"⚠️  Mail provider '{provider}' not configured - email to {to} not sent")
+            return False
+        if not self._queueing():
+            try:
+                self.deliver_now(provider, to, subject, html=html, body=body, sender=sender, cc=cc, bcc=bcc,
+                                 reply_to=reply_to, headers=headers)
+                return True
+            except Exception as e:
+                print(f"❌ Error sending email to {to}: {e}")
+                return False
+        envelope = {'recipient': ', '.join(_addresses(to)), 'cc': ', '.join(_addresses(cc)) or None,
+                    'bcc': ', '.join(_addresses(bcc)) or None}
+        return self._enqueue(provider, subject, html, body, sender, reply_to, headers, None, [envelope]) == 1
+
+    def send_batch(self, recipients, subject, html=None, body=None, provider='default', sender=None,
+                   reply_to=None, headers=None, segment=None):
+        """One message (stored once) to many recipients, one envelope each; returns the number queued."""
+        recipients = [r for r in dict.fromkeys(_addresses(recipients))]
+        if not recipients:
+            return 0
+        if not self.has_provider(provider):
+            print(f"⚠️  Mail provider '{provider}' not configured - {len(recipients)} emails not sent")
+            return 0
+        if not self._queueing():
+            sent = 0
+            for recipient in recipients:
+                if self.send(recipient, subject, html=html, body=body, provider=provider, sender=sender,
+                             reply_to=reply_to, headers=headers):
+                    sent += 1
+            return sent
+        envelopes = [{'recipient': recipient, 'cc': None, 'bcc': None} for recipient in recipients]
+        return self._enqueue(provider, subject, html, body, sender, reply_to, headers, segment, envelopes)
+
+    def send_segments(self, segments, render, provider='default', sender=None):
+        """segments: {segment_key: recipients}; render(segment_key) -> (subject, html, body), called once each."""
+        queued = 0
+        for key, recipients in segments.items():
+            if not recipients:
+                continue
+            subject, html, body = render(key)
+            queued += self.send_batch(recipients, subject, html=html, body=body, provider=provider, sender=sender,
+                                      segment=str(key))
+        return queued
+
+    def _queueing(self):
+        return self.queue_enabled and self.engine is not None
+
+    def _enqueue(self, provider, subject, html, body, sender, reply_to, headers, segment, envelopes):
+        message_id = uuid.uuid4().hex
+        now = datetime.utcnow()
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(text('''INSERT INTO mail_messages
+                                     (id, provider, sender, reply_to, subject, html, body, headers, segment,
+                                      created_at)
+                                     VALUES (:id, :provider, :sender, :reply_to, :subject, :html, :body, :headers,
+                                             :segment, :now)'''),
+                             {'id': message_id, 'provider': provider, 'sender': _sender(sender),
+                              'reply_to': reply_to, 'subject': subject, 'html': html, 'body': body,
+                              'headers': json.dumps(headers) if headers else None, 'segment': segment,
+                              'now': now})
+                conn.execute(text('''INSERT INTO mail_outbox
+                                     (message_id, recipient, cc, bcc, status, attempts, next_attempt_at, created_at)
+                                     VALUES (:message_id, :recipient, :cc, :bcc, 'queued', 0, :now, :now)'''),
+                             [dict(envelope, message_id=message_id, now=now) for envelope in envelopes])
+        except Exception as e:
+            print(f"❌ Could not queue {len(envelopes)} email(s): {e}")
+            return 0
+        self._wake()
+        return len(envelopes)
+
+    def _wake(self):
+        """Queue a drain job (deduplicated); the scheduled sweep covers a missed wake-up."""
+        if self._submit_job is None:
+            return
+        try:
+            with Session(self.engine) as session:
+                self._submit_job(session, JOB_KIND, {}, dedupe_key=JOB_KIND)
+        except Exception as e:
+            print(f"⚠️  Could not queue mail delivery job: {e}")
+
+    # -- draining the outbox ----------------------------------------------------
+
+    def deliver_pending(self, max_seconds=None, limit=None, progress=None):
+        """Send due outbox rows until none are left (or max_seconds passed); returns counts."""
+        if self.engine is None:
+            return {'sent': 0, 'retried': 0, 'failed': 0}
+        limit = limit or CLAIM_BATCH
+        started = time.monotonic()
+        totals = {'sent': 0, 'retried': 0, 'failed': 0}
+        self._requeue_stale()
+        while max_seconds is None or time.monotonic() - started < max_seconds:
+            rows = self._claim(limit)
+            if not rows:
+                break
+            for key, count in self._deliver_rows(rows).items():
+                totals[key] += count
+            if progress is not None:
+                progress(**totals)
+        if any(totals.values()):
+            print(f"📧 Mail outbox: {totals['sent']} sent, {totals['retried']} to retry, {totals['failed']} failed")
+        return totals
+
+    def _requeue_stale(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=STALE_SECONDS)
+        with self.engine.begin() as conn:
+            conn.execute(text('''UPDATE mail_outbox SET status = 'queued', claimed_by = NULL
+                                 WHERE status = 'sending' AND claimed_at < :cutoff'''), {'cutoff': cutoff})
+
+    def _claim(self, limit):
+        now = datetime.utcnow()
+        with self.engine.begin() as conn:
+            ids = [row.id for row in conn.execute(text('''SELECT id FROM mail_outbox
+                                                          WHERE status = 'queued' AND next_attempt_at <= :now
+                                                          ORDER BY id LIMIT :limit'''),
+                                                  {'now': now, 'limit': limit})]
+            if not ids:
+                return []
+            # Conditional on status, so concurrent drainers never claim the same row
+            conn.execute(text('''UPDATE mail_outbox
+                                 SET status = 'sending', claimed_by = :worker, claimed_at = :now,
+                                     attempts = attempts + 1
+                                 WHERE id IN :ids AND status = 'queued' ''').bindparams(
+                                     bindparam('ids', expanding=True)),
+                         {'worker': self.worker_id, 'now': now, 'ids': ids})
+            return conn.execute(text('''SELECT o.id, o.message_id, o.recipient, o.cc, o.bcc, o.attempts, m.provider, m.sender,
+                                               m.reply_to, m.subject, m.html, m.body, m.headers
+                                        FROM mail_outbox o JOIN mail_messages m ON m.id = o.message_id
+                                        WHERE o.id IN :ids AND o.status = 'sending' AND o.claimed_by = :worker
+                                        ORDER BY o.id''').bindparams(bindparam('ids', expanding=True)),
+                                {'worker': self.worker_id, 'ids': ids}).fetchall()
+
+    def _deliver_one(self, row):
+        try:
+            if row.provider not in self._providers:
+                raise RuntimeError(f"mail provider '{row.provider}' not configured in this process")
+            self.deliver_now(row.provider, row.recipient, row.subject, html=row.html, body=row.body,
+                             sender=row.sender, cc=row.cc, bcc=row.bcc, reply_to=row.reply_to,
+                             headers=json.loads(row.headers) if row.headers else None)
+            return row, None
+        except Exception as e:
+            return row, e
+
+    def _deliver_rows(self, rows):
+        now = datetime.utcnow()
+        sent, retry, failed = [], [], []
+        with ThreadPoolExecutor(max_workers=max(1, self.pool_size)) as executor:
+            for row, error in executor.map(self._deliver_one, rows):
+                if error is None:
+                    sent.append({'id': row.id, 'now': now})
+                elif is_permanent_error(error) or row.attempts >= MAX_ATTEMPTS:
+                    failed.append({'id': row.id, 'error': str(error)[:500], 'now': now})
+                else:
+                    delay = RETRY_SECONDS * 2 ** (row.attempts - 1)
+                    retry.append({'id': row.id, 'error': str(error)[:500],
+                                  'next': now + timedelta(seconds=delay)})
+        with self.engine.begin() as conn:
+            if sent:
+                conn.execute(text('''UPDATE mail_outbox SET status = 'sent', sent_at = :now, claimed_by = NULL,
+                                            last_error = NULL
+                                     WHERE id = :id'''), sent)
+            if retry:
+                conn.execute(text('''UPDATE mail_outbox SET status = 'queued', next_attempt_at = :next,
+                                            claimed_by = NULL, last_error = :error
+                                     WHERE id = :id'''), retry)
+            if failed:
+                conn.execute(text('''UPDATE mail_outbox SET status = 'failed', claimed_by = NULL,
+                                            last_error = :error, sent_at = NULL
+                                     WHERE id = :id'''), failed)
+            if sent or failed:
+                _scrub_finished(conn, sorted({row.message_id for row in rows}))
+        return {'sent': len(sent), 'retried': len(retry), 'failed': len(failed)}
+
+    def purge_finished(self, retention_days=None):
+        """Delete sent/failed mail older than the retention window; returns the number of outbox rows removed."""
+        if self.engine is None:
+            return 0
+        days = RETENTION_DAYS if retention_days is None else retention_days
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        with self.engine.begin() as conn:
+            removed = conn.execute(text('''DELETE FROM mail_outbox
+                                           WHERE status IN ('sent', 'failed')
+                                           AND COALESCE(sent_at, claimed_at, created_at) < :cutoff'''),
+                                   {'cutoff': cutoff}).rowcount
+            conn.execute(text('''DELETE FROM mail_messages
+                                 WHERE created_at < :cutoff
+                                 AND NOT EXISTS (SELECT 1 FROM mail_outbox o WHERE o.message_id = mail_messages.id)'''),
+                         {'cutoff': cutoff})
+            _scrub_finished(conn)
+        if removed:
+            print(f"🧹 Mail outbox: purged {removed} delivered/failed message(s) older than {days} days")
+        return removed
+
+    # -- reporting ----------------------------------------------------------------
+
+    def outbox_counts(self):
+        if self.engine is None:
+            return {}
+        with self.engine.connect() as conn:
+            return {row.status: row.count for row in conn.execute(text(
+                'SELECT status, COUNT(*) AS count FROM mail_outbox GROUP BY status'))}
+
+    def stats(self):
+        with self._lock:
+            pools = {f'{host}:{port}/{user}': dict(pool.stats(),
+                                                   rate_wait_seconds=round(self._buckets[(host, port, user)].waited, 2))
+                     for (host, port, user), pool in self._pools.items()}
+        return {'queue_enabled': self._queueing(), 'providers': sorted(self._providers), 'pools': pools}
+
+    def close(self):
+        with self._lock:
+            pools = list(self._pools.values())
+        for pool in pools:
+            pool.close()
+
+
+def _scrub_finished(conn, message_ids=None):
+    """NULL the html/body of messages with no queued or sending envelopes left."""
+    sql = '''UPDATE mail_messages SET html = NULL, body = NULL
+             WHERE (html IS NOT NULL OR body IS NOT NULL)
+             AND NOT EXISTS (SELECT 1 FROM mail_outbox o WHERE o.message_id = mail_messages.id
+                             AND o.status IN ('queued', 'sending'))'''
+    if message_ids is None:
+        return conn.execute(text(sql))
+    return conn.execute(text(sql + ' AND id IN :ids').bindparams(bindparam('ids', expanding=True)),
+                        {'ids': message_ids})
+
+
+def register_providers_from_env(dispatcher):
+    """The SMTP accounts the existing senders are configured with, under one name each."""
+    env = os.environ.get
+    dispatcher.register_provider('default', env('MAIL_SERVER', 'smtp.gmail.com'), env('MAIL_PORT', 587),
+                                 env('MAIL_USERNAME'), env('MAIL_PASSWORD'),
+                                 env('MAIL_DEFAULT_SENDER') or env('MAIL_USERNAME'),
+                                 use_tls=env('MAIL_USE_TLS', 'True').lower() == 'true',
+                                 use_ssl=env('MAIL_USE_SSL', 'False').lower() == 'true')
+    # email_notifications (transactional mail)
+    dispatcher.register_provider('notifications', env('EMAIL_HOST', 'smtp.gmail.com'), env('EMAIL_PORT', 587),
+                                 env('EMAIL_USER'), env('EMAIL_PASSWORD'),
+                                 (env('EMAIL_FROM_NAME', 'ContractLink AI'), env('EMAIL_FROM', env('EMAIL_USER', ''))))
+    # src/email_service (briefings)
+    dispatcher.register_provider('gmail', 'smtp.gmail.com', 587, env('EMAIL_USER'), env('EMAIL_PASS'),
+                                 env('EMAIL_USER'))
+    # external_email_service (admin mail to outside addresses)
+    external_user = env('SMTP_USER', env('EMAIL_USER', ''))
+    dispatcher.register_provider('external', env('SMTP_HOST', 'smtp.gmail.com'), env('SMTP_PORT', 587),
+                                 external_user, env('SMTP_PASSWORD', env('EMAIL_PASSWORD', '')),
+                                 (env('FROM_NAME', 'ContractLink.ai'), env('FROM_EMAIL', external_user)))
+
+
+mail_dispatcher = MailDispatcher()
+register_providers_from_env(mail_dispatcher)
+
+
+class FlaskMailAdapter:
+    """Drop-in for flask_mail.Mail.send(): Message objects go through the dispatcher."""
+
+    def __init__(self, dispatcher, provider='default'):
+        self.dispatcher = dispatcher
+        self.provider = provider
+
+    def send(self, message):
+        headers = dict(message.extra_headers or {}) or None
+        if not self.dispatcher.send(message.recipients, message.subject, html=message.html, body=message.body,
+                                    provider=self.provider, sender=message.sender, cc=message.cc,
+                                    bcc=message.bcc, reply_to=message.reply_to, headers=headers):
+            raise RuntimeError(f"Email to {', '.join(message.recipients or [])} could not be sent")
@@ -0,0 +1,39 @@
+"""
+Schema migration runner
+Applies pending schema migrations (app.SCHEMA_MIGRATIONS) and re-provisions
+the admin2 account. Run once per deploy, before the web workers start;
+gunicorn.conf.py does this from the master process:
+
+    python migrate.py            # apply pending migrations
+    python migrate.py --status   # list applied / pending versions
+"""
+import os
+import sys
+
+# Only this script migrates; the import must not start workers or a scheduler
+os.environ['SCHEMA_AUTO_MIGRATE'] = '0'
+os.environ['SCHEDULER_MODE'] = 'off'
+os.environ['JOB_WORKER_THREADS'] = '0'
+
+from app import app, db, SCHEMA_MIGRATIONS, run_schema_migrations  # noqa: E402
+from schema_migrations import migration_status  # noqa: E402
+
+
+def main():
+    if '--status' in sys.argv[1:]:
+        with app.app_context():
+            for row in migration_status(db.session, SCHEMA_MIGRATIONS):
+                state = f"applied {row['applied_at']} ({row['duration_seconds']}s)" if row['applied_at'] else 'pending'
+                print(f"{row['version']:>4}  {row['name']:<24} {state}")
+        return 0
+    try:
+        applied = run_schema_migrations()
+    except Exception as e:
+        print(f"❌ Migration run failed: {e}")
+        return 1
+    print(f"✅ Schema up to date ({len(applied)} migration(s) applied)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
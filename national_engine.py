@@ -117,7 +117,8 @@ class NationalProcurementScraper:
         """
         all_contracts = []
         
-        with ThreadPoolExecutor(max_workers=7) as executor:
+        # Scraper threads only parse; their HTTP runs on the shared async engine
+        with ThreadPoolExecutor(max_workers=len(self.scrapers)) as executor:
             # Submit all scraper tasks
             future_to_scraper = {
                 executor.submit(self._run_scraper, name, scraper): name
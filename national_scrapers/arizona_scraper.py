@@ -43,6 +43,19 @@ class ArizonaScraper(BaseScraper):
             logger.error("Failed to fetch Arizona procurement page")
             return []
         
+        # Unchanged page (304 / same body hash): reuse the last run's contracts
+        return self.parse_cached(response, self._parse_page)
+    
+    def _parse_page(self, response) -> List[Dict[str, Any]]:
+        """
+        Extract cleaning-related contracts from the fetched search page.
+        
+        Args:
+            response: Fetched page
+            
+        Returns:
+            List of standardized contracts
+        """
         soup = self.parse_html(response)
         if not soup:
             return []
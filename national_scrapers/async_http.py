@@ -0,0 +1,218 @@
+"""
+Async HTTP engine shared by all national procurement scrapers
+One httpx.AsyncClient (keep-alive pool, HTTP/2 when the h2 package is
+installed) runs on a background event loop. Requests are limited per host, so
+a sweep touching many portals is bounded by the slowest host rather than the
+sum of every page, and retries back off with asyncio.sleep instead of
+blocking a thread.
+
+Synchronous scrapers use it through BaseScraper.fetch_page / fetch_pages.
+
+Configuration (environment):
+    SCRAPER_PER_HOST_CONCURRENCY  concurrent requests per host (default: 2)
+    SCRAPER_MAX_CONNECTIONS       total pooled connections (default: 20)
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import threading
+from typing import Dict, List, Optional
+from urllib.parse import urljoin, urlparse
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401  (optional dependency)
+        return True
+    except ImportError:
+        return False
+
+
+class AsyncFetchEngine:
+    """
+    Pooled async HTTP client with per-host concurrency limits and non-blocking backoff.
+    """
+
+    # Backoff schedule (seconds), mirroring the original BaseScraper.fetch_page
+    FORBIDDEN_DELAY = 5
+    RATE_LIMIT_DELAY = 30
+    TIMEOUT_DELAY = 10
+    ERROR_DELAY = 5
+    MAX_RETRY_AFTER = 120
+
+    def __init__(self, per_host_limit: Optional[int] = None, max_connections: Optional[int] = None,
+                 http2: Optional[bool] = None, transport: Optional[httpx.AsyncBaseTransport] = None,
+                 backoff_scale: float = 1.0):
+        """
+        Args:
+            per_host_limit: Concurrent requests allowed per host
+            max_connections: Size of the shared connection pool
+            http2: Force HTTP/2 on/off (default: on when h2 is installed)
+            transport: Custom httpx transport (tests use httpx.MockTransport)
+            backoff_scale: Multiplier applied to every retry delay
+        """
+        self.per_host_limit = per_host_limit or int(os.environ.get('SCRAPER_PER_HOST_CONCURRENCY', 2))
+        self.max_connections = max_connections or int(os.environ.get('SCRAPER_MAX_CONNECTIONS', 20))
+        self.http2 = _http2_available() if http2 is None else http2
+        self.transport = transport
+        self.backoff_scale = backoff_scale
+        self._loop = None
+        self._thread = None
+        self._client = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._start_lock = threading.Lock()
+
+    # ----- event loop -----
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever,
+                                                name='scraper-http-loop', daemon=True)
+                self._thread.start()
+        return self._loop
+
+    def run(self, coro):
+        """Run a coroutine on the engine loop and wait for its result (callable from any thread)."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    def close(self):
+        """Close pooled connections and stop the loop."""
+        if self._loop is None:
+            return
+        if self._client is not None:
+            self.run(self._client.aclose())
+            self._client = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+        self._loop = None
+        self._host_limits.clear()
+
+    # ----- internals (run on the engine loop) -----
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            limits = httpx.Limits(max_connections=self.max_connections,
+                                  max_keepalive_connections=self.max_connections)
+            self._client = httpx.AsyncClient(http2=self.http2, limits=limits, transport=self.transport,
+                                             follow_redirects=True)
+        return self._client
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc.lower()
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_limits[host]
+
+    async def _sleep(self, seconds: float):
+        await asyncio.sleep(seconds * self.backoff_scale)
+
+    def _retry_after(self, response: httpx.Response) -> float:
+        try:
+            return min(float(response.headers.get('Retry-After', '')), self.MAX_RETRY_AFTER)
+        except ValueError:
+            return self.RATE_LIMIT_DELAY
+
+    # ----- public API -----
+    async def fetch(self, url: str, method: str = 'GET', data: Optional[Dict] = None,
+                    headers: Optional[Dict] = None, timeout: int = 30,
+                    max_retries: int = 3) -> Optional[httpx.Response]:
+        """
+        Fetch a page with retries. Same status handling as BaseScraper.fetch_page:
+        200 (and 304 for conditional requests) returns the response, 403 retries
+        with Referer/Origin, 404 and other statuses return None, 429 waits for
+        Retry-After.
+        """
+        client = self._get_client()
+        request_headers = dict(headers or {})
+
+        for attempt in range(max_retries):
+            try:
+                async with self._host_limit(url):
+                    if method.upper() == 'POST':
+                        response = await client.post(url, data=data, headers=request_headers, timeout=timeout)
+                    else:
+                        response = await client.get(url, headers=request_headers, timeout=timeout)
+
+                # Backoff happens outside the host slot so other requests keep flowing
+                if response.status_code == 200:
+                    return response
+
+                elif response.status_code == 304:
+                    # Conditional GET hit; the caller's HTTP cache holds the page
+                    return response
+
+                elif response.status_code == 403:
+                    logger.warning(f"403 Forbidden for {url}, retrying with enhanced headers (attempt {attempt + 1}/{max_retries})")
+                    request_headers['Referer'] = urljoin(url, '/')
+                    request_headers['Origin'] = urljoin(url, '/')
+                    await self._sleep(self.FORBIDDEN_DELAY)
+                    continue
+
+                elif response.status_code == 404:
+                    logger.error(f"404 Not Found: {url} - URL may have changed")
+                    return None
+
+                elif response.status_code == 429:
+                    delay = self._retry_after(response)
+                    logger.warning(f"429 Rate Limited for {url}, waiting {delay:.0f} seconds...")
+                    await self._sleep(delay)
+                    continue
+
+                else:
+                    logger.warning(f"HTTP {response.status_code} for {url}")
+                    return None
+
+            except httpx.TimeoutException:
+                logger.warning(f"Timeout for {url} (attempt {attempt + 1}/{max_retries})")
+                await self._sleep(self.TIMEOUT_DELAY * (attempt + 1))
+                continue
+
+            except httpx.ConnectError as e:
+                if isinstance(e.__cause__, socket.gaierror) or isinstance(e.__context__, socket.gaierror):
+                    logger.error(f"DNS failure for {url}: {e}")
+                    return None
+                logger.error(f"Request failed for {url}: {e}")
+                if attempt < max_retries - 1:
+                    await self._sleep(self.ERROR_DELAY * (attempt + 1))
+                    continue
+                return None
+
+            except httpx.HTTPError as e:
+                logger.error(f"Request failed for {url}: {e}")
+                if attempt < max_retries - 1:
+                    await self._sleep(self.ERROR_DELAY * (attempt + 1))
+                    continue
+                return None
+
+        logger.error(f"Failed to fetch {url} after {max_retries} attempts")
+        return None
+
+    async def fetch_all(self, urls: List[str], **kwargs) -> List[Optional[httpx.Response]]:
+        """Fetch many URLs concurrently (per-host limits still apply); results keep input order."""
+        return await asyncio.gather(*(self.fetch(url, **kwargs) for url in urls))
+
+    def fetch_sync(self, url: str, **kwargs) -> Optional[httpx.Response]:
+        return self.run(self.fetch(url, **kwargs))
+
+    def fetch_all_sync(self, urls: List[str], **kwargs) -> List[Optional[httpx.Response]]:
+        return self.run(self.fetch_all(urls, **kwargs))
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> AsyncFetchEngine:
+    """Process-wide engine, so every scraper shares one connection pool and host limits."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AsyncFetchEngine()
+        return _engine
@@ -3,17 +3,20 @@ Enhanced BaseScraper for National Procurement System
 Supports JSON, RSS, XML, HTML parsing with robust error handling
 """
 
+import asyncio
 import requests
+import httpx
 import logging
-import time
-import socket
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
 import feedparser
 import json
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 
+from http_cache import get_http_cache
+from keyword_matcher import CLEANING, matcher_for
+from .async_http import AsyncFetchEngine, get_engine
+
 logger = logging.getLogger(__name__)
 
 
@@ -33,12 +36,8 @@ class BaseScraper:
         'Upgrade-Insecure-Requests': '1'
     }
     
-    CLEANING_KEYWORDS = [
-        'janitorial', 'custodial', 'cleaning', 'housekeeping', 
-        'sanitation', 'facilities maintenance', 'building maintenance',
-        'floor care', 'carpet cleaning', 'window cleaning',
-        'disinfection', 'environmental services', 'porter'
-    ]
+    # Shared cleaning keyword set (keyword_matcher.CLEANING); subclasses may override
+    CLEANING_KEYWORDS = CLEANING.keywords
     
     NAICS_CODES = {
         '561720': 'Janitorial Services',
@@ -55,15 +54,23 @@ class BaseScraper:
             source_name: Identifier for this scraper (e.g., 'symphony', 'demandstar')
         """
         self.source_name = source_name
+        # Holds default headers; requests go through the shared async engine
         self.session = requests.Session()
         self.session.headers.update(self.DEFAULT_HEADERS)
+        self.engine: AsyncFetchEngine = get_engine()
+        self.http_cache = get_http_cache()
         logger.info(f"Initialized {source_name} scraper")
     
     def fetch_page(self, url: str, method: str = 'GET', data: Optional[Dict] = None,
                    headers: Optional[Dict] = None, timeout: int = 30,
-                   max_retries: int = 3) -> Optional[requests.Response]:
+                   max_retries: int = 3) -> Optional[httpx.Response]:
         """
         Fetch a page with retry logic and comprehensive error handling.
+
+        Runs on the shared async engine (pooled keep-alive connections, per-host
+        limits, non-blocking backoff); blocks only the calling thread. GETs are
+        conditional: the response carries a page_state for parse_cached(), and
+        may be a 304 when the page hasn't changed since the last run.
         
         Args:
             url: Target URL
@@ -76,63 +83,69 @@ class BaseScraper:
         Returns:
             Response object or None if failed
         """
+        conditional = method.upper() == 'GET'
+        request_headers = self._request_headers(headers, url if conditional else None)
+        response = self.engine.fetch_sync(url, method=method, data=data, headers=request_headers,
+                                          timeout=timeout, max_retries=max_retries)
+        if conditional:
+            self._observe(url, response)
+        return response
+
+    def fetch_pages(self, urls: List[str], headers=None, timeout: int = 30,
+                    max_retries: int = 3) -> List[Optional[httpx.Response]]:
+        """
+        Fetch several pages concurrently (conditional GETs) on the shared async engine.
+
+        Args:
+            urls: Target URLs
+            headers: Additional headers - one dict for every request, or a list parallel to urls
+            timeout: Request timeout in seconds
+            max_retries: Number of retry attempts per URL
+
+        Returns:
+            Responses (or None for failures) in the same order as urls
+        """
+        per_url = headers if isinstance(headers, list) else [headers] * len(urls)
+
+        async def fetch_all():
+            return await asyncio.gather(*(
+                self.engine.fetch(url, headers=self._request_headers(extra, url),
+                                  timeout=timeout, max_retries=max_retries)
+                for url, extra in zip(urls, per_url)))
+
+        responses = self.engine.run(fetch_all())
+        for url, response in zip(urls, responses):
+            self._observe(url, response)
+        return responses
+
+    def parse_cached(self, response, parse):
+        """
+        Run parse(response), or return the stored result when the page is unchanged
+        (304, or identical body hash) since it was last parsed.
+        """
+        state = getattr(response, 'page_state', None)
+        if self.http_cache is None or state is None:
+            return parse(response)
+        return self.http_cache.parse(state, parse, response)
+
+    def _request_headers(self, headers: Optional[Dict] = None, conditional_url: Optional[str] = None) -> Dict[str, str]:
+        request_headers = dict(self.session.headers)
         if headers:
-            request_headers = {**self.session.headers, **headers}
-        else:
-            request_headers = self.session.headers
-        
-        for attempt in range(max_retries):
-            try:
-                if method.upper() == 'POST':
-                    response = self.session.post(url, data=data, headers=request_headers, timeout=timeout)
-                else:
-                    response = self.session.get(url, headers=request_headers, timeout=timeout)
-                
-                # Handle various HTTP status codes
-                if response.status_code == 200:
-                    return response
-                
-                elif response.status_code == 403:
-                    logger.warning(f"403 Forbidden for {url}, retrying with enhanced headers (attempt {attempt + 1}/{max_retries})")
-                    # Add additional headers for retry
-                    request_headers['Referer'] = urljoin(url, '/')
-                    request_headers['Origin'] = urljoin(url, '/')
-                    time.sleep(5)
-                    continue
-                
-                elif response.status_code == 404:
-                    logger.error(f"404 Not Found: {url} - URL may have changed")
-                    return None
-                
-                elif response.status_code == 429:
-                    logger.warning(f"429 Rate Limited for {url}, waiting 30 seconds...")
-                    time.sleep(30)
-                    continue
-                
-                else:
-                    logger.warning(f"HTTP {response.status_code} for {url}")
-                    return None
-                    
-            except socket.gaierror as e:
-                logger.error(f"DNS failure for {url}: {e}")
-                return None
-            
-            except requests.exceptions.Timeout:
-                logger.warning(f"Timeout for {url} (attempt {attempt + 1}/{max_retries})")
-                time.sleep(10 * (attempt + 1))  # Exponential backoff
-                continue
-            
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Request failed for {url}: {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(5 * (attempt + 1))
-                    continue
-                return None
-        
-        logger.error(f"Failed to fetch {url} after {max_retries} attempts")
-        return None
+            request_headers.update(headers)
+        if conditional_url and self.http_cache is not None:
+            request_headers.update(self.http_cache.conditional_headers(self.source_name, conditional_url))
+        return request_headers
+
+    def _observe(self, url: str, response) -> None:
+        if response is None or self.http_cache is None:
+            return
+        try:
+            response.page_state = self.http_cache.observe(self.source_name, url, response.status_code,
+                                                          response.headers, response.content)
+        except Exception as e:
+            logger.warning(f"HTTP cache update failed for {url}: {e}")
     
-    def parse_html(self, response: requests.Response) -> Optional[BeautifulSoup]:
+    def parse_html(self, response: httpx.Response) -> Optional[BeautifulSoup]:
         """
         Parse HTML response into BeautifulSoup object.
         
@@ -148,7 +161,7 @@ class BaseScraper:
             logger.error(f"Failed to parse HTML: {e}")
             return None
     
-    def parse_json(self, response: requests.Response) -> Optional[Dict]:
+    def parse_json(self, response: httpx.Response) -> Optional[Dict]:
         """
         Parse JSON response.
         
@@ -193,11 +206,8 @@ class BaseScraper:
         Returns:
             True if cleaning-related
         """
-        if not text:
-            return False
-        
-        text_lower = text.lower()
-        return any(keyword in text_lower for keyword in self.CLEANING_KEYWORDS)
+        # Subclass lists keep the shared set's word-start rules ('porter' but not 'transporter')
+        return matcher_for(self.CLEANING_KEYWORDS, word_start=CLEANING.word_start).search(text)
     
     def get_naics_description(self, naics_code: str) -> Optional[str]:
         """
@@ -267,21 +267,34 @@ class MultiStateDirectScraper(BaseScraper):
         for state_code in states:
             if state_code not in self.STATE_PORTALS:
                 logger.warning(f"State {state_code} not configured for direct scraping")
-                continue
-            
-            logger.info(f"Scraping {state_code} direct portal")
-            contracts = self._scrape_state(state_code)
+        states = [s for s in states if s in self.STATE_PORTALS]
+        
+        # Every portal is a different host, so all states download concurrently
+        logger.info(f"Scraping {len(states)} direct state portals")
+        urls = [self.STATE_PORTALS[s]['url'] for s in states]
+        responses = self.fetch_pages(urls, headers=[self._portal_headers(url) for url in urls])
+        for state_code, response in zip(states, responses):
+            contracts = self._scrape_state(state_code, response=response)
             all_contracts.extend(contracts)
         
         logger.info(f"Direct portal scraper found {len(all_contracts)} total opportunities")
         return all_contracts
     
-    def _scrape_state(self, state_code: str) -> List[Dict[str, Any]]:
+    def _portal_headers(self, url: str) -> Dict[str, str]:
+        """State-specific request headers for a portal URL."""
+        return {
+            **self.DEFAULT_HEADERS,
+            'Referer': url,
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8'
+        }
+    
+    def _scrape_state(self, state_code: str, response=None) -> List[Dict[str, Any]]:
         """
         Scrape a single state's direct portal.
         
         Args:
             state_code: 2-letter state code
+            response: Already-fetched portal page (fetched here when omitted)
             
         Returns:
             List of contracts
@@ -290,18 +303,27 @@ class MultiStateDirectScraper(BaseScraper):
         state_name = portal['name']
         url = portal['url']
         
-        # Add state-specific headers
-        headers = {
-            **self.DEFAULT_HEADERS,
-            'Referer': url,
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8'
-        }
-        
-        response = self.fetch_page(url, headers=headers)
+        if response is None:
+            response = self.fetch_page(url, headers=self._portal_headers(url))
         if not response:
             logger.error(f"Failed to fetch {state_name} portal")
             return []
         
+        # Unchanged portals (304 / same body hash) reuse the last run's contracts
+        return self.parse_cached(response, lambda page: self._parse_portal_page(state_code, page))
+    
+    def _parse_portal_page(self, state_code: str, response) -> List[Dict[str, Any]]:
+        """
+        Extract cleaning-related contracts from a state portal page.
+        
+        Args:
+            state_code: 2-letter state code
+            response: Fetched portal page
+            
+        Returns:
+            List of contracts
+        """
+        state_name = self.STATE_PORTALS[state_code]['name']
         soup = self.parse_html(response)
         if not soup:
             return []
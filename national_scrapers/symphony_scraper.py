@@ -73,36 +73,54 @@ class SymphonyScraper(BaseScraper):
         for state_code in states:
             if state_code not in self.SYMPHONY_STATES:
                 logger.warning(f"State {state_code} not in Symphony platform")
-                continue
-            
-            logger.info(f"Scraping Symphony for {state_code}")
-            contracts = self._scrape_state(state_code)
+        states = [s for s in states if s in self.SYMPHONY_STATES]
+        
+        # Fetch every state's page concurrently, then parse
+        logger.info(f"Scraping Symphony for {len(states)} states")
+        responses = self.fetch_pages([self._state_url(s) for s in states])
+        for state_code, response in zip(states, responses):
+            contracts = self._scrape_state(state_code, response=response)
             all_contracts.extend(contracts)
         
         logger.info(f"Symphony scraper found {len(all_contracts)} total opportunities")
         return all_contracts
     
-    def _scrape_state(self, state_code: str) -> List[Dict[str, Any]]:
+    def _state_url(self, state_code: str) -> str:
+        """Symphony public event search URL for a state."""
+        org_name = self.SYMPHONY_STATES[state_code]['org']
+        return f"{self.BASE_URL}/apps/Router/PublicEvent?OrgName={org_name}"
+    
+    def _scrape_state(self, state_code: str, response=None) -> List[Dict[str, Any]]:
         """
         Scrape a single Symphony state.
         
         Args:
             state_code: 2-letter state code
+            response: Already-fetched page (fetched here when omitted)
             
         Returns:
             List of contracts for this state
         """
-        state_info = self.SYMPHONY_STATES[state_code]
-        org_name = state_info['org']
-        
-        # Symphony public event search URL
-        url = f"{self.BASE_URL}/apps/Router/PublicEvent?OrgName={org_name}"
-        
-        response = self.fetch_page(url)
+        if response is None:
+            response = self.fetch_page(self._state_url(state_code))
         if not response:
             logger.error(f"Failed to fetch Symphony page for {state_code}")
             return []
         
+        # Unchanged pages (304 / same body hash) reuse the last run's contracts
+        return self.parse_cached(response, lambda page: self._parse_state_page(state_code, page))
+    
+    def _parse_state_page(self, state_code: str, response) -> List[Dict[str, Any]]:
+        """
+        Extract cleaning-related contracts from a Symphony state page.
+        
+        Args:
+            state_code: 2-letter state code
+            response: Fetched page
+            
+        Returns:
+            List of contracts for this state
+        """
         soup = self.parse_html(response)
         if not soup:
             return []
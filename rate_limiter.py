@@ -0,0 +1,328 @@
+"""
+Shared rate limiting
+Limits used to live in per-process dicts of timestamp lists (TWOFA_ATTEMPTS,
+email_rate_limits): every gunicorn worker counted separately, a worker
+recycled after max_requests forgot its counts, and the lists grew with every
+user. RateLimiter keeps the state in a store shared by all workers and
+applies GCRA (generic cell rate algorithm): each key holds a single number,
+its theoretical arrival time (TAT), so a check is one O(1) atomic update.
+
+    emission = period / limit
+    new_tat  = max(tat, now) + emission
+    allowed  = new_tat - now <= period
+
+A limit of N per period allows a burst of N, then one more request every
+period / N seconds - a sliding window without storing timestamps.
+
+Stores:
+    RedisStore   - a Lua script (GET/compare/SET PX) per check
+    SQLStore     - one INSERT .. ON CONFLICT DO UPDATE .. WHERE .. RETURNING
+                   on the app's PostgreSQL database, or on a SQLite file
+                   shared by the workers on the host
+    MemoryStore  - per-process fallback
+
+Configuration (environment):
+    RATE_LIMIT_ENABLED      1 | 0 (default: 1)
+    RATE_LIMIT_BACKEND      redis | database | sqlite | memory
+                            (default: redis if a URL is set, database on PostgreSQL, else sqlite)
+    RATE_LIMIT_REDIS_URL / REDIS_URL
+    RATE_LIMIT_SQLITE_PATH  (default: <APP_DATA_DIR>/rate_limits.sqlite3, the private 0700
+                            directory cache_layer uses; the file is created 0600)
+    RATE_LIMIT_PROXY_COUNT  reverse proxies in front of the app whose X-Forwarded-For
+                            entries are trusted (default: 1 on Render, else 0)
+    RATE_LIMIT_FAIL_OPEN    1 | 0 (default: 1) - allow requests when the store errors
+
+Flask apps can set RATELIMIT_ENABLED in app.config; it defaults to off when
+app.testing is set.
+"""
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+from functools import wraps
+
+from flask import current_app, has_app_context, has_request_context, jsonify, make_response, request, session
+from sqlalchemy import create_engine, text
+
+from cache_layer import private_data_path
+
+ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+FAIL_OPEN = os.environ.get('RATE_LIMIT_FAIL_OPEN', '1') == '1'
+PROXY_COUNT = int(os.environ.get('RATE_LIMIT_PROXY_COUNT', '1' if os.environ.get('RENDER') else '0'))
+
+# Expired keys are purged every this many checks (SQL and memory stores)
+PURGE_EVERY = 1000
+
+RateLimitResult = namedtuple('RateLimitResult', 'allowed remaining retry_after')
+
+
+def gcra(tat, now, limit, period, cost=1):
+    """(allowed, new_tat, retry_after, remaining) for a key whose stored TAT is `tat` (None if unseen)."""
+    emission = period / limit
+    base = max(tat or now, now)
+    new_tat = base + emission * cost
+    if new_tat - now > period:
+        return False, base, new_tat - now - period, 0
+    return True, new_tat, 0.0, int((period - (new_tat - now)) // emission)
+
+
+def _result(allowed, tat, now, limit, period):
+    emission = period / limit
+    if allowed:
+        return RateLimitResult(True, max(0, int((period - (tat - now)) // emission)), 0.0)
+    return RateLimitResult(False, 0, max(0.0, (tat or now) + emission - now - period))
+
+
+class MemoryStore:
+    """Per-process TATs; only for development or when no shared store is reachable."""
+
+    def __init__(self):
+        self._tats = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def apply(self, key, now, increment, period):
+        """Atomically advance key by `increment` if the result stays within period; returns (allowed, tat)."""
+        with self._lock:
+            self._calls += 1
+            if self._calls % PURGE_EVERY == 0:
+                self._tats = {k: v for k, v in self._tats.items() if v > now}
+            base = max(self._tats.get(key, now), now)
+            if base + increment - now > period:
+                return False, base
+            self._tats[key] = base + increment
+            return True, base + increment
+
+    def get(self, key):
+        with self._lock:
+            return self._tats.get(key)
+
+    def delete(self, key):
+        with self._lock:
+            self._tats.pop(key, None)
+
+
+class SQLStore:
+    """TATs in a rate_limits table; each check is a single conditional upsert."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._greatest = 'GREATEST' if engine.dialect.name == 'postgresql' else 'MAX'
+        self._calls = 0
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _ensure_table(self):
+        # On first use rather than at import, so app start-up runs no DDL
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            with self.engine.begin() as conn:
+                if self.engine.dialect.name == 'sqlite':
+                    conn.exec_driver_sql('PRAGMA journal_mode=WAL')
+                real = 'DOUBLE PRECISION' if self.engine.dialect.name == 'postgresql' else 'REAL'
+                conn.execute(text(f'''CREATE TABLE IF NOT EXISTS rate_limits
+                                      (key TEXT PRIMARY KEY, tat {real} NOT NULL)'''))
+            self._ready = True
+
+    def apply(self, key, now, increment, period):
+        self._ensure_table()
+        self._calls += 1
+        with self.engine.begin() as conn:
+            if self._calls % PURGE_EVERY == 0:
+                conn.execute(text('DELETE FROM rate_limits WHERE tat < :now'), {'now': now})
+            row = conn.execute(text(f'''
+                INSERT INTO rate_limits (key, tat) VALUES (:key, :now + :inc)
+                ON CONFLICT (key) DO UPDATE SET tat = {self._greatest}(rate_limits.tat, :now) + :inc
+                WHERE {self._greatest}(rate_limits.tat, :now) + :inc - :now <= :period
+                RETURNING tat'''), {'key': key, 'now': now, 'inc': increment, 'period': period}).fetchone()
+            if row is not None:
+                return True, row[0]
+            return False, conn.execute(text('SELECT tat FROM rate_limits WHERE key = :key'), {'key': key}).scalar()
+
+    def get(self, key):
+        self._ensure_table()
+        with self.engine.connect() as conn:
+            return conn.execute(text('SELECT tat FROM rate_limits WHERE key = :key'), {'key': key}).scalar()
+
+    def delete(self, key):
+        self._ensure_table()
+        with self.engine.begin() as conn:
+            conn.execute(text('DELETE FROM rate_limits WHERE key = :key'), {'key': key})
+
+
+_REDIS_GCRA = '''
+local now = tonumber(ARGV[1])
+local tat = tonumber(redis.call('GET', KEYS[1]) or ARGV[1])
+if tat < now then tat = now end
+local new_tat = tat + tonumber(ARGV[2])
+if new_tat - now > tonumber(ARGV[3]) then return {0, tostring(tat)} end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {1, tostring(new_tat)}
+'''
+
+
+class RedisStore:
+    """TATs in Redis (or any Redis-protocol server); keys expire when their TAT passes."""
+
+    def __init__(self, url, prefix='ratelimit:'):
+        import redis  # optional dependency
+        self.client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self.prefix = prefix
+        self._script = self.client.register_script(_REDIS_GCRA)
+
+    def apply(self, key, now, increment, period):
+        allowed, tat = self._script(keys=[self.prefix + key], args=[repr(now), repr(increment), repr(period)])
+        return bool(int(allowed)), float(tat)
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return float(value) if value is not None else None
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+def build_store(engine=None):
+    """Store from environment; falls back to MemoryStore when the configured one is unavailable."""
+    redis_url = os.environ.get('RATE_LIMIT_REDIS_URL') or os.environ.get('REDIS_URL')
+    default = 'redis' if redis_url else ('database' if engine is not None and engine.dialect.name == 'postgresql'
+                                         else 'sqlite')
+    backend = os.environ.get('RATE_LIMIT_BACKEND', default).lower()
+    try:
+        if backend == 'redis' and redis_url:
+            return RedisStore(redis_url)
+        if backend == 'database' and engine is not None:
+            return SQLStore(engine)
+        if backend == 'sqlite':
+            path = os.environ.get('RATE_LIMIT_SQLITE_PATH') or private_data_path('rate_limits.sqlite3')
+            return SQLStore(create_engine(f'sqlite:///{path}', connect_args={'timeout': 5}))
+    except Exception as e:
+        print(f"⚠️  Rate limit store unavailable ({backend}), limiting per worker only: {e}")
+    return MemoryStore()
+
+
+def client_ip():
+    """Client address, taking the entry appended by our own reverse proxies from X-Forwarded-For."""
+    if PROXY_COUNT:
+        forwarded = [part.strip() for part in request.headers.get('X-Forwarded-For', '').split(',') if part.strip()]
+        if len(forwarded) >= PROXY_COUNT:
+            return forwarded[-PROXY_COUNT]
+    return request.remote_addr or 'unknown'
+
+
+def user_or_ip():
+    """Signed-in user id, else client address."""
+    user_id = session.get('user_id')
+    return f'user:{user_id}' if user_id else f'ip:{client_ip()}'
+
+
+def _default_limited_response(result):
+    message = f'Too many requests. Please try again in {math.ceil(result.retry_after)} seconds.'
+    if request.path.startswith('/api/') or request.is_json or request.accept_mimetypes.best == 'application/json':
+        return jsonify({'success': False, 'error': message, 'message': message,
+                        'retry_after': math.ceil(result.retry_after)}), 429
+    return message, 429
+
+
+class RateLimiter:
+    """GCRA limits over a shared store, with a decorator for Flask views."""
+
+    def __init__(self, store=None, enabled=None, fail_open=None, clock=time.time):
+        self.store = store
+        self.enabled = ENABLED if enabled is None else enabled
+        self.fail_open = FAIL_OPEN if fail_open is None else fail_open
+        self._clock = clock
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app, engine=None):
+        if self.store is None:
+            self.store = build_store(engine)
+        app.extensions['rate_limiter'] = self
+
+    def _active(self):
+        if not self.enabled:
+            return False
+        if has_app_context():
+            return current_app.config.get('RATELIMIT_ENABLED', not current_app.testing)
+        return True
+
+    def _count(self, name, outcome):
+        with self._lock:
+            counts = self._counts.setdefault(name, {'allowed': 0, 'limited': 0, 'errors': 0})
+            counts[outcome] += 1
+
+    def _store(self):
+        if self.store is None:
+            self.store = build_store()
+        return self.store
+
+    def hit(self, name, key, limit, period, cost=1):
+        """Count one request for (name, key); RateLimitResult says whether it is within limit per period."""
+        if not self._active():
+            return RateLimitResult(True, limit, 0.0)
+        now = self._clock()
+        try:
+            allowed, tat = self._store().apply(f'{name}:{key}', now, period / limit * cost, period)
+        except Exception as e:
+            self._count(name, 'errors')
+            print(f"⚠️  Rate limit check failed for {name}: {e}")
+            return RateLimitResult(self.fail_open, 0, 0.0 if self.fail_open else 1.0)
+        self._count(name, 'allowed' if allowed else 'limited')
+        return _result(allowed, tat, now, limit, period)
+
+    def peek(self, name, key, limit, period):
+        """Whether the next hit would be allowed, without counting one."""
+        if not self._active():
+            return RateLimitResult(True, limit, 0.0)
+        now = self._clock()
+        try:
+            tat = self._store().get(f'{name}:{key}')
+        except Exception as e:
+            self._count(name, 'errors')
+            print(f"⚠️  Rate limit check failed for {name}: {e}")
+            return RateLimitResult(self.fail_open, 0, 0.0)
+        allowed, _, retry_after, remaining = gcra(tat, now, limit, period)
+        return RateLimitResult(allowed, remaining + 1 if allowed else 0, retry_after)
+
+    def reset(self, name, key):
+        try:
+            self._store().delete(f'{name}:{key}')
+        except Exception as e:
+            print(f"⚠️  Rate limit reset failed for {name}: {e}")
+
+    def limit(self, name, limit, period, key=user_or_ip, methods=None, on_limit=None):
+        """View decorator: at most `limit` requests per `period` seconds per key() (None skips the check).
+
+        on_limit(result) builds the response for a limited request (default: 429, JSON for API calls);
+        a Retry-After header is added either way.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapped(*args, **kwargs):
+                if methods and request.method not in methods:
+                    return view(*args, **kwargs)
+                ident = key() if has_request_context() else None
+                if ident is None:
+                    return view(*args, **kwargs)
+                result = self.hit(name, ident, limit, period)
+                if result.allowed:
+                    return view(*args, **kwargs)
+                response = make_response((on_limit or _default_limited_response)(result))
+                response.headers['Retry-After'] = str(max(1, math.ceil(result.retry_after)))
+                return response
+            return wrapped
+        return decorator
+
+    def stats(self):
+        with self._lock:
+            counts = {name: dict(values) for name, values in self._counts.items()}
+        return {'enabled': self.enabled, 'backend': type(self.store).__name__ if self.store else None,
+                'limits': counts}
+
+
+rate_limiter = RateLimiter()
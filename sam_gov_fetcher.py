@@ -1,14 +1,105 @@
 import requests
 import os
+import json
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 import logging
 import time
 import random
 
+from token_bucket import TokenBucket
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+class SweepCheckpoint:
+    """JSON Lines file recording finished (state, NAICS) searches of today's sweep.
+
+    Each finished pair stores its parsed contracts, so a run that was killed
+    (deploy, worker recycle) resumes where it stopped and still returns the
+    full result set. The first line holds the run key (lookback + UTC date); a
+    new day or a different lookback starts a fresh sweep. mark_done() appends
+    one line per pair, so a sweep writes each result once; the file is
+    compacted on load when it holds duplicate or torn lines, and removed by
+    clear().
+    """
+
+    def __init__(self, path, run_key):
+        self.path = path
+        self.run_key = run_key
+        self._lock = threading.Lock()
+        self.completed = {}
+        self._has_header = False
+        records = 0
+        try:
+            with open(path) as fh:
+                lines = fh.read().splitlines()
+            header = json.loads(lines[0]) if lines else {}
+            if header.get('run_key') == run_key:
+                self._has_header = True
+                for line in lines[1:]:
+                    records += 1
+                    try:
+                        record = json.loads(line)
+                        self.completed[record['pair']] = record['contracts']
+                    except (ValueError, KeyError, TypeError):
+                        # A line torn by a crash mid-write; that pair is fetched again
+                        continue
+        except (OSError, ValueError, AttributeError):
+            pass
+        if self._has_header and records != len(self.completed):
+            self._compact()
+
+    @staticmethod
+    def pair_key(state, naics):
+        return f"{state}:{naics}"
+
+    def get(self, state, naics):
+        return self.completed.get(self.pair_key(state, naics))
+
+    @staticmethod
+    def _line(record):
+        return json.dumps(record, separators=(',', ':')) + '\n'
+
+    def _compact(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w') as fh:
+                fh.write(self._line({'run_key': self.run_key}))
+                for pair, contracts in self.completed.items():
+                    fh.write(self._line({'pair': pair, 'contracts': contracts}))
+            os.replace(tmp_path, self.path)
+            self._has_header = True
+        except OSError as e:
+            logger.warning(f"Could not compact SAM.gov sweep checkpoint: {e}")
+
+    def mark_done(self, state, naics, contracts):
+        with self._lock:
+            key = self.pair_key(state, naics)
+            self.completed[key] = contracts
+            try:
+                # A stale or missing file is replaced by this run's header
+                with open(self.path, 'a' if self._has_header else 'w') as fh:
+                    if not self._has_header:
+                        fh.write(self._line({'run_key': self.run_key}))
+                    fh.write(self._line({'pair': key, 'contracts': contracts}))
+                self._has_header = True
+            except OSError as e:
+                logger.warning(f"Could not write SAM.gov sweep checkpoint: {e}")
+
+    def clear(self):
+        with self._lock:
+            self.completed = {}
+            self._has_header = False
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
 class SAMgovFetcher:
     """Fetch real federal cleaning contracts from SAM.gov API with Data.gov fallback"""
     
@@ -57,6 +148,15 @@ class SAMgovFetcher:
             self.target_states = [s.strip().upper() for s in env_states.split(',') if s.strip()]
         else:
             self.target_states = default_states
+
+        # Sweep concurrency and the shared request budget (SAM_GOV_RATE_LIMIT is requests/minute)
+        self.max_workers = max(1, int(os.environ.get('SAM_FETCH_WORKERS', 6)))
+        self.rate_limiter = TokenBucket(float(os.environ.get('SAM_GOV_RATE_LIMIT', 10)) / 60.0,
+                                        capacity=int(os.environ.get('SAM_GOV_RATE_BURST', 5)))
+        self.checkpoint_path = os.environ.get('SAM_CHECKPOINT_PATH') or os.path.join(
+            tempfile.gettempdir(), 'sam_gov_sweep_checkpoint.jsonl')
+        self._abort = threading.Event()
+        self.completed_pairs = []
     
     def fetch_with_throttle(self, urls, delay=2):
         """
@@ -93,18 +193,24 @@ class SAMgovFetcher:
         """
         return self.fetch_us_cleaning_contracts(days_back=days_back)
 
-    def fetch_us_cleaning_contracts(self, days_back=90, states=None):
+    def fetch_us_cleaning_contracts(self, days_back=90, states=None, posted_from=None):
         """
         Fetch real cleaning contracts across the United States.
 
         - Iterates states (env-configurable via SAM_TARGET_STATES)
         - Applies NAICS filtering for cleaning-related opportunities
-        - Handles pagination with throttling and backoff
+        - Runs state x NAICS searches on a bounded thread pool (SAM_FETCH_WORKERS)
+          paced by one shared token bucket (SAM_GOV_RATE_LIMIT req/min)
+        - Checkpoints each finished state/NAICS pair so an interrupted sweep resumes
         - Falls back to Data.gov after repeated failures
 
         Args:
             days_back: Lookback window in days
             states: Optional list of state codes to search; defaults to configured target_states
+            posted_from: Optional {(state, naics): date} start dates for incremental syncs;
+                pairs not listed use the full days_back window
+
+        After the call, self.completed_pairs lists the (state, naics) searches that finished.
 
         Returns:
             List[dict]: Contracts ready for DB insertion
@@ -114,40 +220,54 @@ class SAMgovFetcher:
             logger.info("🔄 Falling back to Data.gov...")
             return self._fallback_to_datagov(days_back)
         
-        all_contracts = []
-        seen_notice_ids = set()
         states_to_search = states or self.target_states
         # Allow limiting states per run to reduce rate limits if needed
         max_states = int(os.environ.get('SAM_MAX_STATES_PER_RUN', len(states_to_search)))
         states_to_search = states_to_search[:max_states]
+
+        run_key = f"{datetime.utcnow().date().isoformat()}:{days_back}"
+        checkpoint = SweepCheckpoint(self.checkpoint_path, run_key)
+        pairs = [(state, naics) for state in states_to_search for naics in self.naics_codes]
+        pending = [p for p in pairs if checkpoint.get(*p) is None]
+        posted_from = posted_from or {}
+        self.completed_pairs = []
+        if len(pending) < len(pairs):
+            logger.info(f"♻️  Resuming SAM.gov sweep: {len(pairs) - len(pending)}/{len(pairs)} searches already done")
         
         try:
             self.retry_attempts += 1
-            
-            # Search each state
-            for state in states_to_search:
-                logger.info(f"🔍 Searching {state} contracts...")
-                
-                # Search for each NAICS code in this state
-                for idx, naics in enumerate(self.naics_codes):
-                    logger.info(f"  NAICS {naics} in {state}...")
-                    contracts = self._search_contracts(naics, days_back, state)
-                    for c in contracts:
-                        nid = c.get('notice_id')
-                        if nid and nid in seen_notice_ids:
-                            continue
-                        if nid:
-                            seen_notice_ids.add(nid)
-                        all_contracts.append(c)
-                    
-                    # Stagger requests to minimize rate limiting
-                    if idx < len(self.naics_codes) - 1 or state != states_to_search[-1]:
-                        # Slightly higher sleep for nationwide runs
-                        base = 1.5 if len(states_to_search) <= 3 else 2.5
-                        jitter = 1.5 if len(states_to_search) <= 3 else 2.0
-                        sleep_s = base + random.random() * jitter
-                        logger.info(f"  Sleeping {sleep_s:.1f}s to avoid rate limits...")
-                        time.sleep(sleep_s)
+            self._abort.clear()
+            started = time.time()
+            logger.info(f"🔍 Searching {len(pending)} state/NAICS combinations with {self.max_workers} workers...")
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                futures = {pool.submit(self._search_contracts, naics, days_back, state,
+                                       posted_from.get((state, naics))): (state, naics)
+                           for state, naics in pending}
+                for future in as_completed(futures):
+                    state, naics = futures[future]
+                    contracts = future.result()
+                    # None means the search did not finish (retries exhausted / aborted): leave it for the next run
+                    if contracts is not None:
+                        checkpoint.mark_done(state, naics, contracts)
+
+            # Merge in the original state/NAICS order so results are stable across resumed runs
+            all_contracts = []
+            seen_notice_ids = set()
+            for state, naics in pairs:
+                for c in checkpoint.get(state, naics) or []:
+                    nid = c.get('notice_id')
+                    if nid and nid in seen_notice_ids:
+                        continue
+                    if nid:
+                        seen_notice_ids.add(nid)
+                    all_contracts.append(c)
+
+            self.completed_pairs = [p for p in pairs if checkpoint.get(*p) is not None]
+            logger.info(f"⏱️  SAM.gov sweep took {time.time() - started:.0f}s "
+                        f"({len(self.completed_pairs)}/{len(pairs)} searches complete)")
+            if len(self.completed_pairs) == len(pairs):
+                checkpoint.clear()
             
             if all_contracts:
                 logger.info(f"✅ Fetched {len(all_contracts)} real contracts across {len(states_to_search)} state(s)")
@@ -167,8 +287,12 @@ class SAMgovFetcher:
                 return self._fallback_to_datagov(days_back)
             return []
     
-    def _search_contracts(self, naics_code, days_back, state='VA'):
-        """Search SAM.gov for contracts with specific NAICS code with pagination"""
+    def _search_contracts(self, naics_code, days_back, state='VA', posted_from=None):
+        """Search SAM.gov for contracts with specific NAICS code with pagination.
+
+        Returns parsed contracts, or None when the search could not be
+        completed (so the sweep checkpoint leaves it pending).
+        """
         headers = {
             'Accept': 'application/json',
             'User-Agent': 'DMV-Contracts-Fetcher/1.0 (+https://example.com)'
@@ -179,13 +303,17 @@ class SAMgovFetcher:
         # Lower default max pages to reduce rate limit pressure; can be overridden via env
         max_pages = int(os.environ.get('SAM_MAX_PAGES_PER_NAICS', 2))
         all_items = []
+        seen_ids = set()
+
+        # Build date window as YYYY-MM-DD strings (SAM.gov expects dates, not offsets)
+        now = datetime.utcnow().date()
+        from_date = (posted_from or (now - timedelta(days=days_back))).strftime('%Y-%m-%d')
+        to_date = now.strftime('%Y-%m-%d')
 
         try:
             for page_idx in range(max_pages):
-                # Build date window as YYYY-MM-DD strings (SAM.gov expects dates, not offsets)
-                now = datetime.utcnow().date()
-                from_date = (now - timedelta(days=days_back)).strftime('%Y-%m-%d')
-                to_date = now.strftime('%Y-%m-%d')
+                if self._abort.is_set():
+                    return None
                 params = {
                     'api_key': self.api_key,
                     'postedFrom': from_date,
@@ -204,11 +332,23 @@ class SAMgovFetcher:
 
                 response = self._request_with_retries(self.base_url, params=params, headers=headers)
                 if response is None:
-                    break
+                    return None
 
                 data = response.json()
                 opportunities = data.get('opportunitiesData', []) or []
-                all_items.extend(opportunities)
+
+                # New postings shift offsets between pages; drop repeats and stop on a page with nothing new
+                new_items = []
+                for opp in opportunities:
+                    nid = opp.get('noticeId')
+                    if nid and nid in seen_ids:
+                        continue
+                    if nid:
+                        seen_ids.add(nid)
+                    new_items.append(opp)
+                all_items.extend(new_items)
+                if opportunities and not new_items:
+                    break
 
                 # Determine if there's another page
                 total_records = data.get('totalRecords') or data.get('totalrecords') or data.get('total')
@@ -221,25 +361,25 @@ class SAMgovFetcher:
                 if len(opportunities) < limit:
                     break
 
-                # Move to next page with a small jitter to avoid rate limits
                 offset += limit
-                sleep_s = 0.8 + random.random() * 1.2
-                logger.info(f"Fetched page {page_idx+1} for NAICS {naics_code} (items: {len(opportunities)}). Sleeping {sleep_s:.1f}s before next page...")
-                time.sleep(sleep_s)
+                logger.info(f"Fetched page {page_idx+1} for NAICS {naics_code} in {state} (items: {len(opportunities)})")
 
             return [self._parse_opportunity(opp) for opp in all_items]
 
         except requests.exceptions.RequestException as e:
             logger.error(f"Error fetching from SAM.gov: {e}")
-            return []
+            return None
         except Exception as e:
             logger.error(f"Error parsing SAM.gov response: {e}")
-            return []
+            return None
 
     def _request_with_retries(self, url, params, headers, max_retries=5, base_delay=2.0):
-        """HTTP GET with exponential backoff and jitter for 429/5xx"""
+        """HTTP GET paced by the shared token bucket, with backoff and jitter for 429/5xx"""
         attempt = 0
         while attempt <= max_retries:
+            if self._abort.is_set():
+                return None
+            self.rate_limiter.acquire()
             try:
                 resp = requests.get(url, params=params, headers=headers, timeout=30)
                 
@@ -252,10 +392,11 @@ class SAMgovFetcher:
                             logger.error(f"❌ INVALID SAM.gov API KEY: {error_msg}")
                             logger.error(f"   Current key starts with: {params.get('api_key', '')[:20]}...")
                             logger.error(f"   Get a valid key from: https://open.gsa.gov/api/sam-gov-entity-api/")
-                            return None
                     except:
                         pass
                     logger.error(f"SAM.gov access denied (403). Check API key validity.")
+                    # Every other worker would get the same answer; stop the sweep
+                    self._abort.set()
                     return None
                 
                 # Handle rate limiting
@@ -272,8 +413,8 @@ class SAMgovFetcher:
                     # Cap wait time at 60 seconds maximum
                     delay = min(delay, 60)
                     
-                    logger.warning(f"SAM.gov rate limit hit (429). Retrying in {delay:.1f}s...")
-                    time.sleep(delay)
+                    logger.warning(f"SAM.gov rate limit hit (429). Pausing all workers for {delay:.1f}s...")
+                    self.rate_limiter.pause_for(delay)
                     attempt += 1
                     continue
 
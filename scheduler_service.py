@@ -0,0 +1,35 @@
+"""
+Scheduler service
+Runs the recurring ingest jobs (app.SCHEDULED_JOBS) and, with
+JOB_WORKER_THREADS > 0, queued background jobs in a process of its own.
+gunicorn.conf.py starts it next to the web workers; with
+SCHEDULER_MODE=external run it yourself:
+
+    python scheduler_service.py
+"""
+import os
+import time
+
+# Importing app must not start a second scheduler thread
+os.environ['SCHEDULER_MODE'] = 'service'
+
+import app as web_app  # noqa: E402
+
+
+def main():
+    # The app's startup block already registered the jobs (SCHEDULER_MODE=service)
+    scheduler = web_app.job_scheduler or web_app.start_background_jobs_once()
+    print(f"⏰ Scheduler service running {len(scheduler.jobs)} jobs as {scheduler.owner}")
+    while True:
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            scheduler.stop()
+            break
+        except Exception as e:
+            print(f"❌ Scheduler loop error: {e}")
+            time.sleep(scheduler.poll_seconds)
+
+
+if __name__ == '__main__':
+    main()
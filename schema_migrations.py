@@ -0,0 +1,129 @@
+"""
+Versioned schema migrations
+The schema bootstrap (CREATE TABLE IF NOT EXISTS / ALTER TABLE guards, seeds)
+used to run on every import of app.py, i.e. in every gunicorn worker each time
+it was recycled. It is now a list of numbered migrations applied once per
+deploy by `python migrate.py` (gunicorn.conf.py runs it in the master before
+any worker starts). Applied versions are recorded in schema_migrations, so
+importing the app only has to check the highest applied version.
+
+Migrations run in version order; a failing migration is not recorded and
+stops the run, so it is retried on the next deploy. On PostgreSQL the run
+holds an advisory lock, so concurrent deploys apply each migration once.
+
+Configuration (environment):
+    SCHEMA_AUTO_MIGRATE   apply pending migrations on import when the schema is
+                          behind (default: 1; gunicorn.conf.py sets 0 for web workers)
+"""
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+AUTO_MIGRATE = os.environ.get('SCHEMA_AUTO_MIGRATE', '1').lower() in ('1', 'true', 'yes', 'on')
+
+# pg_advisory_lock key shared by every migration runner
+ADVISORY_LOCK_KEY = 7305410915
+
+
+class Migration:
+    """Schema version `version`: `func(session)` brings the database up to it."""
+
+    def __init__(self, version, name, func):
+        self.version = version
+        self.name = name
+        self.func = func
+
+
+def ensure_migration_table(session):
+    """Create the schema_migrations table (idempotent, commits)."""
+    session.execute(text('''CREATE TABLE IF NOT EXISTS schema_migrations
+                 (version INTEGER PRIMARY KEY,
+                  name TEXT NOT NULL,
+                  applied_at TIMESTAMP,
+                  duration_seconds REAL)'''))
+    session.commit()
+
+
+def current_version(session):
+    """Highest applied version; 0 for a database that was never migrated."""
+    try:
+        version = session.execute(text('SELECT MAX(version) FROM schema_migrations')).scalar()
+        session.commit()
+        return version or 0
+    except Exception:
+        session.rollback()
+        return 0
+
+
+def schema_is_current(session, migrations):
+    """True when every migration is applied - a single query, cheap enough for import time."""
+    target = max((m.version for m in migrations), default=0)
+    return current_version(session) >= target
+
+
+def pending_migrations(session, migrations):
+    try:
+        applied = {row[0] for row in session.execute(text('SELECT version FROM schema_migrations'))}
+        session.commit()
+    except Exception:
+        session.rollback()
+        applied = set()
+    return sorted((m for m in migrations if m.version not in applied), key=lambda m: m.version)
+
+
+def run_migrations(session, migrations):
+    """Apply pending migrations in order; returns the versions applied.
+
+    Raises the first migration error (after rolling back); earlier migrations stay recorded.
+    """
+    engine = session.get_bind()
+    ensure_migration_table(session)
+    lock_conn = None
+    if engine.dialect.name == 'postgresql':
+        # Session-level lock on a connection of its own: the session's connection
+        # goes back to the pool on every commit
+        lock_conn = engine.connect()
+        lock_conn.execute(text('SELECT pg_advisory_lock(:key)'), {'key': ADVISORY_LOCK_KEY})
+    applied = []
+    try:
+        # Re-read under the lock: another runner may have just applied some
+        for migration in pending_migrations(session, migrations):
+            print(f"🗄️  Applying schema migration {migration.version}: {migration.name}")
+            started = time.perf_counter()
+            try:
+                migration.func(session)
+                session.execute(text('''INSERT INTO schema_migrations (version, name, applied_at, duration_seconds)
+                                        VALUES (:version, :name, :now, :duration)'''),
+                                {'version': migration.version, 'name': migration.name, 'now': datetime.utcnow(),
+                                 'duration': round(time.perf_counter() - started, 3)})
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                print(f"❌ Schema migration {migration.version} ({migration.name}) failed: {e}")
+                raise
+            applied.append(migration.version)
+    finally:
+        if lock_conn is not None:
+            lock_conn.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': ADVISORY_LOCK_KEY})
+            lock_conn.close()
+    return applied
+
+
+def migration_status(session, migrations):
+    """[{version, name, applied_at, duration_seconds}] for every known migration (applied_at None if pending)."""
+    try:
+        rows = {row.version: row for row in session.execute(
+            text('SELECT version, applied_at, duration_seconds FROM schema_migrations'))}
+        session.commit()
+    except Exception:
+        session.rollback()
+        rows = {}
+    status = []
+    for migration in sorted(migrations, key=lambda m: m.version):
+        row = rows.get(migration.version)
+        status.append({'version': migration.version, 'name': migration.name,
+                       'applied_at': row.applied_at if row else None,
+                       'duration_seconds': row.duration_seconds if row else None})
+    return status
@@ -0,0 +1,54 @@
+"""
+Per-process schema registry
+Some tables are still created on demand by ensure_* helpers that request
+handlers call (settings, feedback, contact messages, proposal reviews,
+proposal wizard). Decorating a helper with @verified_once(name) makes it run
+its DDL at most once per process: after the first successful check later
+calls return immediately, so the hot path no longer pays a DDL round trip
+(and on PostgreSQL a catalog lock) per request.
+
+The helpers also run as a schema migration; when app.py sees the schema is
+current at import it marks them verified up front, so a worker never runs
+them at all. A helper that fails (raises or returns False) is retried on the
+next call.
+"""
+import functools
+import threading
+
+_verified = set()
+_lock = threading.Lock()
+
+
+def verified_once(name):
+    """Decorator: skip the wrapped ensure_* helper once `name` is verified in this process."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if name in _verified:
+                return True
+            result = func(*args, **kwargs)
+            if result is not False:
+                with _lock:
+                    _verified.add(name)
+            return result
+        wrapper.schema_name = name
+        return wrapper
+    return decorator
+
+
+def mark_verified(*names):
+    with _lock:
+        _verified.update(names)
+
+
+def is_verified(name):
+    return name in _verified
+
+
+def forget(*names):
+    """Make the named helpers check again on their next call (all of them with no names)."""
+    with _lock:
+        if names:
+            _verified.difference_update(names)
+        else:
+            _verified.clear()
@@ -8,7 +8,6 @@ from datetime import datetime
 import logging
 from typing import List, Dict, Optional
 import threading
-import time
 
 from scrapers.base_scraper import logger
 from scrapers.eva_virginia_scraper import EVAVirginiaScraper
@@ -294,26 +293,22 @@ class ScraperManager:
     
     def schedule_daily_scrape(self, hour: int = 2, minute: int = 0):
         """
-        Schedule daily scraper runs
+        Schedule daily scraper runs (standalone use; the web app runs this
+        as the 'scraper_manager' job on job_scheduler instead)
         
         Args:
             hour: Hour to run (0-23, default 2 AM)
             minute: Minute to run (0-59, default 0)
         """
+        from job_scheduler import ScheduledJob
+        job = ScheduledJob('scraper_manager', self.run_all_scrapers, times=[f'{hour:02d}:{minute:02d}'])
+        self._stop_event = threading.Event()
+        
         def run_scheduled():
-            while self.is_running:
-                now = datetime.now()
-                
-                # Check if it's time to run
-                if now.hour == hour and now.minute == minute:
-                    logger.info("⏰ Scheduled scraper run starting...")
-                    self.run_all_scrapers(save_to_db=True)
-                    
-                    # Sleep for 60 seconds to avoid running multiple times in same minute
-                    time.sleep(60)
-                else:
-                    # Check every 30 seconds
-                    time.sleep(30)
+            # Sleep until the next run instead of polling the clock
+            while not self._stop_event.wait((job.next_run(datetime.now()) - datetime.now()).total_seconds()):
+                logger.info("⏰ Scheduled scraper run starting...")
+                self.run_all_scrapers(save_to_db=True)
         
         self.is_running = True
         thread = threading.Thread(target=run_scheduled, daemon=True)
@@ -324,6 +319,8 @@ class ScraperManager:
     def stop_scheduler(self):
         """Stop the scheduler"""
         self.is_running = False
+        if getattr(self, '_stop_event', None) is not None:
+            self._stop_event.set()
         logger.info("Scheduler stopped")
 
 
@@ -0,0 +1,336 @@
+"""
+Unified full-text search index for lead tables
+SQLite: FTS5 virtual table (external content) ranked with bm25()
+PostgreSQL: weighted tsvector column with GIN index ranked with ts_rank()
+"""
+import re
+from sqlalchemy import text
+
+# Every lead table that /api/search covers. Column entries are SQL expressions
+# evaluated against the source table when (re)indexing.
+LEAD_SEARCH_SOURCES = {
+    'federal': {
+        'table': 'federal_contracts',
+        'title': 'title',
+        'agency': "COALESCE(agency, '') || ' ' || COALESCE(department, '')",
+        'location': 'location',
+        'body': "COALESCE(description, '') || ' ' || COALESCE(naics_code, '') || ' ' || COALESCE(set_aside, '')",
+        'posted': 'posted_date',
+        'bucket': 'federal_contracts',
+        'category': 'Federal Contracts',
+        'url': '/federal-contracts',
+    },
+    'supply': {
+        'table': 'supply_contracts',
+        'title': 'title',
+        'agency': 'agency',
+        'location': 'location',
+        'body': "COALESCE(description, '') || ' ' || COALESCE(product_category, '')",
+        'posted': 'posted_date',
+        'bucket': 'supply_contracts',
+        'category': 'Supply Contracts',
+        'url': '/quick-wins',
+    },
+    'local_government': {
+        'table': 'contracts',
+        'title': 'title',
+        'agency': 'agency',
+        'location': 'location',
+        'body': "COALESCE(description, '') || ' ' || COALESCE(naics_code, '')",
+        'posted': 'created_at',
+        'bucket': 'local_government',
+        'category': 'Local Government',
+        'url': '/local-procurement',
+    },
+    'city_rfp': {
+        'table': 'city_rfps',
+        'title': 'rfp_title',
+        'agency': "COALESCE(department, '') || ' ' || COALESCE(city_name, '')",
+        'location': "COALESCE(city_name, '') || ', ' || COALESCE(state_code, '')",
+        'body': 'description',
+        'posted': 'created_at',
+        'bucket': 'local_government',
+        'category': 'City RFPs',
+        'url': '/local-procurement',
+    },
+    'commercial': {
+        'table': 'commercial_opportunities',
+        'title': 'business_name',
+        'agency': 'business_type',
+        'location': 'location',
+        'body': "COALESCE(description, '') || ' ' || COALESCE(services_needed, '')",
+        'posted': 'created_at',
+        'bucket': 'commercial',
+        'category': 'Commercial',
+        'url': '/commercial-contracts',
+    },
+    'commercial_request': {
+        'table': 'commercial_lead_requests',
+        'title': 'business_name',
+        'agency': 'business_type',
+        'location': "COALESCE(city, '') || ', ' || COALESCE(state, '')",
+        'body': "COALESCE(services_needed, '') || ' ' || COALESCE(special_requirements, '') || ' ' || COALESCE(frequency, '')",
+        'posted': 'created_at',
+        'bucket': 'lead_requests',
+        'category': 'Commercial Requests',
+        'url': '/lead-marketplace',
+    },
+    'residential': {
+        'table': 'residential_leads',
+        'title': "COALESCE(property_type, 'Residential') || ' cleaning request'",
+        'agency': "'Residential'",
+        'location': "COALESCE(city, '') || ', ' || COALESCE(state, '')",
+        'body': "COALESCE(services_needed, '') || ' ' || COALESCE(special_requirements, '') || ' ' || COALESCE(cleaning_frequency, '')",
+        'posted': 'created_at',
+        'bucket': 'lead_requests',
+        'category': 'Residential Requests',
+        'url': '/lead-marketplace',
+    },
+    'aviation': {
+        'table': 'aviation_cleaning_leads',
+        'title': 'company_name',
+        'agency': 'company_type',
+        'location': "COALESCE(city, '') || ', ' || COALESCE(state, '')",
+        'body': "COALESCE(services_needed, '') || ' ' || COALESCE(aircraft_types, '') || ' ' || COALESCE(notes, '')",
+        'posted': 'created_at',
+        'bucket': 'specialty_leads',
+        'category': 'Aviation',
+        'url': '/aviation-cleaning-leads',
+    },
+    'construction': {
+        'table': 'construction_cleanup_leads',
+        'title': 'project_name',
+        'agency': 'builder_name',
+        'location': "COALESCE(city, '') || ', ' || COALESCE(state, '')",
+        'body': "COALESCE(project_type, '') || ' ' || COALESCE(requirements, '') || ' ' || COALESCE(services_needed, '')",
+        'posted': 'created_at',
+        'bucket': 'specialty_leads',
+        'category': 'Construction Cleanup',
+        'url': '/construction-cleanup-leads',
+    },
+}
+
+# bm25 / setweight column weights: title > agency > location > body
+_BM25_WEIGHTS = '10.0, 4.0, 2.0, 1.0'
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _is_postgres(session) -> bool:
+    return session.get_bind().dialect.name == 'postgresql'
+
+
+def ensure_search_index(session):
+    """Create the search document table and its FTS structures (idempotent)."""
+    is_postgres = _is_postgres(session)
+    id_type = 'SERIAL PRIMARY KEY' if is_postgres else 'INTEGER PRIMARY KEY AUTOINCREMENT'
+    try:
+        session.execute(text(f'''CREATE TABLE IF NOT EXISTS lead_search_docs
+                     (id {id_type},
+                      lead_type TEXT NOT NULL,
+                      lead_id INTEGER NOT NULL,
+                      title TEXT,
+                      agency TEXT,
+                      location TEXT,
+                      body TEXT,
+                      posted_date TEXT,
+                      indexed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                      UNIQUE(lead_type, lead_id))'''))
+
+        if is_postgres:
+            session.execute(text('''
+                ALTER TABLE lead_search_docs ADD COLUMN IF NOT EXISTS search_vector tsvector
+                GENERATED ALWAYS AS (
+                    setweight(to_tsvector('english', COALESCE(title, '')), 'A') ||
+                    setweight(to_tsvector('english', COALESCE(agency, '')), 'B') ||
+                    setweight(to_tsvector('english', COALESCE(location, '')), 'C') ||
+                    setweight(to_tsvector('english', COALESCE(body, '')), 'D')
+                ) STORED
+            '''))
+            session.execute(text('''CREATE INDEX IF NOT EXISTS idx_lead_search_vector
+                                    ON lead_search_docs USING GIN (search_vector)'''))
+        else:
+            session.execute(text('''CREATE VIRTUAL TABLE IF NOT EXISTS lead_search_fts USING fts5(
+                                        title, agency, location, body,
+                                        content='lead_search_docs', content_rowid='id',
+                                        tokenize='porter unicode61')'''))
+            # Keep the FTS shadow table in sync with lead_search_docs
+            session.execute(text('''CREATE TRIGGER IF NOT EXISTS lead_search_docs_ai AFTER INSERT ON lead_search_docs BEGIN
+                    INSERT INTO lead_search_fts(rowid, title, agency, location, body)
+                    VALUES (new.id, new.title, new.agency, new.location, new.body);
+                END'''))
+            session.execute(text('''CREATE TRIGGER IF NOT EXISTS lead_search_docs_ad AFTER DELETE ON lead_search_docs BEGIN
+                    INSERT INTO lead_search_fts(lead_search_fts, rowid, title, agency, location, body)
+                    VALUES ('delete', old.id, old.title, old.agency, old.location, old.body);
+                END'''))
+            session.execute(text('''CREATE TRIGGER IF NOT EXISTS lead_search_docs_au AFTER UPDATE ON lead_search_docs BEGIN
+                    INSERT INTO lead_search_fts(lead_search_fts, rowid, title, agency, location, body)
+                    VALUES ('delete', old.id, old.title, old.agency, old.location, old.body);
+                    INSERT INTO lead_search_fts(rowid, title, agency, location, body)
+                    VALUES (new.id, new.title, new.agency, new.location, new.body);
+                END'''))
+
+        session.execute(text('''CREATE INDEX IF NOT EXISTS idx_lead_search_docs_posted
+                                ON lead_search_docs(posted_date)'''))
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        print(f"⚠️  Search index init error: {e}")
+        return False
+
+
+def refresh_search_index(session, lead_types=None, since=None, prune=False):
+    """Upsert source rows into the search index with one set-based statement per table.
+
+    Args:
+        session: SQLAlchemy session (db.session)
+        lead_types: keys of LEAD_SEARCH_SOURCES to refresh (default: all)
+        since: only re-index rows created on/after this timestamp (ingest deltas)
+        prune: also drop index entries whose source row no longer exists
+
+    Returns:
+        Dict of lead_type -> rows upserted (-1 when the source table is unavailable)
+    """
+    summary = {}
+    # Skip rewriting unchanged documents so the FTS triggers only fire on real edits
+    changed = 'IS DISTINCT FROM' if _is_postgres(session) else 'IS NOT'
+    for lead_type in (lead_types or LEAD_SEARCH_SOURCES.keys()):
+        src = LEAD_SEARCH_SOURCES[lead_type]
+        where = 'WHERE created_at >= :since' if since is not None else 'WHERE 1 = 1'
+        try:
+            result = session.execute(text(f'''
+                INSERT INTO lead_search_docs (lead_type, lead_id, title, agency, location, body, posted_date)
+                SELECT :lead_type, id,
+                       COALESCE({src['title']}, ''),
+                       COALESCE({src['agency']}, ''),
+                       COALESCE({src['location']}, ''),
+                       COALESCE({src['body']}, ''),
+                       CAST({src['posted']} AS TEXT)
+                FROM {src['table']}
+                {where}
+                ON CONFLICT (lead_type, lead_id) DO UPDATE SET
+                    title = excluded.title,
+                    agency = excluded.agency,
+                    location = excluded.location,
+                    body = excluded.body,
+                    posted_date = excluded.posted_date,
+                    indexed_at = CURRENT_TIMESTAMP
+                WHERE lead_search_docs.title {changed} excluded.title
+                   OR lead_search_docs.agency {changed} excluded.agency
+                   OR lead_search_docs.location {changed} excluded.location
+                   OR lead_search_docs.body {changed} excluded.body
+                   OR lead_search_docs.posted_date {changed} excluded.posted_date
+            '''), {'lead_type': lead_type, 'since': since})
+            summary[lead_type] = result.rowcount if result.rowcount is not None else 0
+
+            if prune:
+                session.execute(text(f'''
+                    DELETE FROM lead_search_docs
+                    WHERE lead_type = :lead_type
+                      AND NOT EXISTS (SELECT 1 FROM {src['table']} s WHERE s.id = lead_search_docs.lead_id)
+                '''), {'lead_type': lead_type})
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"⚠️  Search index refresh skipped for {lead_type}: {e}")
+            summary[lead_type] = -1
+    return summary
+
+
+def remove_from_search_index(session, lead_type, lead_ids):
+    """Drop index entries for deleted leads."""
+    if not lead_ids:
+        return 0
+    try:
+        params = {'lead_type': lead_type}
+        placeholders = []
+        for i, lead_id in enumerate(lead_ids):
+            params[f'id{i}'] = int(lead_id)
+            placeholders.append(f':id{i}')
+        result = session.execute(text(f'''
+            DELETE FROM lead_search_docs
+            WHERE lead_type = :lead_type AND lead_id IN ({', '.join(placeholders)})
+        '''), params)
+        session.commit()
+        return result.rowcount or 0
+    except Exception as e:
+        session.rollback()
+        print(f"⚠️  Search index delete error: {e}")
+        return 0
+
+
+def _query_tokens(query: str, max_tokens: int = 8) -> list:
+    return [t.lower() for t in _TOKEN_RE.findall(query or '')][:max_tokens]
+
+
+def build_fts5_query(query: str) -> str:
+    """Translate free text into an FTS5 MATCH expression (AND of quoted prefix terms)."""
+    return ' '.join(f'"{t}"*' for t in _query_tokens(query))
+
+
+def build_tsquery(query: str) -> str:
+    """Translate free text into a to_tsquery expression (AND of prefix terms)."""
+    return ' & '.join(f'{t}:*' for t in _query_tokens(query))
+
+
+def search_leads(session, query: str, limit: int = 25, lead_types=None) -> list:
+    """Ranked full-text search over every indexed lead table.
+
+    Returns a list of dicts (best match first) with lead_type, lead_id, title,
+    agency, location, snippet, posted_date, bucket, category, url and score.
+    """
+    tokens = _query_tokens(query)
+    if not tokens:
+        return []
+
+    params = {'limit': int(limit)}
+    type_filter = ''
+    if lead_types:
+        names = []
+        for i, lead_type in enumerate(lead_types):
+            params[f't{i}'] = lead_type
+            names.append(f':t{i}')
+        type_filter = f"AND d.lead_type IN ({', '.join(names)})"
+
+    if _is_postgres(session):
+        params['q'] = build_tsquery(query)
+        sql = f'''
+            SELECT d.lead_type, d.lead_id, d.title, d.agency, d.location, d.body, d.posted_date,
+                   ts_rank(d.search_vector, to_tsquery('english', :q)) AS score
+            FROM lead_search_docs d
+            WHERE d.search_vector @@ to_tsquery('english', :q) {type_filter}
+            ORDER BY score DESC, d.posted_date DESC NULLS LAST
+            LIMIT :limit
+        '''
+    else:
+        params['q'] = build_fts5_query(query)
+        # bm25() is lower-is-better; negate so score sorts the same way as ts_rank
+        sql = f'''
+            SELECT d.lead_type, d.lead_id, d.title, d.agency, d.location, d.body, d.posted_date,
+                   -bm25(lead_search_fts, {_BM25_WEIGHTS}) AS score
+            FROM lead_search_fts
+            JOIN lead_search_docs d ON d.id = lead_search_fts.rowid
+            WHERE lead_search_fts MATCH :q {type_filter}
+            ORDER BY bm25(lead_search_fts, {_BM25_WEIGHTS}), d.posted_date DESC
+            LIMIT :limit
+        '''
+
+    rows = session.execute(text(sql), params).fetchall()
+    results = []
+    for row in rows:
+        src = LEAD_SEARCH_SOURCES.get(row.lead_type, {})
+        body = (row.body or '').strip()
+        results.append({
+            'lead_type': row.lead_type,
+            'lead_id': row.lead_id,
+            'title': row.title,
+            'agency': (row.agency or '').strip(),
+            'location': (row.location or '').strip(' ,'),
+            'snippet': body[:150],
+            'posted_date': row.posted_date,
+            'bucket': src.get('bucket', 'other'),
+            'category': src.get('category', row.lead_type),
+            'url': src.get('url', '/'),
+            'score': float(row.score or 0),
+        })
+    return results
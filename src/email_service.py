@@ -1,49 +1,49 @@
 """
 Email Service for VA Contracts Lead Generation Platform
 Handles sending emails via Gmail SMTP with SSL/TLS encryption
+
+Messages go through mail_dispatcher's 'gmail' provider (EMAIL_USER /
+EMAIL_PASS): one pooled, logged-in SMTP session is reused across messages,
+and with the app's database they are queued and delivered in the background.
 """
 
-import smtplib
-import ssl
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import os
+from mail_dispatcher import mail_dispatcher
 
 def send_email(to, subject, html):
     """
     Send an HTML email using Gmail SMTP
-    
+
     Args:
         to (str): Recipient email address
         subject (str): Email subject line
         html (str): HTML content of the email
-        
+
     Returns:
-        bool: True if email sent successfully, False otherwise
+        bool: True if email was queued (or sent) successfully, False otherwise
     """
-    email_user = os.environ.get("EMAIL_USER")
-    email_pass = os.environ.get("EMAIL_PASS")
-
-    if not email_user or not email_pass:
+    if not mail_dispatcher.has_provider('gmail'):
         print("⚠️ Email credentials missing. Set EMAIL_USER and EMAIL_PASS environment variables.")
         return False
 
-    msg = MIMEMultipart("alternative")
-    msg["Subject"] = subject
-    msg["From"] = email_user
-    msg["To"] = to
+    if mail_dispatcher.send(to, subject, html=html, provider='gmail'):
+        print(f"✅ Email queued for {to}")
+        return True
+    return False
 
-    msg.attach(MIMEText(html, "html"))
+def send_bulk(recipients, subject, html, segment=None):
+    """
+    Send the same HTML email to many recipients (rendered once by the caller)
 
-    context = ssl.create_default_context()
+    Args:
+        recipients (list): Recipient email addresses
+        subject (str): Email subject line
+        html (str): HTML content shared by every recipient
+        segment (str): Optional label for the batch (outbox reporting)
 
-    try:
-        with smtplib.SMTP("smtp.gmail.com", 587) as server:
-            server.starttls(context=context)
-            server.login(email_user, email_pass)
-            server.sendmail(email_user, to, msg.as_string())
-        print(f"✅ Email sent successfully to {to}")
-        return True
-    except Exception as e:
-        print(f"❌ ERROR sending email to {to}: {e}")
-        return False
+    Returns:
+        int: Number of recipients queued (or sent)
+    """
+    if not mail_dispatcher.has_provider('gmail'):
+        print("⚠️ Email credentials missing. Set EMAIL_USER and EMAIL_PASS environment variables.")
+        return 0
+    return mail_dispatcher.send_batch(recipients, subject, html=html, provider='gmail', segment=segment)
@@ -11,8 +11,12 @@ import os
 # Add src directory to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from email_service import send_email
+from email_service import send_bulk
 import email_templates
+from digest_matcher import DigestIndex, group_digests, subscriber_filters
+
+# Leads listed in one briefing email (the subject still counts all of them)
+BRIEFING_MAX_LEADS = 10
 
 # Global scheduler instance
 scheduler = None
@@ -29,13 +33,12 @@ def fetch_daily_leads():
     db = get_db()
     cursor = db.cursor()
     
-    # Get leads from last 24 hours
+    # Get every lead from the last 24 hours; each subscriber sees their matches
     cursor.execute("""
-        SELECT title, state, estimated_value, deadline, description
+        SELECT title, state, estimated_value, deadline, description, naics_code
         FROM federal_contracts
         WHERE created_at >= datetime('now', '-1 day')
         ORDER BY created_at DESC
-        LIMIT 10
     """)
     
     rows = cursor.fetchall()
@@ -48,7 +51,9 @@ def fetch_daily_leads():
             'state': row[1] or 'N/A',
             'value': f"${row[2]:,.0f}" if row[2] else 'N/A',
             'deadline': row[3] or 'N/A',
-            'description': row[4] or 'No description available.'
+            'description': row[4] or 'No description available.',
+            'estimated_value': row[2],
+            'naics_code': row[5]
         })
     
     return leads
@@ -77,10 +82,32 @@ def get_subscriber_emails():
     rows = cursor.fetchall()
     return [row[0] for row in rows]
 
+def get_subscriber_filters(emails):
+    """
+    Digest filters for these subscribers: alert-enabled saved searches,
+    otherwise everything
+    
+    Returns:
+        list: digest_matcher.SubscriberFilter entries
+    """
+    from database import get_db
+    
+    db = get_db()
+    cursor = db.cursor()
+    
+    cursor.execute("""
+        SELECT user_email, search_name, search_filters
+        FROM saved_searches
+        WHERE alert_enabled = 1
+        ORDER BY id
+    """)
+    
+    return subscriber_filters(emails, cursor.fetchall())
+
 def daily_briefing_job():
     """
     Job function that runs daily at 8 AM EST
-    Sends briefing emails to all active subscribers
+    Sends each active subscriber a briefing of the new leads matching their alerts
     """
     print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Running daily briefing job...")
     
@@ -96,21 +123,20 @@ def daily_briefing_job():
         print("No active subscribers found. Skipping email send.")
         return
     
-    # Send daily briefing to each subscriber
-    success_count = 0
-    for email in subscriber_emails:
-        try:
-            success = send_email(
-                to=email,
-                subject=f"📊 Daily Briefing: {len(leads)} New Lead{'s' if len(leads) != 1 else ''}",
-                html=email_templates.daily_briefing(leads)
-            )
-            if success:
-                success_count += 1
-        except Exception as e:
-            print(f"Error sending daily briefing to {email}: {e}")
-    
-    print(f"Daily briefing completed. Sent to {success_count}/{len(subscriber_emails)} subscribers.")
+    # Match the new leads against every subscriber's saved-search alerts in one pass;
+    # subscribers with identical digests share one rendered, queued batch
+    index = DigestIndex(get_subscriber_filters(subscriber_emails))
+    digests = index.digests(leads)
+    
+    queued = 0
+    today = datetime.now().date()
+    for group_number, (matched, emails) in enumerate(group_digests(digests)):
+        subject = f"📊 Daily Briefing: {len(matched)} New Lead{'s' if len(matched) != 1 else ''}"
+        html = email_templates.daily_briefing(matched[:BRIEFING_MAX_LEADS])
+        queued += send_bulk(emails, subject, html, segment=f"daily_briefing:{today}:{group_number}")
+    
+    print(f"Daily briefing queued for {queued}/{len(subscriber_emails)} subscribers "
+          f"({len(subscriber_emails) - len(digests)} without matching leads).")
 
 def start_scheduler():
     """
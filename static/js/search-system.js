@@ -184,7 +184,10 @@ class SearchSystem {
             { key: 'commercial', title: '🏢 Commercial Properties', icon: '🏢' },
             { key: 'k12_schools', title: '🏫 K-12 Schools', icon: '🏫' },
             { key: 'colleges', title: '🎓 Colleges & Universities', icon: '🎓' },
-            { key: 'supply_contracts', title: '🌍 Supply Contracts', icon: '🌍' }
+            { key: 'supply_contracts', title: '🌍 Supply Contracts', icon: '🌍' },
+            { key: 'federal_contracts', title: '🇺🇸 Federal Contracts', icon: '🇺🇸' },
+            { key: 'lead_requests', title: '📥 Cleaning Requests', icon: '📥' },
+            { key: 'specialty_leads', title: '✈️ Aviation & Construction', icon: '✈️' }
         ];
 
         categories.forEach(cat => {
@@ -0,0 +1,130 @@
+"""
+High-water marks for incremental federal syncs
+Each scheduled ingest (USAspending awards, SAM.gov opportunities, ...) records
+the last date window it fetched successfully per source, state and NAICS in
+federal_sync_state. The next run then requests only the delta since that mark
+(plus a small overlap for late-arriving records) instead of re-pulling the full
+90-day window, with a periodic full reconciliation to pick up amendments.
+
+Configuration (environment):
+    FEDERAL_SYNC_OVERLAP_DAYS  days re-requested before the high-water mark (default: 3)
+    FEDERAL_FULL_SYNC_DAYS     days between full-window reconciliations (default: 7)
+    FEDERAL_SYNC_MODE          'full' forces a full-window run for every source
+"""
+import os
+from datetime import date, datetime, timedelta
+from sqlalchemy import text
+
+SYNC_OVERLAP_DAYS = int(os.environ.get('FEDERAL_SYNC_OVERLAP_DAYS', 3))
+FULL_SYNC_INTERVAL_DAYS = int(os.environ.get('FEDERAL_FULL_SYNC_DAYS', 7))
+
+# '' stands for "all states" / "all NAICS codes" (keeps the primary key NOT NULL)
+ALL = ''
+
+
+def ensure_sync_state_table(session):
+    """Create the federal_sync_state table (idempotent)."""
+    try:
+        session.execute(text('''CREATE TABLE IF NOT EXISTS federal_sync_state
+                     (source TEXT NOT NULL,
+                      state TEXT NOT NULL DEFAULT '',
+                      naics TEXT NOT NULL DEFAULT '',
+                      high_water DATE,
+                      last_full_sync DATE,
+                      last_mode TEXT,
+                      last_fetched INTEGER DEFAULT 0,
+                      updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                      PRIMARY KEY (source, state, naics))'''))
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        print(f"⚠️  Sync state table init error: {e}")
+        return False
+
+
+def _as_date(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def get_sync_states(session, source):
+    """{(state, naics): row} for one source."""
+    rows = session.execute(text('''SELECT state, naics, high_water, last_full_sync
+                                   FROM federal_sync_state WHERE source = :source'''),
+                           {'source': source}).fetchall()
+    return {(r.state, r.naics): r for r in rows}
+
+
+def plan_window(session, source, state=ALL, naics=ALL, default_days=90, today=None, force_full=False,
+                states=None):
+    """Return (start_date, end_date, mode) for the next run of a source/state/NAICS.
+
+    mode is 'full' (the whole default_days window) when there is no high-water
+    mark yet, the last full reconciliation is older than FULL_SYNC_INTERVAL_DAYS,
+    or a full run is forced; otherwise 'delta', starting SYNC_OVERLAP_DAYS
+    before the high-water mark. `states` is an optional preloaded
+    get_sync_states() result so sweeps over many pairs cost one query.
+    """
+    today = today or date.today()
+    end_date = today
+    full_start = today - timedelta(days=default_days)
+    if force_full or os.environ.get('FEDERAL_SYNC_MODE', '').lower() == 'full':
+        return full_start, end_date, 'full'
+
+    if states is None:
+        row = session.execute(text('''SELECT high_water, last_full_sync FROM federal_sync_state
+                                      WHERE source = :source AND state = :state AND naics = :naics'''),
+                              {'source': source, 'state': state, 'naics': naics}).fetchone()
+    else:
+        row = states.get((state, naics))
+    high_water = _as_date(row.high_water) if row else None
+    last_full = _as_date(row.last_full_sync) if row else None
+    if high_water is None or last_full is None or (today - last_full).days >= FULL_SYNC_INTERVAL_DAYS:
+        return full_start, end_date, 'full'
+
+    start_date = max(full_start, high_water - timedelta(days=SYNC_OVERLAP_DAYS))
+    return start_date, end_date, 'delta'
+
+
+def record_syncs(session, source, entries):
+    """Advance high-water marks after a successful fetch + write (one executemany, commits).
+
+    entries: iterable of (state, naics, end_date, mode, fetched).
+    """
+    params = []
+    for state, naics, end_date, mode, fetched in entries:
+        end_date = _as_date(end_date).isoformat()
+        params.append({'source': source, 'state': state, 'naics': naics, 'high_water': end_date,
+                       'full': end_date if mode == 'full' else None, 'mode': mode, 'fetched': int(fetched or 0)})
+    if not params:
+        return 0
+    try:
+        session.execute(text('''INSERT INTO federal_sync_state
+                                    (source, state, naics, high_water, last_full_sync, last_mode, last_fetched, updated_at)
+                                VALUES (:source, :state, :naics, :high_water, :full, :mode, :fetched, CURRENT_TIMESTAMP)
+                                ON CONFLICT (source, state, naics) DO UPDATE SET
+                                    high_water = excluded.high_water,
+                                    last_full_sync = COALESCE(excluded.last_full_sync, federal_sync_state.last_full_sync),
+                                    last_mode = excluded.last_mode,
+                                    last_fetched = excluded.last_fetched,
+                                    updated_at = CURRENT_TIMESTAMP'''), params)
+        session.commit()
+        return len(params)
+    except Exception as e:
+        session.rollback()
+        print(f"⚠️  Could not record sync state for {source}: {e}")
+        return 0
+
+
+def record_sync(session, source, end_date, mode, state=ALL, naics=ALL, fetched=0):
+    """Single-key form of record_syncs()."""
+    return record_syncs(session, source, [(state, naics, end_date, mode, fetched)]) == 1
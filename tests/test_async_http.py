@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import time
+import unittest
+
+import httpx
+
+from national_scrapers import async_http
+from national_scrapers.async_http import AsyncFetchEngine
+from national_scrapers.symphony_scraper import SymphonyScraper
+
+
+class AsyncFetchEngineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.active = {}
+        self.peak = {}
+        self.lock = threading.Lock()
+        self.attempts = {}
+
+    def _handler(self, delay=0.05):
+        async def handler(request):
+            host, path = request.url.host, request.url.path
+            with self.lock:
+                self.active[host] = self.active.get(host, 0) + 1
+                self.peak[host] = max(self.peak.get(host, 0), self.active[host])
+                self.attempts[path] = self.attempts.get(path, 0) + 1
+                attempt = self.attempts[path]
+            await asyncio.sleep(delay)
+            with self.lock:
+                self.active[host] -= 1
+            if path == '/limited' and attempt == 1:
+                return httpx.Response(429, headers={'Retry-After': '1'})
+            if path == '/missing':
+                return httpx.Response(404)
+            return httpx.Response(200, text=f'<html>{host}{path}</html>')
+        return handler
+
+    def _engine(self, **kwargs):
+        engine = AsyncFetchEngine(transport=httpx.MockTransport(self._handler()), backoff_scale=0.01, **kwargs)
+        self.addCleanup(engine.close)
+        return engine
+
+    def test_hosts_run_concurrently_with_per_host_limit(self):
+        engine = self._engine(per_host_limit=2)
+        urls = [f'https://host{h}.example.gov/page{i}' for h in range(5) for i in range(4)]
+        started = time.monotonic()
+        responses = engine.fetch_all_sync(urls)
+        elapsed = time.monotonic() - started
+
+        self.assertTrue(all(r is not None and r.status_code == 200 for r in responses))
+        self.assertEqual(responses[5].text, '<html>host1.example.gov/page1</html>')
+        self.assertEqual(max(self.peak.values()), 2)
+        # 20 pages at 50ms each: bounded by one host's 2 waves, not the serial 1s
+        self.assertLess(elapsed, 0.6)
+
+    def test_retry_after_and_status_handling(self):
+        engine = self._engine()
+        self.assertEqual(engine.fetch_sync('https://a.example.gov/limited').status_code, 200)
+        self.assertEqual(self.attempts['/limited'], 2)
+        self.assertIsNone(engine.fetch_sync('https://a.example.gov/missing'))
+        self.assertEqual(self.attempts['/missing'], 1)
+
+    def test_scraper_shim_uses_engine(self):
+        engine = self._engine()
+        original = async_http._engine
+        async_http._engine = engine
+        try:
+            scraper = SymphonyScraper()
+            contracts = scraper.scrape(states=['AZ', 'CO', 'XX'])
+        finally:
+            async_http._engine = original
+        self.assertEqual(contracts, [])
+        self.assertEqual(self.attempts, {'/apps/Router/PublicEvent': 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
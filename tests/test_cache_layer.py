@@ -0,0 +1,91 @@
+import os
+import stat
+import tempfile
+import time
+import unittest
+from datetime import date, datetime
+from decimal import Decimal
+
+import cache_layer
+from cache_layer import TieredCache, SQLiteSharedStore
+
+
+class TieredCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        # Two caches over one file stand in for two gunicorn workers
+        self.worker_a = TieredCache(shared=SQLiteSharedStore(self.path), local_max_entries=2)
+        self.worker_b = TieredCache(shared=SQLiteSharedStore(self.path), local_max_entries=2)
+
+    def tearDown(self):
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(self.path + suffix)
+            except OSError:
+                pass
+
+    def test_shared_tier_and_metrics(self):
+        self.assertIsNone(self.worker_a.get('k'))
+        self.worker_a.set('k', {'total': 3}, ttl=60)
+        self.assertEqual(self.worker_a.get('k'), {'total': 3})
+        self.assertEqual(self.worker_b.get('k'), {'total': 3})
+        self.assertEqual(self.worker_b.get('k'), {'total': 3})
+
+        a, b = self.worker_a.stats(), self.worker_b.stats()
+        self.assertEqual((a['misses'], a['local_hits']), (1, 1))
+        self.assertEqual((b['shared_hits'], b['local_hits']), (1, 1))
+
+    def test_ttl_and_lru_eviction(self):
+        local_only = TieredCache(local_max_entries=2)
+        local_only.set('short', 1, ttl=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(local_only.get('short'))
+
+        local_only.set('a', 1)
+        local_only.set('b', 2)
+        local_only.get('a')
+        local_only.set('c', 3)
+        self.assertIsNone(local_only.get('b'))
+        self.assertEqual(local_only.get('a'), 1)
+
+    def test_tag_invalidation_reaches_other_workers(self):
+        calls = []
+        compute = lambda: calls.append(1) or len(calls)
+        self.assertEqual(self.worker_b.get_or_set('stats', compute, tags=('lead_counts',)), 1)
+        self.assertEqual(self.worker_b.get_or_set('stats', compute, tags=('lead_counts',)), 1)
+
+        self.worker_a.invalidate_tag('lead_counts')
+        # worker_b re-reads tag versions once its short check interval lapses
+        original = cache_layer.TAG_VERSION_CHECK_SECONDS
+        cache_layer.TAG_VERSION_CHECK_SECONDS = 0
+        try:
+            self.assertEqual(self.worker_b.get_or_set('stats', compute, tags=('lead_counts',)), 2)
+        finally:
+            cache_layer.TAG_VERSION_CHECK_SECONDS = original
+
+    def test_shared_values_are_json(self):
+        value = (datetime(2025, 1, 2, 3, 4, 5), date(2025, 1, 2), Decimal('12.50'), {'n': 1})
+        self.worker_a.set('typed', value, ttl=60)
+        raw = self.worker_a.shared.get('typed')
+        self.assertTrue(bytes(raw).startswith(b'['))
+        self.assertEqual(tuple(self.worker_b.get('typed')), (datetime(2025, 1, 2, 3, 4, 5), date(2025, 1, 2),
+                                                             Decimal('12.50'), {'n': 1}))
+
+    def test_private_data_path(self):
+        original = cache_layer.APP_DATA_DIR
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_layer.APP_DATA_DIR = os.path.join(tmp, 'instance')
+            try:
+                path = cache_layer.private_data_path('cache.sqlite3')
+                self.assertEqual(stat.S_IMODE(os.stat(cache_layer.APP_DATA_DIR).st_mode) & 0o077, 0)
+                self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+                os.chmod(path, 0o666)
+                with self.assertRaises(PermissionError):
+                    cache_layer.private_data_path('cache.sqlite3')
+            finally:
+                cache_layer.APP_DATA_DIR = original
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import tempfile
+import threading
+import unittest
+from datetime import date
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from credit_ledger import allocate_monthly_credits, credit, debit, ensure_credit_ledger
+
+
+class CreditLedgerTestCase(unittest.TestCase):
+    def setUp(self):
+        # A file database so the concurrency test can use several connections
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        self.engine = create_engine(f'sqlite:///{self.path}', connect_args={'timeout': 30})
+        self.addCleanup(self.engine.dispose)
+        self.session = Session(self.engine)
+        self.addCleanup(self.session.close)
+        self.session.execute(text('''CREATE TABLE leads (id INTEGER PRIMARY KEY, email TEXT UNIQUE,
+                                     credits_balance INTEGER DEFAULT 0, credits_used INTEGER DEFAULT 0,
+                                     low_credits_alert_sent BOOLEAN DEFAULT FALSE,
+                                     last_credit_purchase_date TEXT)'''))
+        self.session.execute(text('''CREATE TABLE subscriptions (id INTEGER PRIMARY KEY, email TEXT,
+                                     status TEXT DEFAULT 'active', monthly_credits INTEGER DEFAULT 50,
+                                     last_credits_allocated_date TEXT)'''))
+        self.session.execute(text('''INSERT INTO leads (email, credits_balance) VALUES
+                                     ('a@example.com', 20), ('b@example.com', 0)'''))
+        self.session.commit()
+        self.assertTrue(ensure_credit_ledger(self.session))
+        self.assertTrue(ensure_credit_ledger(self.session))
+
+    def _balance(self, email):
+        return self.session.execute(text('SELECT credits_balance FROM leads WHERE email = :e'), {'e': email}).scalar()
+
+    def test_debit_is_conditional(self):
+        result = debit(self.session, 'a@example.com', 15, 'commercial_contact', 'com_1', 'Acme')
+        self.assertEqual((result.ok, result.balance), (True, 5))
+        low = self.session.execute(text('''SELECT credits_used, low_credits_alert_sent FROM leads
+                                           WHERE email = 'a@example.com' ''')).fetchone()
+        self.assertEqual((low.credits_used, bool(low.low_credits_alert_sent)), (15, True))
+
+        short = debit(self.session, 'a@example.com', 6, 'commercial_contact')
+        self.assertEqual((short.ok, short.balance, short.error), (False, 5, 'Insufficient credits'))
+        self.assertEqual(debit(self.session, 'nobody@example.com', 1, 'x').error, 'User not found')
+        self.assertEqual(debit(self.session, 'a@example.com', 0, 'x').error, 'Invalid credit amount')
+        self.assertEqual(self.session.execute(text('SELECT COUNT(*) FROM credits_usage')).scalar(), 1)
+
+    def test_idempotency_keys_replay_instead_of_charging_again(self):
+        first = debit(self.session, 'a@example.com', 5, 'unlock', idempotency_key='req-1')
+        again = debit(self.session, 'a@example.com', 5, 'unlock', idempotency_key='req-1')
+        self.assertEqual((first.balance, again.balance, again.replayed), (15, 15, True))
+        self.assertEqual(self._balance('a@example.com'), 15)
+        # The same key from another user is a different request
+        self.assertFalse(debit(self.session, 'b@example.com', 5, 'unlock', idempotency_key='req-1').replayed)
+
+        bought = credit(self.session, 'b@example.com', 10, 'credit_purchase_10_paypal', 5.0, 'PAY-1',
+                        idempotency_key='paypal:PAY-1', payment_method='paypal', payment_reference='PayPal: PAY-1')
+        retried = credit(self.session, 'b@example.com', 10, 'credit_purchase_10_paypal', 5.0, 'PAY-1',
+                         idempotency_key='paypal:PAY-1', payment_method='paypal')
+        self.assertEqual((bought.balance, retried.balance, retried.replayed), (10, 10, True))
+        row = self.session.execute(text('''SELECT COUNT(*) AS n, MAX(payment_method) AS method
+                                           FROM credits_purchases''')).fetchone()
+        self.assertEqual((row.n, row.method), (1, 'paypal'))
+
+    def test_concurrent_debits_never_overdraw(self):
+        self.session.execute(text("UPDATE leads SET credits_balance = 100 WHERE email = 'a@example.com'"))
+        self.session.commit()
+        successes = []
+
+        def worker():
+            with Session(self.engine) as session:
+                for _ in range(15):
+                    if debit(session, 'a@example.com', 3, 'unlock').ok:
+                        successes.append(1)
+
+        threads = [threading.Thread(target=worker) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(successes), 33)
+        self.assertEqual(self._balance('a@example.com'), 1)
+        self.assertEqual(self.session.execute(text('SELECT SUM(credits_used) FROM credits_usage')).scalar(), 99)
+
+    def test_monthly_allocation_is_set_based_and_once_per_day(self):
+        self.session.execute(text('''INSERT INTO subscriptions (email, status, monthly_credits,
+                                                                last_credits_allocated_date) VALUES
+                                     ('a@example.com', 'active', 50, NULL),
+                                     ('b@example.com', 'active', 30, '2026-01-01'),
+                                     ('b@example.com', 'cancelled', 30, NULL),
+                                     ('ghost@example.com', 'active', 50, NULL)'''))
+        self.session.commit()
+        today = date(2026, 2, 1)
+        self.assertEqual(allocate_monthly_credits(self.session, today=today), 2)
+        self.assertEqual((self._balance('a@example.com'), self._balance('b@example.com')), (70, 30))
+        rows = self.session.execute(text('''SELECT user_email, credits_purchased, transaction_id, balance_after
+                                            FROM credits_purchases ORDER BY user_email''')).fetchall()
+        self.assertEqual([tuple(r) for r in rows], [('a@example.com', 50, 'monthly_2026-02-01', 70),
+                                                    ('b@example.com', 30, 'monthly_2026-02-01', 30)])
+        self.assertEqual(allocate_monthly_credits(self.session, today=today), 0)
+        self.assertEqual(self._balance('a@example.com'), 70)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+from datetime import date
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+
+from dashboard_feed import dashboard_stats, ensure_dashboard_feed_indexes, fetch_dashboard_page
+
+
+class DashboardFeedTestCase(unittest.TestCase):
+    def setUp(self):
+        self.session = Session(create_engine('sqlite://'))
+        for ddl in [
+            '''CREATE TABLE federal_contracts (id INTEGER PRIMARY KEY, title TEXT, agency TEXT, location TEXT,
+                   description TEXT, value TEXT, deadline DATE, naics_code TEXT, posted_date DATE,
+                   sam_gov_url TEXT, created_at TIMESTAMP)''',
+            '''CREATE TABLE commercial_lead_requests (id INTEGER PRIMARY KEY, business_name TEXT, contact_name TEXT,
+                   email TEXT, phone TEXT, address TEXT, city TEXT, zip_code TEXT, business_type TEXT,
+                   square_footage INTEGER, frequency TEXT, services_needed TEXT, special_requirements TEXT,
+                   budget_range TEXT, start_date DATE, urgency TEXT, status TEXT, created_at TIMESTAMP)''',
+            '''CREATE TABLE saved_leads (id INTEGER PRIMARY KEY, user_email TEXT, saved_at TIMESTAMP)''',
+        ]:
+            self.session.execute(text(ddl))
+        self.session.execute(text('''INSERT INTO federal_contracts (id, title, agency, deadline, posted_date, created_at)
+                                     VALUES (1, 'Janitorial A', 'GSA', '2099-01-01', '2025-03-01', '2025-03-01 08:00:00'),
+                                            (2, 'Janitorial B', 'Navy', NULL, NULL, '2025-03-04 08:00:00'),
+                                            (3, 'Janitorial C', 'Army', '2099-01-01', '2025-03-02', '2025-03-02 08:00:00')'''))
+        self.session.execute(text('''INSERT INTO commercial_lead_requests (id, business_name, city, urgency, status, created_at)
+                                     VALUES (1, 'Office Park', 'Norfolk', 'urgent', 'open', '2025-03-03 09:00:00'),
+                                            (2, 'Hotel', 'Hampton', 'emergency', 'closed', '2025-03-05 09:00:00')'''))
+        self.session.execute(text('''INSERT INTO saved_leads (user_email, saved_at)
+                                     VALUES ('a@example.com', '2025-03-05 10:00:00'), ('b@example.com', '2025-03-05 10:00:00')'''))
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_stats_single_query_with_missing_tables(self):
+        stats = dashboard_stats(self.session, 'a@example.com', date(2025, 3, 5))
+        self.assertEqual(stats['government_contracts'], 3)
+        self.assertEqual(stats['upcoming_contracts'], 2)
+        self.assertEqual(stats['commercial_leads'], 1)
+        self.assertEqual(stats['urgent_count'], 1)
+        self.assertEqual(stats['emergency_count'], 0)
+        self.assertEqual(stats['supply_contracts'], 0)  # table missing
+        self.assertEqual(stats['saved_leads_count'], 1)
+        self.assertEqual(stats['leads_saved_today'], 1)
+        self.assertEqual(stats['feed_total'], 4)
+        self.assertEqual(stats['quick_wins'], 3)
+
+    def test_feed_merges_types_newest_first(self):
+        page, cursor = fetch_dashboard_page(self.session, limit=2)
+        self.assertEqual([(t, r[0]) for t, r in page], [('government', 2), ('commercial_request', 1)])
+        page, cursor = fetch_dashboard_page(self.session, cursor=cursor, limit=2)
+        self.assertEqual([(t, r[0]) for t, r in page], [('government', 3), ('government', 1)])
+        self.assertIsNone(cursor)
+
+    def test_feed_type_filter(self):
+        page, cursor = fetch_dashboard_page(self.session, lead_types=['commercial_request'])
+        self.assertEqual([(t, r[1]) for t, r in page], [('commercial_request', 'Office Park')])
+        self.assertIsNone(cursor)
+
+    def test_failing_source_is_skipped(self):
+        # supply_contracts as created by the app, plus a commercial table missing its detail columns
+        self.session.execute(text('''CREATE TABLE supply_contracts (id INTEGER PRIMARY KEY, title TEXT, agency TEXT,
+                                         location TEXT, product_category TEXT, estimated_value TEXT, bid_deadline TEXT,
+                                         description TEXT, website_url TEXT, status TEXT, created_at TIMESTAMP)'''))
+        self.session.execute(text('CREATE TABLE commercial_opportunities (id INTEGER PRIMARY KEY, created_at TIMESTAMP)'))
+        self.session.execute(text('CREATE TABLE residential_leads (id INTEGER PRIMARY KEY, created_at TIMESTAMP)'))
+        self.session.execute(text('''INSERT INTO supply_contracts (id, title, agency, location, created_at)
+                                     VALUES (7, 'Paper towels', 'GSA', 'Hampton', '2025-03-06 08:00:00')'''))
+        self.session.execute(text("INSERT INTO commercial_opportunities (id, created_at) VALUES (1, '2025-03-07 08:00:00')"))
+        self.session.commit()
+        page, _ = fetch_dashboard_page(self.session, limit=3)
+        # residential_leads' key query and the commercial row load fail; the rest of the page still loads
+        self.assertEqual([(t, r[0]) for t, r in page], [('supply', 7), ('government', 2)])
+        self.assertIsNone(page[0][1][11])  # requirements
+
+    def test_each_source_is_an_indexed_keyset_query(self):
+        self.assertEqual(ensure_dashboard_feed_indexes(self.session), 2)
+        self.session.execute(text('''INSERT INTO commercial_lead_requests (id, business_name, status, created_at)
+                                     VALUES (3, 'Same time', 'open', '2025-03-04 08:00:00')'''))
+        self.session.commit()
+        statements = []
+        event.listen(self.session.get_bind(), 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        seen, cursor = [], None
+        while True:
+            page, cursor = fetch_dashboard_page(self.session, cursor=cursor, limit=1)
+            seen.extend((t, r[0]) for t, r in page)
+            if cursor is None:
+                break
+        # Ties on the sort date are broken by lead type, then id, with nothing repeated or skipped
+        self.assertEqual(seen, [('government', 2), ('commercial_request', 3), ('commercial_request', 1),
+                                ('government', 3), ('government', 1)])
+        feed_queries = [s for s in statements if 'AS sort_date' in s]
+        self.assertEqual(len(feed_queries), 10)
+        self.assertFalse(any('UNION' in s for s in statements))
+        self.assertTrue(all(s.rstrip().endswith('LIMIT ?') for s in feed_queries))
+        plan = self.session.execute(text('''EXPLAIN QUERY PLAN SELECT id FROM commercial_lead_requests
+                                            WHERE status='open' AND created_at IS NOT NULL
+                                            ORDER BY created_at DESC, id DESC LIMIT 2''')).fetchall()
+        self.assertIn('idx_commercial_lead_requests_feed', ' '.join(str(row[-1]) for row in plan))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -23,6 +23,9 @@ class TestDataGovFetch(unittest.TestCase):
         self.assertTrue(hasattr(self.fetcher, 'cleaning_keywords'))
         self.assertIn('janitor', self.fetcher.cleaning_keywords)
         self.assertIn('cleaning', self.fetcher.cleaning_keywords)
+        # The broader shared CLEANING terms are not used for Data.gov descriptions
+        self.assertNotIn('porter', self.fetcher.cleaning_keywords)
+        self.assertNotIn('trash', self.fetcher.cleaning_keywords)
     
     def test_parse_usaspending_award_with_naics_561720(self):
         """Test parsing award with NAICS 561720 (highest priority)"""
@@ -146,6 +149,59 @@ class TestDataGovFetch(unittest.TestCase):
         self.assertIsNotNone(first_561720_index)
         self.assertLess(first_561720_index, len(contracts) // 2, "561720 should appear in first half")
 
+    def _write_bulk_csv(self, path, rows=50):
+        import csv
+        with open(path, 'w', newline='') as fh:
+            writer = csv.writer(fh)
+            writer.writerow(['Award ID', 'Award Description', 'Awarding Agency Name', 'NAICS Code',
+                             'Place of Performance State Code', 'Action Date'])
+            for i in range(rows):
+                naics = '561720' if i % 2 == 0 else '236220'
+                state = 'VA' if i % 5 else 'MD'
+                writer.writerow([f'AWD-{i}', 'Custodial services', 'GSA', naics, state, '2025-03-01'])
+
+    def test_streaming_bulk_zip_filters_and_batches(self):
+        """Bulk ZIP archives are read member by member and handed to the sink in batches"""
+        import tempfile
+        import zipfile
+        with tempfile.TemporaryDirectory() as tmp:
+            part1, part2 = os.path.join(tmp, 'part1.csv'), os.path.join(tmp, 'part2.csv')
+            self._write_bulk_csv(part1)
+            self._write_bulk_csv(part2, rows=10)
+            archive = os.path.join(tmp, 'awards.zip')
+            with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+                zf.write(part1, 'part1.csv')
+                zf.write(part2, 'part2.csv')
+
+            batches = []
+            stats = self.fetcher.ingest_bulk_file(archive, lambda batch: batches.append(list(batch)),
+                                                  batch_size=8, states=['VA'])
+
+        # 561720 rows in VA: even indexes not divisible by 5 -> 20 of 50 plus 4 of 10
+        self.assertEqual(stats['rows_kept'], 24)
+        self.assertEqual([len(b) for b in batches], [8, 8, 8])
+        self.assertTrue(all(c['naics_code'] == '561720' and c['location'].endswith('VA')
+                            for b in batches for c in b))
+
+    @patch('datagov_bulk_fetcher.requests.get')
+    def test_streaming_download_uses_chunks(self, mock_get):
+        """Remote CSVs are streamed to disk instead of read via response.content"""
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'awards.csv')
+            self._write_bulk_csv(path, rows=6)
+            with open(path, 'rb') as fh:
+                payload = fh.read()
+        response = MagicMock()
+        response.__enter__.return_value = response
+        response.iter_content.return_value = [payload[i:i + 64] for i in range(0, len(payload), 64)]
+        mock_get.return_value = response
+
+        contracts = self.fetcher._download_and_parse_csv('https://example.com/awards.csv')
+
+        self.assertEqual(len(contracts), 3)
+        self.assertTrue(mock_get.call_args.kwargs.get('stream'))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+from flask import Flask
+from sqlalchemy import create_engine, text
+
+from db_metrics import DBRequestMetrics, engine_options
+
+
+class DBRequestMetricsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        self.app = Flask(__name__)
+        self.metrics = DBRequestMetrics(warn_threshold=0, headers=True)
+        self.metrics.init_app(self.app, self.engine)
+
+        @self.app.route('/two-queries')
+        def two_queries():
+            with self.engine.connect() as conn:
+                conn.execute(text('SELECT 1'))
+                conn.execute(text('SELECT 2'))
+            return 'ok'
+
+        @self.app.route('/static-ish')
+        def static_ish():
+            return 'ok'
+
+        self.client = self.app.test_client()
+
+    def test_counts_statements_per_request_and_endpoint(self):
+        response = self.client.get('/two-queries')
+        self.assertEqual(response.headers['X-DB-Queries'], '2')
+        self.assertIn('desc="2 queries"', response.headers['Server-Timing'])
+        self.assertEqual(self.client.get('/static-ish').headers['X-DB-Queries'], '0')
+        self.client.get('/two-queries')
+
+        stats = self.metrics.stats()
+        self.assertEqual(list(stats), ['two_queries', 'static_ish'])
+        self.assertEqual((stats['two_queries']['requests'], stats['two_queries']['avg_statements'],
+                          stats['two_queries']['checkouts']), (2, 2.0, 2))
+        self.assertEqual((stats['static_ish']['checkouts'], stats['static_ish']['no_db_requests']), (0, 1))
+
+        # Statements outside a request are not attributed to one
+        with self.engine.connect() as conn:
+            conn.execute(text('SELECT 3'))
+        self.assertEqual(self.metrics.stats()['two_queries']['statements'], 4)
+
+    def test_engine_options(self):
+        postgres = engine_options('postgresql://u:p@db/app')
+        self.assertTrue(postgres['pool_pre_ping'])
+        self.assertIn('pool_size', postgres)
+        self.assertNotIn('pool_size', engine_options('sqlite:///leads.db'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import json
+import random
+import unittest
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from digest_matcher import (DigestIndex, group_digests, lead_fields, load_subscriber_filters, parse_filters,
+                            parse_value, subscriber_filters)
+
+
+def brute_force(filters, lead):
+    """Reference: evaluate every filter against the lead."""
+    fields = lead_fields(lead)
+    matched = set()
+    for f in filters:
+        if f.states and fields.state not in f.states:
+            continue
+        if f.naics and not any(code.startswith(prefix) for code in fields.naics for prefix in f.naics):
+            continue
+        if f.categories and fields.category not in f.categories:
+            continue
+        if f.keywords and not any(k in fields.text.lower() for k in f.keywords):
+            continue
+        if f.min_value and (fields.value is None or fields.value < f.min_value):
+            continue
+        matched.add(f.email)
+    return matched
+
+
+class DigestMatcherTestCase(unittest.TestCase):
+    def test_filters_are_normalised(self):
+        f = parse_filters('a@example.com', json.dumps({'states': ['va', 'Norfolk'], 'naics_codes': '561720, 5617',
+                                                       'category': 'Janitorial', 'min_value': '$50K',
+                                                       'keywords': ['Floor Care']}))
+        self.assertEqual((f.states, f.naics, f.categories, f.min_value, f.keywords),
+                         (('VA',), ('5617', '561720'), ('janitorial',), 50000.0, ('floor care',)))
+        self.assertEqual(parse_value('$1,250,000'), 1250000.0)
+        self.assertEqual(parse_value('$50K - $100K'), 50000.0)
+        self.assertIsNone(parse_value('N/A'))
+        fields = lead_fields({'title': 'Custodial', 'location': 'Norfolk, VA', 'naics_code': '561720',
+                              'value': '$75,000'})
+        self.assertEqual((fields.state, fields.naics, fields.value), ('VA', ('561720',), 75000.0))
+
+    def test_index_matches_each_facet(self):
+        filters = subscriber_filters(
+            ['all@example.com', 'va@example.com', 'md@example.com', 'rich@example.com', 'floor@example.com'],
+            saved_searches=[
+                ('va@example.com', 'VA cleaning', {'states': ['VA'], 'naics': ['5617']}),
+                ('md@example.com', 'MD', {'state': 'MD'}),
+                ('floor@example.com', 'Floors', {'keywords': 'floor care, carpet', 'min_value': 10000}),
+            ],
+            preferences=[('rich@example.com', {'min_contract_value': 1000000, 'preferred_locations': None})])
+        index = DigestIndex(filters)
+        leads = [
+            {'title': 'Janitorial services', 'state': 'VA', 'naics_code': '561720', 'estimated_value': 20000},
+            {'title': 'Carpet cleaning', 'location': 'Baltimore, MD', 'estimated_value': 2000000},
+            {'title': 'Floor care', 'state': 'VA', 'naics_code': '236220'},
+        ]
+        digests = index.digests(leads)
+        self.assertEqual(digests['all@example.com'], leads)
+        self.assertEqual(digests['va@example.com'], [leads[0]])
+        self.assertEqual(digests['md@example.com'], [leads[1]])
+        self.assertEqual(digests['rich@example.com'], [leads[1]])
+        # The third lead has no value, so the minimum-value filter skips it
+        self.assertEqual(digests['floor@example.com'], [leads[1]])
+
+        groups = group_digests(digests)
+        self.assertEqual(sorted(sorted(emails) for _, emails in groups),
+                         [['all@example.com'], ['floor@example.com', 'md@example.com', 'rich@example.com'],
+                          ['va@example.com']])
+
+    def test_index_agrees_with_brute_force(self):
+        rng = random.Random(11)
+        states, naics = ['VA', 'MD', 'DC', 'NC'], ['561720', '561710', '236220', '238990']
+        words = ['janitorial', 'carpet', 'roofing', 'window cleaning', 'hvac']
+        filters = []
+        for i in range(300):
+            spec = {}
+            if rng.random() < 0.5:
+                spec['states'] = rng.sample(states, rng.randint(1, 2))
+            if rng.random() < 0.3:
+                spec['naics'] = [rng.choice(naics)[:rng.randint(2, 6)]]
+            if rng.random() < 0.3:
+                spec['categories'] = [rng.choice(['federal', 'commercial'])]
+            if rng.random() < 0.3:
+                spec['keywords'] = rng.sample(words, 2)
+            if rng.random() < 0.3:
+                spec['min_value'] = rng.choice([1000, 50000, 250000])
+            filters.append(parse_filters(f'user{i % 200}@example.com', spec))
+        index = DigestIndex(filters)
+        for _ in range(200):
+            lead = {'title': ' '.join(rng.sample(words + ['services', 'repair'], 2)),
+                    'state': rng.choice(states), 'naics_code': rng.choice(naics),
+                    'category': rng.choice(['federal', 'commercial']),
+                    'estimated_value': rng.choice([None, 500, 60000, 300000])}
+            self.assertEqual({f.email for f in (index.filters[i] for i in index.match(lead_fields(lead)))},
+                             brute_force(filters, lead))
+
+    def test_load_subscriber_filters(self):
+        engine = create_engine('sqlite://')
+        with Session(engine) as session:
+            session.execute(text('''CREATE TABLE saved_searches (id INTEGER PRIMARY KEY, user_email TEXT,
+                                    search_name TEXT, search_filters JSON, alert_enabled BOOLEAN)'''))
+            session.execute(text('''INSERT INTO saved_searches (user_email, search_name, search_filters,
+                                                                alert_enabled) VALUES
+                                    ('a@example.com', 'VA', '{"states": ["VA"]}', 1),
+                                    ('b@example.com', 'Muted', '{"states": ["MD"]}', 0)'''))
+            # No user_preferences table: saved searches alone still work
+            filters = load_subscriber_filters(session, ['a@example.com', 'b@example.com'])
+        self.assertEqual([(f.email, f.states) for f in filters], [('a@example.com', ('VA',)),
+                                                                  ('b@example.com', ())])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from document_pipeline import (can_read_extraction, ensure_document_tables, extraction_text, fill_document_text,
+                               get_extraction, request_extraction, run_extraction)
+from job_queue import ensure_job_table
+
+
+class DocumentPipelineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.session = Session(create_engine('sqlite://'))
+        self.assertTrue(ensure_job_table(self.session))
+        self.assertTrue(ensure_document_tables(self.session))
+        self.session.execute(text('CREATE TABLE uploads (id INTEGER PRIMARY KEY, file_hash TEXT, body TEXT)'))
+        self.session.commit()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def tearDown(self):
+        self.session.close()
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def _pdf(self, name, pages):
+        from reportlab.pdfgen import canvas
+        path = os.path.join(self.tmpdir, name)
+        c = canvas.Canvas(path)
+        for page in pages:
+            c.drawString(72, 720, page)
+            c.showPage()
+        c.save()
+        return path
+
+    def _job_count(self):
+        return self.session.execute(text('SELECT COUNT(*) FROM background_jobs')).scalar()
+
+    def test_reupload_is_deduplicated_by_hash(self):
+        first = request_extraction(self.session, self._write('a.txt', 'Scope of work: janitorial'))
+        self.assertEqual(first['status'], 'queued')
+        again = request_extraction(self.session, self._write('copy.txt', 'Scope of work: janitorial'))
+        self.assertEqual((again['file_hash'], again['job_id']), (first['file_hash'], first['job_id']))
+        self.assertEqual(self._job_count(), 1)
+
+        self.session.execute(text("INSERT INTO uploads (file_hash) VALUES (:h)"), {'h': first['file_hash']})
+        self.session.commit()
+        run_extraction(self.session, first['file_hash'], os.path.join(self.tmpdir, 'a.txt'), processes=0)
+        fill_document_text(self.session, first['file_hash'], [('uploads', 'body')])
+        self.assertEqual(self.session.execute(text('SELECT body FROM uploads')).scalar(), 'Scope of work: janitorial')
+
+        done = request_extraction(self.session, self._write('third.txt', 'Scope of work: janitorial'))
+        self.assertEqual(done['status'], 'done')
+        self.assertEqual(self._job_count(), 1)
+
+    def test_pages_are_stored_in_batches_with_offsets(self):
+        path = self._pdf('rfp.pdf', ['Page one', 'Page two', 'Page three'])
+        extraction = request_extraction(self.session, path)
+        progress = []
+        result = run_extraction(self.session, extraction['file_hash'], path, processes=0, batch=2,
+                                progress=lambda **fields: progress.append(fields['pages_done']))
+        self.assertEqual(result['page_count'], 3)
+        self.assertEqual(progress, [2, 3])
+
+        pages = self.session.execute(text('''SELECT page_no, char_offset, text FROM document_pages
+                                              ORDER BY page_no''')).fetchall()
+        joined = extraction_text(self.session, extraction['file_hash'])
+        self.assertEqual(joined, 'Page one\nPage two\nPage three')
+        for page in pages:
+            self.assertEqual(joined[page.char_offset:page.char_offset + len(page.text)], page.text)
+        self.assertEqual(get_extraction(self.session, extraction['file_hash'])['char_count'], len(joined))
+
+    def test_process_pool_and_failure_requeue(self):
+        path = self._pdf('pool.pdf', ['Alpha', 'Beta'])
+        extraction = request_extraction(self.session, path)
+        run_extraction(self.session, extraction['file_hash'], path, processes=1, batch=1)
+        self.assertEqual(extraction_text(self.session, extraction['file_hash']), 'Alpha\nBeta')
+
+        broken = self._write('broken.pdf', 'not really a pdf')
+        failed = request_extraction(self.session, broken)
+        with self.assertRaises(Exception):
+            run_extraction(self.session, failed['file_hash'], broken, processes=0)
+        self.assertEqual(get_extraction(self.session, failed['file_hash'])['status'], 'failed')
+
+        # The job is still 'queued' here (no worker ran it), so a re-upload reuses it
+        self.assertEqual(request_extraction(self.session, broken)['job_id'], failed['job_id'])
+        self.session.execute(text("UPDATE background_jobs SET status = 'failed' WHERE id = :id"),
+                             {'id': failed['job_id']})
+        self.session.commit()
+        retried = request_extraction(self.session, broken)
+        self.assertEqual((retried['status'], self._job_count()), ('queued', 3))
+
+    def test_legacy_doc_and_uploader_access(self):
+        path = os.path.join(self.tmpdir, 'old.doc')
+        with open(path, 'wb') as f:
+            f.write(b'\xd0\xcf\x11\xe0Statement of work: floor care\xff')
+        extraction = request_extraction(self.session, path, user_email='owner@example.com')
+        run_extraction(self.session, extraction['file_hash'], path, processes=0)
+        self.assertIn('Statement of work: floor care', extraction_text(self.session, extraction['file_hash']))
+
+        # Uploading the same content again grants access without a second job
+        request_extraction(self.session, path, user_email='second@example.com')
+        self.assertEqual(self._job_count(), 1)
+        self.assertTrue(can_read_extraction(self.session, extraction['file_hash'], 'owner@example.com'))
+        self.assertTrue(can_read_extraction(self.session, extraction['file_hash'], 'second@example.com'))
+        self.assertFalse(can_read_extraction(self.session, extraction['file_hash'], 'other@example.com'))
+        self.assertFalse(can_read_extraction(self.session, extraction['file_hash'], None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+
+from cache_layer import TieredCache
+from entitlements import entitlement_tag, load_entitlements
+
+
+class EntitlementsTestCase(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine('sqlite://')
+        self.statements = []
+        event.listen(engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: self.statements.append(statement))
+        self.session = Session(engine)
+        for ddl in ('CREATE TABLE leads (id INTEGER PRIMARY KEY, email TEXT, subscription_status TEXT)',
+                    'CREATE TABLE subscriptions (email TEXT, plan_type TEXT, status TEXT, created_at TIMESTAMP)',
+                    'CREATE TABLE messages (id INTEGER PRIMARY KEY, recipient_id INTEGER, is_read INTEGER)'):
+            self.session.execute(text(ddl))
+        self.session.execute(text("INSERT INTO leads VALUES (1, 'a@x.com', 'paid'), (2, 'b@x.com', 'unpaid')"))
+        self.session.execute(text("INSERT INTO subscriptions VALUES ('a@x.com', 'annual', 'active', '2025-01-01')"))
+        self.session.execute(text('INSERT INTO messages (recipient_id, is_read) VALUES (1, 0), (1, NULL), (1, 1)'))
+        self.session.commit()
+        self.cache = TieredCache(shared=None)
+        self.statements.clear()
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_one_query_then_cached_until_invalidated(self):
+        ent = load_entitlements(self.session, self.cache, 1, 'a@x.com')
+        self.assertEqual((ent.is_paid, ent.is_annual, ent.unread_messages), (True, True, 2))
+        self.assertEqual(len(self.statements), 1)
+
+        load_entitlements(self.session, self.cache, 1, 'a@x.com')
+        self.assertEqual(len(self.statements), 1)
+
+        self.session.execute(text("UPDATE leads SET subscription_status = 'cancelled' WHERE id = 1"))
+        self.session.commit()
+        self.cache.invalidate_tag(entitlement_tag(1))
+        self.statements.clear()
+        ent = load_entitlements(self.session, self.cache, 1, 'a@x.com')
+        self.assertFalse(ent.is_paid)
+        self.assertEqual(len(self.statements), 1)
+
+    def test_anonymous_admin_and_partial_schema(self):
+        self.assertFalse(load_entitlements(self.session, self.cache).is_paid)
+        self.assertTrue(load_entitlements(self.session, self.cache, is_admin=True).is_paid)
+        self.assertEqual(self.statements, [])
+
+        self.session.execute(text('DROP TABLE messages'))
+        self.session.commit()
+        ent = load_entitlements(self.session, self.cache, 2, 'b@x.com')
+        self.assertEqual((ent.subscription_status, ent.plan_type, ent.unread_messages), ('unpaid', None, 0))
+        self.assertFalse(ent.is_paid)
+
+
+if __name__ == '__main__':
+    unittest.main()
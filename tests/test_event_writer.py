@@ -0,0 +1,97 @@
+import os
+import tempfile
+import time
+import unittest
+
+from sqlalchemy import create_engine, text
+
+from event_writer import EventWriter, _copy_value
+
+
+class EventWriterTestCase(unittest.TestCase):
+    def setUp(self):
+        # A file database: the writer thread needs to see the same tables
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        self.engine = create_engine(f'sqlite:///{self.path}')
+        self.addCleanup(self.engine.dispose)
+        with self.engine.begin() as conn:
+            conn.execute(text('''CREATE TABLE search_history (id INTEGER PRIMARY KEY, user_email TEXT NOT NULL,
+                                 query TEXT NOT NULL, results_count INTEGER, created_at TIMESTAMP)'''))
+            conn.execute(text('''CREATE TABLE admin_actions (id INTEGER PRIMARY KEY, admin_id INTEGER,
+                                 action_type TEXT, timestamp TIMESTAMP)'''))
+
+    def _writer(self, **options):
+        options.setdefault('flush_seconds', 60)
+        writer = EventWriter(self.engine, enabled=True, **options)
+        writer.register_table('search_history', ['user_email', 'query', 'results_count', 'created_at'],
+                              timestamp='created_at')
+        writer.register_table('admin_actions', ['admin_id', 'action_type', 'timestamp'], timestamp='timestamp')
+        self.addCleanup(writer.close)
+        return writer
+
+    def _count(self, table):
+        with self.engine.connect() as conn:
+            return conn.execute(text(f'SELECT COUNT(*) FROM {table}')).scalar()
+
+    def test_events_are_buffered_then_written_in_batches(self):
+        writer = self._writer(batch_size=50)
+        for i in range(120):
+            self.assertTrue(writer.emit('search_history', user_email='a@example.com', query=f'q{i}',
+                                        results_count=i))
+        writer.flush()
+        self.assertEqual(self._count('search_history'), 120)
+        stats = writer.stats()
+        self.assertEqual((stats['enqueued'], stats['written'], stats['buffered']), (120, 120, 0))
+        self.assertEqual(stats['batches'], 3)
+        with self.engine.connect() as conn:
+            self.assertIsNotNone(conn.execute(text('SELECT MIN(created_at) FROM search_history')).scalar())
+
+    def test_full_buffer_drops_but_keeps_required_events(self):
+        writer = self._writer(capacity=3, batch_size=100)
+        for i in range(5):
+            writer.emit('search_history', user_email='a@example.com', query=f'q{i}')
+        self.assertTrue(writer.emit('admin_actions', required=True, admin_id=1, action_type='user_deleted'))
+        # The audit row went straight to the database
+        self.assertEqual(self._count('admin_actions'), 1)
+        stats = writer.stats()
+        self.assertEqual((stats['buffered'], stats['dropped'], stats['inline']), (3, 2, 1))
+
+        blocking = self._writer(capacity=1, batch_size=100, overflow='block', block_seconds=0.01)
+        blocking.emit('search_history', user_email='b@example.com', query='one')
+        self.assertFalse(blocking.emit('search_history', user_email='b@example.com', query='two'))
+        self.assertEqual((blocking.stats()['blocked'], blocking.stats()['dropped']), (1, 1))
+
+    def test_close_flushes_and_bad_batches_are_counted(self):
+        writer = self._writer(batch_size=100)
+        writer.emit('search_history', user_email='a@example.com', query='kept')
+        # NOT NULL violation: the whole batch for that kind fails
+        writer.emit('search_history', user_email=None, query='broken')
+        writer.emit('admin_actions', admin_id=2, action_type='login')
+        self.assertFalse(writer.emit('unknown_kind', foo=1))
+        writer.close()
+        self.assertEqual((self._count('search_history'), self._count('admin_actions')), (0, 1))
+        stats = writer.stats()
+        self.assertEqual((stats['failed'], stats['written'], stats['buffered']), (2, 1, 0))
+        self.assertIn('search_history', stats['last_error'])
+
+    def test_background_thread_writes_after_flush_interval(self):
+        writer = self._writer(batch_size=100, flush_seconds=0.05)
+        writer.emit('search_history', user_email='a@example.com', query='later')
+        deadline = time.time() + 5
+        while writer.stats()['written'] == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self._count('search_history'), 1)
+        thread = writer._thread
+        writer.close()
+        self.assertFalse(thread.is_alive())
+
+    def test_copy_encoding(self):
+        self.assertEqual(_copy_value(None), '\\N')
+        self.assertEqual(_copy_value('a\tb\nc\\d'), 'a\\tb\\nc\\\\d')
+        self.assertEqual(_copy_value(7), '7')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+from datetime import date
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from facet_cache import (
+    ensure_facet_table,
+    rebuild_federal_facets,
+    get_facet_counts,
+    get_facet_values,
+    invalidate_facets,
+)
+from federal_relevance import LISTING_WHERE_SQL
+
+
+class FacetCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        invalidate_facets()
+        self.session = Session(create_engine('sqlite://'))
+        self.session.execute(text('''CREATE TABLE federal_contracts
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT, department TEXT, location TEXT,
+                      deadline DATE, is_relevant INTEGER)'''))
+        self.session.execute(text('''INSERT INTO federal_contracts (title, department, location, deadline, is_relevant)
+                                     VALUES ('A', 'Navy', 'Norfolk, VA', '2099-01-01', 1),
+                                            ('B', 'Navy', 'Norfolk, VA 23511', '2099-01-01', 1),
+                                            ('C', 'Army', 'VA', '2099-01-01', 1),
+                                            ('D', 'Army', 'Richmond, VA', '2000-01-01', 1),
+                                            ('E', '', 'Hampton, VA', '2099-01-01', 0)'''))
+        self.session.commit()
+        ensure_facet_table(self.session)
+
+    def tearDown(self):
+        invalidate_facets()
+        self.session.close()
+
+    def test_rebuild_counts_open_relevant_contracts(self):
+        self.assertEqual(rebuild_federal_facets(self.session), {'department': 2, 'city': 3})
+        self.assertEqual(get_facet_counts(self.session, 'federal', 'department'), {'Army': 1, 'Navy': 2})
+        self.assertEqual(get_facet_counts(self.session, 'federal', 'city'), {'Hampton': 0, 'Norfolk': 2, 'Richmond': 0})
+
+    def test_counts_use_the_listing_predicate(self):
+        # Not classified yet: the listing hides it, so the facets must not count it
+        self.session.execute(text('''INSERT INTO federal_contracts (title, department, location, deadline, is_relevant)
+                                     VALUES ('F', 'Navy', 'Norfolk, VA', '2099-01-01', NULL)'''))
+        self.session.commit()
+        rebuild_federal_facets(self.session)
+        listed = self.session.execute(text(f'''SELECT COUNT(*) FROM federal_contracts
+                                               WHERE {LISTING_WHERE_SQL} AND department = 'Navy' '''),
+                                      {'today': date.today().isoformat()}).scalar()
+        self.assertEqual(get_facet_counts(self.session, 'federal', 'department')['Navy'], listed)
+
+    def test_built_on_first_read_and_memoized_until_invalidated(self):
+        self.assertEqual(get_facet_values(self.session, 'federal', 'department'), ['Army', 'Navy'])
+
+        self.session.execute(text("INSERT INTO lead_facets (source, facet, value, item_count) VALUES ('federal', 'department', 'GSA', 3)"))
+        self.session.commit()
+        self.assertEqual(get_facet_values(self.session, 'federal', 'department'), ['Army', 'Navy'])
+
+        invalidate_facets('federal')
+        self.assertEqual(get_facet_values(self.session, 'federal', 'department'), ['Army', 'GSA', 'Navy'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+
+from federal_ingest import bulk_upsert_federal_contracts, ensure_notice_id_index, normalize_federal_contract
+
+
+def _contract(notice_id, title='Custodial Services', deadline='2099-01-01'):
+    return {'notice_id': notice_id, 'title': title, 'agency': 'GSA', 'department': 'GSA',
+            'location': 'Norfolk, VA', 'value': '$1,000.00', 'deadline': deadline,
+            'description': 'Janitorial', 'naics_code': 561720, 'sam_gov_url': 'https://sam.gov/x',
+            'set_aside': '', 'posted_date': '2025-03-01'}
+
+
+class FederalIngestTestCase(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        self.session = Session(self.engine)
+        self.session.execute(text('''CREATE TABLE federal_contracts
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, agency TEXT NOT NULL,
+                      department TEXT, location TEXT, value TEXT, deadline DATE, description TEXT,
+                      naics_code TEXT, sam_gov_url TEXT NOT NULL, notice_id TEXT, set_aside TEXT,
+                      posted_date DATE, relevance_version INTEGER DEFAULT 0)'''))
+        self.session.commit()
+        self.assertTrue(ensure_notice_id_index(self.session))
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_normalize(self):
+        row = normalize_federal_contract(_contract('N1', deadline='Open'))
+        self.assertIsNone(row['deadline'])
+        self.assertEqual(row['naics_code'], '561720')
+        self.assertIsNone(normalize_federal_contract({'title': 'No notice id'}))
+
+    def test_insert_update_skip_counts(self):
+        first = bulk_upsert_federal_contracts(self.session, [_contract(f'N{i}') for i in range(5)], chunk_size=2)
+        self.assertEqual((first['inserted'], first['updated'], first['skipped']), (5, 0, 0))
+
+        self.session.execute(text("UPDATE federal_contracts SET relevance_version = 1"))
+        self.session.commit()
+        batch = [_contract('N0', title='Custodial Services (amended)'), _contract('N1'), _contract('N1'),
+                 _contract('N9'), {'title': 'missing id'}]
+        second = bulk_upsert_federal_contracts(self.session, batch)
+        self.assertEqual((second['inserted'], second['updated'], second['skipped']), (1, 1, 3))
+        self.assertEqual(second['inserted_notice_ids'], ['N9'])
+
+        row = self.session.execute(text("SELECT title, relevance_version FROM federal_contracts WHERE notice_id = 'N0'")).fetchone()
+        self.assertEqual(tuple(row), ('Custodial Services (amended)', 0))
+        self.assertEqual(self.session.execute(text('SELECT COUNT(*) FROM federal_contracts')).scalar(), 6)
+
+    def test_ignore_mode_and_round_trips(self):
+        bulk_upsert_federal_contracts(self.session, [_contract('N0')])
+        statements = []
+        event.listen(self.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        summary = bulk_upsert_federal_contracts(self.session, [_contract('N0', title='Changed')] +
+                                                [_contract(f'M{i}') for i in range(1000)],
+                                                on_conflict='ignore', chunk_size=500)
+        self.assertEqual((summary['inserted'], summary['updated'], summary['skipped']), (1000, 0, 1))
+        self.assertEqual(self.session.execute(text("SELECT title FROM federal_contracts WHERE notice_id = 'N0'")).scalar(),
+                         'Custodial Services')
+        writes = [s for s in statements if s.lstrip().upper().startswith(('INSERT', 'SELECT NOTICE_ID'))]
+        self.assertLessEqual(len(writes), 8)
+
+    def test_one_insert_statement_per_chunk(self):
+        executions = []
+        event.listen(self.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, params, context, executemany:
+                     executions.append((statement, executemany)))
+        summary = bulk_upsert_federal_contracts(self.session, [_contract(f'N{i}') for i in range(1200)],
+                                                chunk_size=500)
+        self.assertEqual(summary['inserted'], 1200)
+        inserts = [(s, many) for s, many in executions if s.lstrip().upper().startswith('INSERT')]
+        # 500 + 500 + 200: one multi-row statement per chunk, never an executemany
+        self.assertEqual(len(inserts), 3)
+        self.assertFalse(any(many for _, many in inserts))
+        self.assertEqual(self.session.execute(text('SELECT COUNT(*) FROM federal_contracts')).scalar(), 1200)
+
+    def test_bad_row_only_fails_itself(self):
+        # Stands in for a value the database rejects (bad type, constraint, encoding)
+        self.session.execute(text('''CREATE TRIGGER reject_bad BEFORE INSERT ON federal_contracts
+                                     WHEN NEW.notice_id = 'BAD' BEGIN SELECT RAISE(ABORT, 'rejected'); END'''))
+        self.session.commit()
+        contracts = [_contract(f'N{i}') for i in range(6)]
+        contracts.insert(3, _contract('BAD'))
+        summary = bulk_upsert_federal_contracts(self.session, contracts, chunk_size=5)
+        self.assertEqual((summary['inserted'], summary['failed']), (6, 1))
+        self.assertNotIn('BAD', summary['inserted_notice_ids'])
+        self.assertEqual(self.session.execute(text('SELECT COUNT(*) FROM federal_contracts')).scalar(), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
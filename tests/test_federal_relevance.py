@@ -0,0 +1,96 @@
+import unittest
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from federal_relevance import (
+    LISTABLE_SQL,
+    LISTING_SORT_SQL,
+    RELEVANCE_VERSION,
+    classify_federal_contract,
+    ensure_relevance_columns,
+    classify_pending_federal_contracts,
+)
+
+
+class FederalRelevanceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.session = Session(create_engine('sqlite://'))
+        self.session.execute(text('''CREATE TABLE federal_contracts
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, description TEXT,
+                      naics_code TEXT, deadline DATE, posted_date DATE, created_at TIMESTAMP)'''))
+        self.session.execute(text('''INSERT INTO federal_contracts (title, description, naics_code, deadline)
+                                     VALUES ('Custodial Services - Norfolk', NULL, NULL, '2099-01-01'),
+                                            ('Award Notice: Janitorial', NULL, '561720', '2099-01-01'),
+                                            ('Road Construction Phase II', NULL, '237310', '2099-01-01'),
+                                            ('Office furniture', 'Desks and chairs', '337214', '2099-01-01')'''))
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_classify_rules(self):
+        self.assertEqual(classify_federal_contract('CANCELLED - Custodial'), (False, 'excluded_cancelled'))
+        self.assertEqual(classify_federal_contract('Vehicle research program'), (False, 'excluded_research'))
+        self.assertEqual(classify_federal_contract('Base services', naics_code='561720'), (True, 'cleaning'))
+        self.assertEqual(classify_federal_contract('Base services', 'Floor care and trash removal'), (True, 'cleaning'))
+        self.assertEqual(classify_federal_contract('Office furniture'), (True, 'general'))
+
+    def test_backfill_populates_indexed_columns(self):
+        self.assertTrue(ensure_relevance_columns(self.session))
+        self.assertEqual(classify_pending_federal_contracts(self.session, batch_size=2), 4)
+        # Already classified rows are not touched again
+        self.assertEqual(classify_pending_federal_contracts(self.session), 0)
+
+        rows = self.session.execute(text('''SELECT title, category FROM federal_contracts
+                                            WHERE is_relevant = TRUE AND deadline >= '2025-01-01' ORDER BY id''')).fetchall()
+        self.assertEqual([(r.title, r.category) for r in rows],
+                         [('Custodial Services - Norfolk', 'cleaning'), ('Office furniture', 'general')])
+
+        plan = ' '.join(str(r[-1]) for r in self.session.execute(text('''EXPLAIN QUERY PLAN
+            SELECT COUNT(*) FROM federal_contracts WHERE is_relevant = TRUE AND deadline >= '2025-01-01' ''')).fetchall())
+        self.assertIn('idx_federal_contracts_listing', plan)
+
+    def test_reclassify_all_after_rule_change(self):
+        ensure_relevance_columns(self.session)
+        classify_pending_federal_contracts(self.session)
+        self.assertEqual(classify_pending_federal_contracts(self.session, reclassify_all=True), 4)
+        version = self.session.execute(text('SELECT MIN(relevance_version) FROM federal_contracts')).scalar()
+        self.assertEqual(version, RELEVANCE_VERSION)
+
+    def test_unclassified_rows_are_listed_once_classified(self):
+        ensure_relevance_columns(self.session)
+        listed = lambda: self.session.execute(text(f'SELECT COUNT(*) FROM federal_contracts WHERE {LISTABLE_SQL}')).scalar()
+        self.assertEqual(listed(), 0)
+        classify_pending_federal_contracts(self.session)
+        self.assertEqual(listed(), 2)
+        self.session.execute(text("INSERT INTO federal_contracts (title, deadline) VALUES ('Added by admin', '2099-01-01')"))
+        self.session.commit()
+        self.assertEqual(listed(), 2)
+        # The federal_relevance job picks the row up on its next run
+        self.assertEqual(classify_pending_federal_contracts(self.session), 1)
+        self.assertEqual(listed(), 3)
+
+    def test_listing_page_walks_the_listing_index(self):
+        self.session.execute(text('''INSERT INTO federal_contracts (title, deadline, posted_date)
+                                     VALUES (:title, :deadline, :posted)'''),
+                             [{'title': f'Custodial {i}', 'deadline': f'2026-{i % 12 + 1:02d}-15',
+                               'posted': f'2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}'} for i in range(500)])
+        self.session.commit()
+        ensure_relevance_columns(self.session)
+        classify_pending_federal_contracts(self.session)
+        # Production planners have table statistics
+        self.session.execute(text('ANALYZE'))
+        self.session.commit()
+        base_sql = f'FROM federal_contracts WHERE {LISTABLE_SQL} AND deadline IS NOT NULL AND deadline >= :today'
+        for cursor in ('', f' AND ({LISTING_SORT_SQL} < :sort OR ({LISTING_SORT_SQL} = :sort AND id < :id))'):
+            plan = self.session.execute(text(
+                f'EXPLAIN QUERY PLAN SELECT id {base_sql}{cursor} ORDER BY {LISTING_SORT_SQL} DESC, id DESC LIMIT 13'),
+                {'today': '2025-01-01', 'sort': '2025-01-01', 'id': 9}).fetchall()
+            detail = ' '.join(str(row[-1]) for row in plan)
+            self.assertIn('idx_federal_contracts_listing', detail)
+            self.assertNotIn('TEMP B-TREE', detail)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+
+import httpx
+
+from http_cache import HTTPCache, NOT_MODIFIED, UNCHANGED, CHANGED
+from national_scrapers.async_http import AsyncFetchEngine
+from national_scrapers.base_scraper import BaseScraper
+
+
+class HTTPCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        self.cache = HTTPCache(self.path)
+
+    def test_observe_and_cached_parse(self):
+        url = 'https://bids.example.gov/open'
+        calls = []
+
+        def parse(body):
+            calls.append(body)
+            return [{'title': body}]
+
+        first = self.cache.observe('portal', url, 200, {'ETag': '"v1"'}, b'page one')
+        self.assertEqual(first.status, CHANGED)
+        # No stored result yet: don't ask the server for a 304 we couldn't serve
+        self.assertEqual(self.cache.conditional_headers('portal', url), {})
+        self.assertEqual(self.cache.parse(first, parse, 'page one'), [{'title': 'page one'}])
+        self.assertEqual(self.cache.conditional_headers('portal', url), {'If-None-Match': '"v1"'})
+
+        same = self.cache.observe('portal', url, 200, {}, b'page one')
+        self.assertEqual(same.status, UNCHANGED)
+        self.assertEqual(self.cache.parse(same, parse, 'page one'), [{'title': 'page one'}])
+        not_modified = self.cache.observe('portal', url, 304, {}, b'')
+        self.assertEqual(not_modified.status, NOT_MODIFIED)
+        self.assertEqual(self.cache.parse(not_modified, parse, ''), [{'title': 'page one'}])
+        self.assertEqual(len(calls), 1)
+
+        changed = self.cache.observe('portal', url, 200, {}, b'page two')
+        self.assertEqual(self.cache.parse(changed, parse, 'page two'), [{'title': 'page two'}])
+        self.assertEqual(len(calls), 2)
+
+        stats = self.cache.stats()['portal']
+        self.assertEqual((stats['fetched'], stats['not_modified'], stats['unchanged'], stats['changed']),
+                         (4, 1, 1, 2))
+        self.assertEqual(stats['skipped_pct'], 50.0)
+
+
+class _PortalScraper(BaseScraper):
+    def __init__(self, engine, cache):
+        super().__init__('test_portal')
+        self.engine = engine
+        self.http_cache = cache
+        self.parsed = 0
+
+    def scrape(self, url):
+        return self.parse_cached(self.fetch_page(url), self._parse_page)
+
+    def _parse_page(self, response):
+        self.parsed += 1
+        return [{'title': response.text}]
+
+
+class ConditionalScraperTestCase(unittest.TestCase):
+    def test_second_run_is_a_304_and_skips_parsing(self):
+        fd, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        seen = []
+
+        def handler(request):
+            seen.append(request.headers.get('If-None-Match'))
+            if request.headers.get('If-None-Match') == '"abc"':
+                return httpx.Response(304, headers={'ETag': '"abc"'})
+            return httpx.Response(200, text='Janitorial RFP', headers={'ETag': '"abc"'})
+
+        engine = AsyncFetchEngine(transport=httpx.MockTransport(handler), backoff_scale=0.01)
+        self.addCleanup(engine.close)
+        scraper = _PortalScraper(engine, HTTPCache(path))
+
+        url = 'https://bids.example.gov/list'
+        self.assertEqual(scraper.scrape(url), [{'title': 'Janitorial RFP'}])
+        self.assertEqual(scraper.scrape(url), [{'title': 'Janitorial RFP'}])
+        self.assertEqual(seen, [None, '"abc"'])
+        self.assertEqual(scraper.parsed, 1)
+        self.assertEqual(scraper.http_cache.stats()['test_portal']['not_modified'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import contextlib
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from job_queue import (JobWorker, can_read_job, claim_next_job, ensure_job_table, finish_job, get_job,
+                       requeue_stale_jobs, submit_job)
+
+
+class _FakeApp:
+    def app_context(self):
+        return contextlib.nullcontext()
+
+
+class _FakeDB:
+    def __init__(self, session):
+        self.session = session
+
+
+class JobQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.session = Session(create_engine('sqlite://'))
+        self.assertTrue(ensure_job_table(self.session))
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_submit_dedupes_active_and_recent_jobs(self):
+        first = submit_job(self.session, 'find_city_rfps', {'state_code': 'VA'}, dedupe_key='va')
+        self.assertEqual(submit_job(self.session, 'find_city_rfps', {'state_code': 'VA'}, dedupe_key='va'), first)
+        self.assertNotEqual(submit_job(self.session, 'find_city_rfps', {'state_code': 'MD'}, dedupe_key='md'), first)
+
+        job = claim_next_job(self.session, 'w1')
+        self.assertEqual((job['id'], job['status'], job['attempts']), (first, 'running', 1))
+        finish_job(self.session, first, result={'rfps': [1, 2]})
+        self.assertEqual(get_job(self.session, first)['result'], {'rfps': [1, 2]})
+
+        # Finished: a new job unless the caller accepts a recent result
+        self.assertEqual(submit_job(self.session, 'find_city_rfps', {}, dedupe_key='va', reuse_seconds=600), first)
+        self.assertNotEqual(submit_job(self.session, 'find_city_rfps', {}, dedupe_key='va'), first)
+
+    def test_deduplicated_submitters_can_read_shared_job(self):
+        job_id = submit_job(self.session, 'find_city_rfps', {'state_code': 'VA'},
+                            user_email='alice@example.com', dedupe_key='find_city_rfps:VA')
+        self.assertEqual(submit_job(self.session, 'find_city_rfps', {'state_code': 'VA'},
+                                    user_email='bob@example.com', dedupe_key='find_city_rfps:VA'), job_id)
+        self.assertEqual(get_job(self.session, job_id)['user_email'], 'alice@example.com')
+        self.assertTrue(can_read_job(self.session, job_id, 'alice@example.com'))
+        self.assertTrue(can_read_job(self.session, job_id, 'bob@example.com'))
+        self.assertFalse(can_read_job(self.session, job_id, 'carol@example.com'))
+        self.assertFalse(can_read_job(self.session, job_id, None))
+
+    def test_claim_is_exclusive_and_stale_jobs_are_requeued(self):
+        job_id = submit_job(self.session, 'state_rfp_search', {})
+        self.assertEqual(claim_next_job(self.session, 'w1')['id'], job_id)
+        self.assertIsNone(claim_next_job(self.session, 'w2'))
+
+        old = datetime.utcnow() - timedelta(hours=1)
+        self.session.execute(text('UPDATE background_jobs SET heartbeat_at = :old'), {'old': old})
+        self.session.commit()
+        self.assertEqual(requeue_stale_jobs(self.session, stale_seconds=60, max_attempts=2), (1, 0))
+        self.assertEqual(claim_next_job(self.session, 'w2')['attempts'], 2)
+
+        self.session.execute(text('UPDATE background_jobs SET heartbeat_at = :old'), {'old': old})
+        self.session.commit()
+        self.assertEqual(requeue_stale_jobs(self.session, stale_seconds=60, max_attempts=2), (0, 1))
+        self.assertEqual(get_job(self.session, job_id)['status'], 'failed')
+
+    def test_worker_runs_handlers_and_records_failures(self):
+        def handler(params, job):
+            job.progress(stage='scraping', found=3)
+            if params.get('boom'):
+                raise RuntimeError('portal down')
+            return {'rfps': ['a', 'b', 'c']}
+
+        worker = JobWorker(_FakeApp(), _FakeDB(self.session), {'find_city_rfps': handler})
+        ok = submit_job(self.session, 'find_city_rfps', {})
+        bad = submit_job(self.session, 'find_city_rfps', {'boom': True})
+        other = submit_job(self.session, 'unknown_kind', {})
+
+        self.assertEqual(worker.run_once(), ok)
+        self.assertEqual(worker.run_once(), bad)
+        self.assertIsNone(worker.run_once())
+
+        done = get_job(self.session, ok)
+        self.assertEqual((done['status'], done['result'], done['progress']),
+                         ('done', {'rfps': ['a', 'b', 'c']}, {'stage': 'scraping', 'found': 3}))
+        failed = get_job(self.session, bad)
+        self.assertEqual((failed['status'], failed['error']), ('failed', 'portal down'))
+        self.assertEqual(get_job(self.session, other)['status'], 'queued')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import contextlib
+import threading
+import unittest
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from job_scheduler import ScheduledJob, Scheduler, get_job_metrics, set_job_enabled
+
+
+class _FakeApp:
+    def app_context(self):
+        return contextlib.nullcontext()
+
+
+class _FakeDB:
+    def __init__(self, engine):
+        self.engine = engine
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        # One session per thread, like Flask-SQLAlchemy's scoped session
+        if not hasattr(self._local, 'session'):
+            self._local.session = Session(self.engine)
+        return self._local.session
+
+
+class _Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class JobSchedulerTestCase(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+        self.db = _FakeDB(engine)
+        self.app = _FakeApp()
+        self.clock = _Clock(datetime(2025, 3, 1, 1, 0))
+        self.calls = []
+
+    def _scheduler(self, jobs, **kwargs):
+        scheduler = Scheduler(self.app, self.db, jobs, clock=self.clock, poll_seconds=30, **kwargs)
+        scheduler.start()
+        self.addCleanup(scheduler.stop)
+        return scheduler
+
+    def _job(self, name, times=('02:00',), **kwargs):
+        return ScheduledJob(name, lambda: self.calls.append(name), times=list(times), **kwargs)
+
+    def test_next_run(self):
+        job = self._job('x', times=('02:00', '14:30'))
+        self.assertEqual(job.next_run(datetime(2025, 3, 1, 1, 0)), datetime(2025, 3, 1, 2, 0))
+        self.assertEqual(job.next_run(datetime(2025, 3, 1, 2, 0)), datetime(2025, 3, 1, 14, 30))
+        self.assertEqual(job.next_run(datetime(2025, 3, 1, 15, 0)), datetime(2025, 3, 2, 2, 0))
+
+    def test_lease_runs_job_once_across_schedulers(self):
+        first = self._scheduler([self._job('datagov')])
+        second = self._scheduler([self._job('datagov')], owner='other')
+        self.assertEqual(first.tick(), [])
+
+        self.clock.now = datetime(2025, 3, 1, 2, 0, 5)
+        started = first.tick() + second.tick()
+        first.wait_idle(5)
+        self.assertEqual((started, self.calls), (['datagov'], ['datagov']))
+
+        metrics = get_job_metrics(self.db.session)[0]
+        self.assertEqual((metrics['run_count'], metrics['last_status'], metrics['running']), (1, 'ok', False))
+        self.assertEqual(str(metrics['next_run_at'])[:16], '2025-03-02 02:00')
+
+    def test_missed_runs_catch_up_once_and_failures_are_recorded(self):
+        def boom():
+            raise RuntimeError('feed down')
+        scheduler = self._scheduler([self._job('datagov'), self._job('samgov', catchup=False),
+                                     ScheduledJob('usaspending', boom, times=['02:00'])])
+        # Service was down for two days
+        self.clock.now = datetime(2025, 3, 3, 9, 0)
+        self.assertEqual(sorted(scheduler.tick()), ['datagov', 'usaspending'])
+        scheduler.wait_idle(5)
+        self.assertEqual(scheduler.tick(), [])
+        self.assertEqual(self.calls, ['datagov'])
+
+        metrics = {m['name']: m for m in get_job_metrics(self.db.session)}
+        self.assertEqual((metrics['usaspending']['last_status'], metrics['usaspending']['last_error'],
+                          metrics['usaspending']['failure_count']), ('failed', 'feed down', 1))
+        self.assertEqual(str(metrics['samgov']['next_run_at'])[:16], '2025-03-04 02:00')
+
+    def test_concurrency_is_bounded_and_disabled_jobs_skip(self):
+        release = threading.Event()
+        jobs = [ScheduledJob(f'job{i}', release.wait, times=['02:00']) for i in range(3)]
+        jobs.append(self._job('off'))
+        scheduler = self._scheduler(jobs, max_concurrent=2)
+        set_job_enabled(self.db.session, 'off', False)
+
+        self.clock.now = datetime(2025, 3, 1, 2, 1)
+        self.assertEqual(len(scheduler.tick()), 2)
+        self.assertEqual(scheduler.tick(), [])
+        release.set()
+        scheduler.wait_idle(5)
+        self.assertEqual(len(scheduler.tick()), 1)
+        scheduler.wait_idle(5)
+        self.assertEqual(self.calls, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
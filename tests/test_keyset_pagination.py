@@ -0,0 +1,73 @@
+import unittest
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+import keyset_pagination
+from keyset_pagination import (
+    encode_cursor,
+    decode_cursor,
+    keyset_page,
+    approximate_count,
+    invalidate_counts,
+)
+
+FROM_WHERE = "FROM federal_contracts WHERE deadline >= '2025-01-01'"
+
+
+class KeysetPaginationTestCase(unittest.TestCase):
+    def setUp(self):
+        invalidate_counts()
+        self.session = Session(create_engine('sqlite://'))
+        self.session.execute(text('''CREATE TABLE federal_contracts
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT, posted_date DATE, deadline DATE)'''))
+        # Seven rows, with ties on posted_date to exercise the id tiebreaker
+        for i, posted in enumerate(['2025-03-01', '2025-03-02', '2025-03-02', '2025-03-02',
+                                    '2025-03-03', '2025-03-04', '2025-03-04'], start=1):
+            self.session.execute(text("INSERT INTO federal_contracts (title, posted_date, deadline) VALUES (:t, :p, '2099-01-01')"),
+                                 {'t': f'Contract {i}', 'p': posted})
+        self.session.execute(text("INSERT INTO federal_contracts (title, posted_date, deadline) VALUES ('Expired', '2025-03-05', '2000-01-01')"))
+        self.session.commit()
+
+    def tearDown(self):
+        invalidate_counts()
+        self.session.close()
+
+    def _page(self, after=None, before=None):
+        rows, next_cursor, prev_cursor = keyset_page(self.session, 'title', FROM_WHERE, {}, 'posted_date',
+                                                     after=after, before=before, limit=3)
+        return [r.title for r in rows], next_cursor, prev_cursor
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor('2025-03-02', 42)), ('2025-03-02', 42))
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        self.assertIsNone(decode_cursor(None))
+
+    def test_forward_and_backward(self):
+        titles, next_cursor, prev_cursor = self._page()
+        self.assertEqual(titles, ['Contract 7', 'Contract 6', 'Contract 5'])
+        self.assertIsNone(prev_cursor)
+
+        titles, next_cursor, prev_cursor = self._page(after=next_cursor)
+        self.assertEqual(titles, ['Contract 4', 'Contract 3', 'Contract 2'])
+
+        last_titles, last_next, _ = self._page(after=next_cursor)
+        self.assertEqual(last_titles, ['Contract 1'])
+        self.assertIsNone(last_next)
+
+        titles, _, back_prev = self._page(before=prev_cursor)
+        self.assertEqual(titles, ['Contract 7', 'Contract 6', 'Contract 5'])
+        self.assertIsNone(back_prev)
+
+    def test_approximate_count_is_cached(self):
+        self.assertEqual(approximate_count(self.session, FROM_WHERE), 7)
+        self.session.execute(text("DELETE FROM federal_contracts WHERE id = 1"))
+        self.session.commit()
+        self.assertEqual(approximate_count(self.session, FROM_WHERE), 7)
+        invalidate_counts()
+        self.assertEqual(approximate_count(self.session, FROM_WHERE), 6)
+        self.assertEqual(len(keyset_pagination._count_cache), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
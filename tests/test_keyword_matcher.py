@@ -0,0 +1,78 @@
+import random
+import unittest
+
+import keyword_matcher
+from keyword_matcher import (AHOCORASICK_AVAILABLE, CLEANING, KeywordMatcher, Match, get_keyword_set,
+                             matcher_for)
+
+KEYWORDS = ['clean', 'cleaning', 'window cleaning', 'janitor', 'ning', 'sow']
+
+
+class KeywordMatcherTestCase(unittest.TestCase):
+    def _backends(self):
+        backends = [KeywordMatcher(KEYWORDS, use_automaton=False)]
+        if AHOCORASICK_AVAILABLE:
+            backends.append(KeywordMatcher(KEYWORDS, use_automaton=True))
+        return backends
+
+    def test_same_answers_as_substring_checks(self):
+        rng = random.Random(3)
+        alphabet = ['clean', 'ing', 'window ', 'JANITOR', 'ial ', 'so', 'w', ' ', 'x']
+        texts = [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 12))) for _ in range(300)]
+        for matcher in self._backends():
+            for text in texts:
+                lower = text.lower()
+                expected = {k: sum(1 for i in range(len(lower)) if lower.startswith(k, i)) for k in KEYWORDS}
+                expected = {k: n for k, n in expected.items() if n}
+                self.assertEqual(matcher.search(text), bool(expected), text)
+                self.assertEqual(matcher.counts(text), expected, text)
+
+    def test_positions_include_overlapping_keywords(self):
+        for matcher in self._backends():
+            self.assertEqual(matcher.matches('Window Cleaning'), [
+                Match('window cleaning', 0, 15), Match('cleaning', 7, 15), Match('clean', 7, 12), Match('ning', 11, 15),
+            ])
+            self.assertEqual(matcher.matches(None), [])
+
+    def test_substring_backend_below_threshold(self):
+        self.assertEqual(KeywordMatcher(KEYWORDS, use_automaton=False).backend, 'substring')
+        many = KeywordMatcher([f'kw{i:03d}' for i in range(keyword_matcher.REGEX_MIN_KEYWORDS)], use_automaton=False)
+        self.assertEqual(many.backend, 'regex')
+        self.assertTrue(many.search('xx KW017 yy'))
+        self.assertFalse(many.search('kw1'))
+
+    def test_score_and_shared_sets(self):
+        matcher = KeywordMatcher(['safety', 'training', 'pricing', 'scope'])
+        self.assertEqual(matcher.score('Safety training plan'), 0.5)
+        self.assertAlmostEqual(matcher.score('pricing', weights={'pricing': 3}), 0.5)
+
+        self.assertIs(get_keyword_set('cleaning'), CLEANING)
+        self.assertEqual(CLEANING.version, 3)
+
+    def test_word_start_keywords(self):
+        backends = [KeywordMatcher(['porter', 'clean'], use_automaton=False, word_start=['porter']),
+                    KeywordMatcher(['porter'] + [f'kw{i:03d}' for i in range(keyword_matcher.REGEX_MIN_KEYWORDS)],
+                                   use_automaton=False, word_start=['porter'])]
+        if AHOCORASICK_AVAILABLE:
+            backends.append(KeywordMatcher(['porter', 'clean'], use_automaton=True, word_start=['porter']))
+        for matcher in backends:
+            self.assertTrue(matcher.search('Day porter services'))
+            self.assertTrue(matcher.search('Porters, 2 shifts'))
+            self.assertFalse(matcher.search('Fuel transporter and IT supporter'))
+            self.assertEqual(matcher.matches('transporter/porter'), [Match('porter', 12, 18)])
+        self.assertFalse(CLEANING.search('Heavy equipment transporter'))
+        self.assertTrue(CLEANING.search('Day porter'))
+        self.assertTrue(CLEANING.search('JANITORIAL SERVICES - Building 12'))
+        self.assertFalse(CLEANING.search('Roof repair'))
+        self.assertIs(matcher_for(['a', 'b']), matcher_for(('a', 'b')))
+
+    def test_national_scrapers_keep_word_start_rules(self):
+        from national_scrapers.base_scraper import BaseScraper
+        scraper = BaseScraper('test')
+        self.assertFalse(scraper.is_cleaning_related('Heavy equipment transporter; IT supporter'))
+        self.assertTrue(scraper.is_cleaning_related('Day porter services'))
+        self.assertTrue(scraper.is_cleaning_related('Custodial services'))
+
+
+if __name__ == '__main__':
+    unittest.main()
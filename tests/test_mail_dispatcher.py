@@ -0,0 +1,153 @@
+import os
+import smtplib
+import tempfile
+import threading
+import unittest
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from mail_dispatcher import MailDispatcher, ensure_mail_tables, is_permanent_error
+
+
+class FakeSMTP:
+    """Records messages; `fail` is a list of exceptions raised by the next sends."""
+
+    def __init__(self, server):
+        self.server = server
+        self.closed = False
+
+    def send_message(self, message, from_addr=None, to_addrs=None):
+        if self.server.fail:
+            raise self.server.fail.pop(0)
+        if self.closed:
+            raise smtplib.SMTPServerDisconnected('closed')
+        with self.server.lock:
+            self.server.sent.append((message['Subject'], tuple(to_addrs)))
+
+    def quit(self):
+        self.closed = True
+
+    close = quit
+
+
+class FakeServer:
+    def __init__(self):
+        self.connections = []
+        self.sent = []
+        self.fail = []
+        self.lock = threading.Lock()
+
+    def connect(self, provider):
+        connection = FakeSMTP(self)
+        self.connections.append(connection)
+        return connection
+
+
+class MailDispatcherTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeServer()
+
+    def _dispatcher(self, engine=None, **options):
+        options.setdefault('rate_per_second', 0)
+        dispatcher = MailDispatcher(engine=engine, connect=self.server.connect, **options)
+        dispatcher.register_provider('default', 'smtp.example.com', 587, 'user@example.com', 'secret')
+        self.addCleanup(dispatcher.close)
+        return dispatcher
+
+    def _engine(self):
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        engine = create_engine(f'sqlite:///{path}')
+        self.addCleanup(engine.dispose)
+        with Session(engine) as session:
+            self.assertTrue(ensure_mail_tables(session))
+            self.assertTrue(ensure_mail_tables(session))
+        return engine
+
+    def test_pool_reuses_one_logged_in_session(self):
+        dispatcher = self._dispatcher(pool_size=2)
+        for i in range(25):
+            self.assertTrue(dispatcher.send(f'user{i}@example.com', 'Hello', html='<p>hi</p>'))
+        self.assertEqual(len(self.server.sent), 25)
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertFalse(dispatcher.send('x@example.com', 'Hello', provider='missing'))
+
+    def test_dropped_session_is_reopened_once(self):
+        dispatcher = self._dispatcher()
+        dispatcher.deliver_now('default', 'a@example.com', 'First', body='one')
+        self.server.connections[0].closed = True
+        dispatcher.deliver_now('default', 'a@example.com', 'Second', body='two')
+        self.assertEqual(len(self.server.connections), 2)
+        self.assertEqual([subject for subject, _ in self.server.sent], ['First', 'Second'])
+
+    def test_batch_is_stored_once_and_drained(self):
+        engine = self._engine()
+        woken = []
+        dispatcher = self._dispatcher(engine, pool_size=3,
+                                      submit_job=lambda session, kind, params, dedupe_key=None: woken.append(kind))
+        queued = dispatcher.send_batch(['a@example.com', 'b@example.com', 'a@example.com', 'c@example.com'],
+                                       'Digest', html='<p>3 leads</p>', segment='daily')
+        self.assertEqual(queued, 3)
+        self.assertEqual(woken, ['deliver_mail'])
+        self.assertEqual(self.server.sent, [])
+        with engine.connect() as conn:
+            self.assertEqual(conn.execute(text('SELECT COUNT(*) FROM mail_messages')).scalar(), 1)
+
+        totals = dispatcher.deliver_pending()
+        self.assertEqual(totals, {'sent': 3, 'retried': 0, 'failed': 0})
+        self.assertEqual(sorted(to for _, (to,) in self.server.sent), ['a@example.com', 'b@example.com',
+                                                                       'c@example.com'])
+        self.assertEqual(dispatcher.outbox_counts(), {'sent': 3})
+        self.assertEqual(dispatcher.deliver_pending(), {'sent': 0, 'retried': 0, 'failed': 0})
+
+    def test_temporary_errors_retry_and_permanent_errors_fail(self):
+        engine = self._engine()
+        dispatcher = self._dispatcher(engine, pool_size=1)
+        dispatcher.send('temp@example.com', 'One', body='x')
+        dispatcher.send('bad@example.com', 'Two', body='y')
+        self.server.fail = [smtplib.SMTPDataError(451, b'try later'),
+                            smtplib.SMTPRecipientsRefused({'bad@example.com': (550, b'no such user')})]
+        self.assertEqual(dispatcher.deliver_pending(), {'sent': 0, 'retried': 1, 'failed': 1})
+        with engine.connect() as conn:
+            rows = {row.recipient: row for row in conn.execute(text(
+                'SELECT recipient, status, attempts, next_attempt_at, last_error FROM mail_outbox'))}
+        self.assertEqual((rows['temp@example.com'].status, rows['temp@example.com'].attempts), ('queued', 1))
+        self.assertIn('try later', rows['temp@example.com'].last_error)
+        self.assertEqual(rows['bad@example.com'].status, 'failed')
+        # The retry is scheduled in the future, so it is not picked up again yet
+        self.assertEqual(dispatcher.deliver_pending(), {'sent': 0, 'retried': 0, 'failed': 0})
+
+    def test_finished_bodies_are_scrubbed_and_purged(self):
+        engine = self._engine()
+        dispatcher = self._dispatcher(engine, pool_size=1)
+        dispatcher.send_batch(['b@example.com', 'c@example.com'], 'Temp password', body='pw: hunter2')
+        # b waits for a retry, so the shared body must survive c's delivery
+        self.server.fail = [smtplib.SMTPDataError(451, b'later')]
+        self.assertEqual(dispatcher.deliver_pending(), {'sent': 1, 'retried': 1, 'failed': 0})
+        with engine.connect() as conn:
+            self.assertEqual(conn.execute(text('SELECT body FROM mail_messages')).scalar(), 'pw: hunter2')
+
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE mail_outbox SET next_attempt_at = created_at"))
+        dispatcher.send('a@example.com', 'Reset', html='<a href="https://x/reset/token">reset</a>')
+        self.assertEqual(dispatcher.deliver_pending(), {'sent': 2, 'retried': 0, 'failed': 0})
+        with engine.connect() as conn:
+            rows = conn.execute(text('SELECT subject, html, body FROM mail_messages ORDER BY subject')).fetchall()
+        self.assertEqual([tuple(row) for row in rows], [('Reset', None, None), ('Temp password', None, None)])
+
+        dispatcher.send('d@example.com', 'Pending', body='still queued')
+        self.assertEqual(dispatcher.purge_finished(retention_days=0), 3)
+        with engine.connect() as conn:
+            self.assertEqual(conn.execute(text('SELECT body FROM mail_messages')).scalars().all(), ['still queued'])
+        self.assertEqual(dispatcher.outbox_counts(), {'queued': 1})
+
+    def test_permanent_error_classification(self):
+        self.assertTrue(is_permanent_error(smtplib.SMTPDataError(554, b'rejected')))
+        self.assertFalse(is_permanent_error(smtplib.SMTPDataError(421, b'busy')))
+        self.assertFalse(is_permanent_error(smtplib.SMTPServerDisconnected('gone')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import os
+import stat
+import tempfile
+import threading
+import unittest
+
+from unittest import mock
+
+from flask import Flask
+from sqlalchemy import create_engine
+
+import cache_layer
+from rate_limiter import MemoryStore, RateLimiter, SQLStore, build_store, gcra
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class RateLimiterTestCase(unittest.TestCase):
+    def _sql_store(self):
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        engine = create_engine(f'sqlite:///{path}', connect_args={'timeout': 30})
+        self.addCleanup(engine.dispose)
+        return SQLStore(engine)
+
+    def test_gcra_allows_burst_then_refills(self):
+        for store in (MemoryStore(), self._sql_store()):
+            clock = FakeClock()
+            limiter = RateLimiter(store, enabled=True, clock=clock)
+            results = [limiter.hit('login', 'ip:1', 5, 600) for _ in range(6)]
+            self.assertEqual([r.allowed for r in results], [True] * 5 + [False])
+            self.assertEqual([r.remaining for r in results[:5]], [4, 3, 2, 1, 0])
+            self.assertAlmostEqual(results[5].retry_after, 120.0)
+            # Other keys are independent
+            self.assertTrue(limiter.hit('login', 'ip:2', 5, 600).allowed)
+            # One emission interval later exactly one more request fits
+            clock.now += 120
+            self.assertTrue(limiter.hit('login', 'ip:1', 5, 600).allowed)
+            self.assertFalse(limiter.hit('login', 'ip:1', 5, 600).allowed)
+            # After a full period the whole burst is available again
+            clock.now += 600
+            self.assertEqual(limiter.peek('login', 'ip:1', 5, 600).remaining, 5)
+            limiter.reset('login', 'ip:2')
+            self.assertIsNone(store.get('login:ip:2'))
+
+    def test_peek_does_not_count(self):
+        limiter = RateLimiter(MemoryStore(), enabled=True, clock=FakeClock())
+        for _ in range(4):
+            limiter.hit('twofa', 7, 5, 600)
+        self.assertTrue(limiter.peek('twofa', 7, 5, 600).allowed)
+        self.assertTrue(limiter.peek('twofa', 7, 5, 600).allowed)
+        limiter.hit('twofa', 7, 5, 600)
+        self.assertFalse(limiter.peek('twofa', 7, 5, 600).allowed)
+        self.assertEqual(gcra(None, 0.0, 5, 600)[:2], (True, 120.0))
+
+    def test_concurrent_hits_share_one_budget(self):
+        store = self._sql_store()
+        limiter = RateLimiter(store, enabled=True)
+        allowed = []
+
+        def worker():
+            for _ in range(20):
+                if limiter.hit('search', 'user:1', 30, 3600).allowed:
+                    allowed.append(1)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(allowed), 30)
+        self.assertEqual(limiter.stats()['limits']['search'], {'allowed': 30, 'limited': 50, 'errors': 0})
+
+    def test_decorator(self):
+        app = Flask(__name__)
+        app.config['RATELIMIT_ENABLED'] = True
+        limiter = RateLimiter(MemoryStore(), enabled=True, clock=FakeClock())
+
+        @app.route('/api/search')
+        @limiter.limit('search', 2, 60, methods=('GET',))
+        def search():
+            return 'ok'
+
+        @app.route('/signin', methods=['GET', 'POST'])
+        @limiter.limit('login', 1, 60, methods=('POST',), on_limit=lambda result: ('slow down', 429))
+        def signin():
+            return 'signed in'
+
+        # key() returning None skips the limit (non-admins on admin-only routes)
+        @app.route('/admin-only', methods=['POST'])
+        @limiter.limit('external_email', 1, 60, key=lambda: None)
+        def admin_only():
+            return 'forbidden', 403
+
+        client = app.test_client()
+        self.assertEqual([client.post('/admin-only').status_code for _ in range(3)], [403, 403, 403])
+        self.assertEqual([client.get('/api/search').status_code for _ in range(3)], [200, 200, 429])
+        limited = client.get('/api/search')
+        self.assertEqual(limited.get_json()['retry_after'], 30)
+        self.assertEqual(limited.headers['Retry-After'], '30')
+        self.assertEqual(client.post('/signin').status_code, 200)
+        self.assertEqual(client.post('/signin').data, b'slow down')
+        self.assertEqual(client.get('/signin').status_code, 200)
+
+        # Disabled under app.testing unless RATELIMIT_ENABLED says otherwise
+        app.config.pop('RATELIMIT_ENABLED')
+        app.testing = True
+        self.assertEqual(client.post('/signin').status_code, 200)
+
+    def test_store_errors_fail_open(self):
+        class BrokenStore(MemoryStore):
+            def apply(self, *args):
+                raise RuntimeError('down')
+
+        self.assertTrue(RateLimiter(BrokenStore(), enabled=True).hit('x', 1, 1, 60).allowed)
+        self.assertFalse(RateLimiter(BrokenStore(), enabled=True, fail_open=False).hit('x', 1, 1, 60).allowed)
+
+    def test_default_sqlite_store_is_private(self):
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(cache_layer, 'APP_DATA_DIR', os.path.join(tmp, 'instance')), \
+                mock.patch.dict(os.environ, {'RATE_LIMIT_BACKEND': 'sqlite'}):
+            os.environ.pop('RATE_LIMIT_SQLITE_PATH', None)
+            store = build_store()
+            self.assertIsInstance(store, SQLStore)
+            path = os.path.join(tmp, 'instance', 'rate_limits.sqlite3')
+            self.assertEqual(store.engine.url.database, path)
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+            store.engine.dispose()
+
+            # A store someone else can write to is not trusted
+            os.chmod(path, 0o666)
+            self.assertIsInstance(build_store(), MemoryStore)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import sam_gov_fetcher
+from sam_gov_fetcher import SAMgovFetcher, SweepCheckpoint
+
+
+class _Response:
+    def __init__(self, status_code=200, payload=None, headers=None):
+        self.status_code = status_code
+        self._payload = payload or {}
+        self.headers = headers or {}
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        pass
+
+
+def _opportunity(notice_id, state):
+    return {'noticeId': notice_id, 'title': f'Janitorial {notice_id}', 'postedDate': '2025-03-01',
+            'placeOfPerformance': {'city': {'name': 'Norfolk'}, 'state': {'code': state}}}
+
+
+class SweepTestCase(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        os.remove(self.path)
+        env = {'SAM_GOV_API_KEY': 'test-key', 'SAM_TARGET_STATES': 'VA,MD', 'SAM_CHECKPOINT_PATH': self.path,
+               'SAM_GOV_RATE_LIMIT': '600000', 'SAM_FETCH_WORKERS': '4', 'SAM_MAX_PAGES_PER_NAICS': '3'}
+        patcher = mock.patch.dict(os.environ, env)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.fetcher = SAMgovFetcher()
+        self.fetcher.naics_codes = ['561720', '561740']
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def fetcher_run_key(self):
+        return f"{sam_gov_fetcher.datetime.utcnow().date().isoformat()}:30"
+
+    def _fake_get(self, fail_pair=None):
+        def fake_get(url, params=None, headers=None, timeout=None):
+            key = (params['placeOfPerformanceState'], params['ncode'])
+            with self.lock:
+                self.calls.append(key + (params['offset'],))
+            if key == fail_pair:
+                return _Response(500)
+            state, naics = key
+            # Every pair also returns one cross-listed notice; the second page repeats the first
+            # (offsets shifted under us), which has nothing new and ends paging
+            items = [_opportunity('SHARED', state)] + [_opportunity(f'{state}-{naics}-{i}', state) for i in range(99)]
+            return _Response(payload={'opportunitiesData': items, 'totalRecords': 500})
+        return fake_get
+
+    def test_sweep_dedupes_and_checkpoints(self):
+        with mock.patch.object(sam_gov_fetcher.requests, 'get', side_effect=self._fake_get(('MD', '561740'))), \
+                mock.patch.object(sam_gov_fetcher.time, 'sleep'):
+            first = self.fetcher.fetch_us_cleaning_contracts(days_back=30)
+        self.assertEqual(len(first), 3 * 99 + 1)
+        self.assertEqual(len(SweepCheckpoint(self.path, self.fetcher_run_key()).completed), 3)
+        # The repeated second page stops paging: no pair asks for a third page
+        self.assertFalse([c for c in self.calls if c[2] >= 200])
+
+        self.calls.clear()
+        with mock.patch.object(sam_gov_fetcher.requests, 'get', side_effect=self._fake_get()):
+            resumed = self.fetcher.fetch_us_cleaning_contracts(days_back=30)
+        self.assertEqual({c[:2] for c in self.calls}, {('MD', '561740')})
+        self.assertEqual(len(resumed), 4 * 99 + 1)
+        self.assertEqual(len({c['notice_id'] for c in resumed}), len(resumed))
+        # A complete sweep removes its checkpoint
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_checkpoint_appends_and_compacts(self):
+        def line_count():
+            with open(self.path) as fh:
+                return len(fh.read().splitlines())
+
+        checkpoint = SweepCheckpoint(self.path, 'day-1')
+        checkpoint.mark_done('VA', '561720', [{'notice_id': 'A'}])
+        checkpoint.mark_done('MD', '561720', [])
+        checkpoint.mark_done('VA', '561720', [{'notice_id': 'B'}])
+        # Header plus one appended line per call, never a rewrite
+        self.assertEqual(line_count(), 4)
+        with open(self.path, 'a') as fh:
+            fh.write('{"pair": "MD:5617')
+
+        reloaded = SweepCheckpoint(self.path, 'day-1')
+        self.assertEqual(reloaded.get('VA', '561720'), [{'notice_id': 'B'}])
+        self.assertEqual(reloaded.get('MD', '561720'), [])
+        self.assertEqual(line_count(), 3)
+
+        # Another day's run ignores the file and starts it over
+        other = SweepCheckpoint(self.path, 'day-2')
+        self.assertEqual(other.completed, {})
+        other.mark_done('VA', '561740', [])
+        self.assertEqual(SweepCheckpoint(self.path, 'day-2').completed, {'VA:561740': []})
+        self.assertEqual(SweepCheckpoint(self.path, 'day-1').completed, {})
+
+    def test_default_rate_limit_matches_docs(self):
+        with mock.patch.dict(os.environ, {'SAM_GOV_RATE_LIMIT': ''}):
+            del os.environ['SAM_GOV_RATE_LIMIT']
+            self.assertAlmostEqual(SAMgovFetcher().rate_limiter.rate, 10 / 60.0)
+
+    def test_invalid_key_aborts_sweep(self):
+        responses = mock.Mock(return_value=_Response(403, {'error': {'message': 'API_KEY_INVALID'}}))
+        with mock.patch.object(sam_gov_fetcher.requests, 'get', responses), \
+                mock.patch.object(self.fetcher, '_fallback_to_datagov', return_value=[]):
+            self.assertEqual(self.fetcher.fetch_us_cleaning_contracts(days_back=30), [])
+        self.assertLessEqual(responses.call_count, self.fetcher.max_workers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from schema_migrations import (Migration, current_version, migration_status, pending_migrations,
+                               run_migrations, schema_is_current)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds a worker may spend importing app.py against an up-to-date schema
+COLD_START_BUDGET_SECONDS = float(os.environ.get('COLD_START_BUDGET_SECONDS', 3.0))
+
+_IMPORT_PROBE = '''
+import json, time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+stats = {'statements': 0, 'ddl': 0}
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count(conn, cursor, statement, parameters, context, executemany):
+    stats['statements'] += 1
+    if statement.lstrip().upper().startswith(('CREATE', 'ALTER', 'DROP')):
+        stats['ddl'] += 1
+
+started = time.perf_counter()
+import app
+stats['seconds'] = time.perf_counter() - started
+print('PROBE ' + json.dumps(stats))
+'''
+
+
+class SchemaMigrationsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.session = Session(create_engine('sqlite://'))
+        self.calls = []
+
+    def tearDown(self):
+        self.session.close()
+
+    def _create(self, table):
+        def migrate(session):
+            self.calls.append(table)
+            session.execute(text(f'CREATE TABLE {table} (id INTEGER PRIMARY KEY)'))
+        return migrate
+
+    def test_applies_pending_migrations_once_in_order(self):
+        migrations = [Migration(2, 'b', self._create('b')), Migration(1, 'a', self._create('a'))]
+        self.assertEqual(current_version(self.session), 0)
+        self.assertFalse(schema_is_current(self.session, migrations))
+
+        self.assertEqual(run_migrations(self.session, migrations), [1, 2])
+        self.assertEqual(self.calls, ['a', 'b'])
+        self.assertTrue(schema_is_current(self.session, migrations))
+        self.assertEqual(run_migrations(self.session, migrations), [])
+
+        migrations.append(Migration(3, 'c', self._create('c')))
+        self.assertFalse(schema_is_current(self.session, migrations))
+        self.assertEqual([m.version for m in pending_migrations(self.session, migrations)], [3])
+        self.assertEqual(run_migrations(self.session, migrations), [3])
+        self.assertEqual(self.calls, ['a', 'b', 'c'])
+
+    def test_failed_migration_is_not_recorded_and_stops_the_run(self):
+        def broken(session):
+            raise RuntimeError('disk full')
+
+        migrations = [Migration(1, 'a', self._create('a')), Migration(2, 'broken', broken),
+                      Migration(3, 'c', self._create('c'))]
+        with self.assertRaises(RuntimeError):
+            run_migrations(self.session, migrations)
+        self.assertEqual(current_version(self.session), 1)
+        status = {row['version']: row['applied_at'] for row in migration_status(self.session, migrations)}
+        self.assertIsNotNone(status[1])
+        self.assertIsNone(status[2])
+        self.assertIsNone(status[3])
+
+        migrations[1] = Migration(2, 'fixed', self._create('b'))
+        self.assertEqual(run_migrations(self.session, migrations), [2, 3])
+
+
+class ColdStartBudgetTestCase(unittest.TestCase):
+    """Importing app.py against a migrated schema must not run the bootstrap DDL."""
+
+    @classmethod
+    def setUpClass(cls):
+        from app import run_schema_migrations
+        run_schema_migrations()
+
+    def test_import_within_budget_without_ddl(self):
+        env = dict(os.environ, SCHEDULER_MODE='off', JOB_WORKER_THREADS='0', SCHEMA_AUTO_MIGRATE='1')
+        output = subprocess.run([sys.executable, '-c', _IMPORT_PROBE], cwd=REPO_ROOT, env=env,
+                                capture_output=True, text=True, timeout=120).stdout
+        probe = json.loads(output.rsplit('PROBE ', 1)[1])
+        self.assertEqual(probe['ddl'], 0)
+        self.assertLessEqual(probe['statements'], 2)
+        self.assertLess(probe['seconds'], COLD_START_BUDGET_SECONDS)
+
+
+if __name__ == '__main__':
+    unittest.main()
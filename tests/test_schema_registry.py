@@ -0,0 +1,52 @@
+import unittest
+
+from schema_registry import forget, is_verified, mark_verified, verified_once
+
+
+class SchemaRegistryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+        self.results = []
+        self.addCleanup(forget, 'test_table')
+
+    def _ensure(self):
+        self.calls += 1
+        if self.results:
+            result = self.results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        return None
+
+    def test_ddl_runs_once_after_success(self):
+        ensure = verified_once('test_table')(self._ensure)
+        ensure()
+        ensure()
+        ensure()
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(is_verified('test_table'))
+
+        forget('test_table')
+        ensure()
+        self.assertEqual(self.calls, 2)
+
+    def test_failures_are_retried(self):
+        ensure = verified_once('test_table')(self._ensure)
+        self.results = [RuntimeError('permission denied'), False]
+        with self.assertRaises(RuntimeError):
+            ensure()
+        self.assertFalse(ensure())
+        self.assertFalse(is_verified('test_table'))
+        ensure()
+        ensure()
+        self.assertEqual(self.calls, 3)
+
+    def test_marked_tables_are_never_checked(self):
+        ensure = verified_once('test_table')(self._ensure)
+        mark_verified(ensure.schema_name)
+        self.assertTrue(ensure())
+        self.assertEqual(self.calls, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
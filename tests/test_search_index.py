@@ -0,0 +1,81 @@
+import unittest
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from search_index import ensure_search_index, refresh_search_index, search_leads, build_fts5_query
+
+
+class SearchIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        self.session = Session(self.engine)
+        self.session.execute(text('''CREATE TABLE federal_contracts
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT, agency TEXT, department TEXT,
+                      location TEXT, description TEXT, naics_code TEXT, set_aside TEXT,
+                      posted_date DATE, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)'''))
+        self.session.execute(text('''CREATE TABLE supply_contracts
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT, agency TEXT, location TEXT,
+                      product_category TEXT, description TEXT, posted_date TEXT,
+                      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)'''))
+        self.session.execute(text('''INSERT INTO federal_contracts (title, agency, location, description, naics_code, posted_date)
+                                     VALUES ('Janitorial Services Norfolk', 'Navy', 'Norfolk, VA', 'Custodial support', '561720', '2025-01-02'),
+                                            ('Grounds Maintenance', 'Army', 'Richmond, VA', 'Mowing and landscaping', '561730', '2025-01-03')'''))
+        self.session.execute(text('''INSERT INTO supply_contracts (title, agency, location, product_category, description, posted_date)
+                                     VALUES ('Paper towels', 'GSA', 'Hampton, VA', 'Janitorial supplies', 'Bulk janitorial paper', '2025-01-04')'''))
+        self.session.commit()
+        self.assertTrue(ensure_search_index(self.session))
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_fts5_query_is_sanitized(self):
+        self.assertEqual(build_fts5_query('janit" OR *'), '"janit"* "or"*')
+        self.assertEqual(build_fts5_query('  '), '')
+
+    def test_search_spans_lead_tables_ranked(self):
+        summary = refresh_search_index(self.session)
+        self.assertEqual(summary['federal'], 2)
+        self.assertEqual(summary['supply'], 1)
+        self.assertEqual(summary['residential'], -1)  # table missing in this fixture
+
+        results = search_leads(self.session, 'janitorial')
+        self.assertEqual({r['lead_type'] for r in results}, {'federal', 'supply'})
+        # Title hit outranks a body-only hit
+        self.assertEqual(results[0]['title'], 'Janitorial Services Norfolk')
+
+        self.assertEqual(search_leads(self.session, 'janit')[0]['bucket'], 'federal_contracts')
+        self.assertEqual(search_leads(self.session, ''), [])
+
+    def test_refresh_tracks_updates_and_deletes(self):
+        refresh_search_index(self.session)
+        self.session.execute(text("UPDATE federal_contracts SET title = 'Window washing' WHERE id = 2"))
+        self.session.execute(text('DELETE FROM federal_contracts WHERE id = 1'))
+        self.session.commit()
+
+        summary = refresh_search_index(self.session, lead_types=['federal'], prune=True)
+        self.assertEqual(summary['federal'], 1)  # unchanged rows are not rewritten
+        self.assertEqual(search_leads(self.session, 'window')[0]['lead_id'], 2)
+        self.assertEqual(search_leads(self.session, 'norfolk', lead_types=['federal']), [])
+
+    def test_delta_refresh_indexes_form_submissions(self):
+        refresh_search_index(self.session)
+        # A residential request submitted through the form after the index was built
+        self.session.execute(text('''CREATE TABLE residential_leads
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT, property_type TEXT, city TEXT, state TEXT,
+                      services_needed TEXT, special_requirements TEXT, cleaning_frequency TEXT,
+                      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)'''))
+        self.session.execute(text('''INSERT INTO residential_leads (property_type, city, state, services_needed, created_at)
+                                     VALUES ('Townhouse', 'Suffolk', 'VA', 'Move-out deep clean', '2025-06-01 12:00:00'),
+                                            ('Condo', 'Norfolk', 'VA', 'Old request', '2025-01-01 12:00:00')'''))
+        self.session.commit()
+        self.assertEqual(search_leads(self.session, 'suffolk'), [])
+
+        summary = refresh_search_index(self.session, since='2025-06-01 11:30:00')
+        self.assertEqual((summary['residential'], summary['federal']), (1, 0))
+        self.assertEqual(search_leads(self.session, 'suffolk')[0]['lead_type'], 'residential')
+        self.assertEqual(search_leads(self.session, 'condo'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
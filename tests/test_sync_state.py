@@ -0,0 +1,59 @@
+import os
+import unittest
+from datetime import date, timedelta
+from unittest import mock
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+import sync_state
+from sync_state import ensure_sync_state_table, get_sync_states, plan_window, record_sync, record_syncs
+
+
+class SyncStateTestCase(unittest.TestCase):
+    def setUp(self):
+        self.session = Session(create_engine('sqlite://'))
+        self.assertTrue(ensure_sync_state_table(self.session))
+        self.today = date(2025, 3, 10)
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_first_run_is_full_then_delta_with_overlap(self):
+        start, end, mode = plan_window(self.session, 'usaspending_awards', state='VA', today=self.today)
+        self.assertEqual((start, end, mode), (self.today - timedelta(days=90), self.today, 'full'))
+        self.assertTrue(record_sync(self.session, 'usaspending_awards', end, mode, state='VA', fetched=120))
+
+        next_day = self.today + timedelta(days=1)
+        start, end, mode = plan_window(self.session, 'usaspending_awards', state='VA', today=next_day)
+        self.assertEqual(mode, 'delta')
+        self.assertEqual(start, self.today - timedelta(days=sync_state.SYNC_OVERLAP_DAYS))
+        record_sync(self.session, 'usaspending_awards', end, mode, state='VA')
+
+        # A delta run keeps the last full reconciliation date
+        row = self.session.execute(text('SELECT high_water, last_full_sync, last_mode FROM federal_sync_state')).fetchone()
+        self.assertEqual(tuple(row), (next_day.isoformat(), self.today.isoformat(), 'delta'))
+
+    def test_periodic_and_forced_full_reconciliation(self):
+        record_sync(self.session, 'usaspending_awards', self.today, 'full', state='VA')
+        later = self.today + timedelta(days=sync_state.FULL_SYNC_INTERVAL_DAYS)
+        self.assertEqual(plan_window(self.session, 'usaspending_awards', state='VA', today=later)[2], 'full')
+        self.assertEqual(plan_window(self.session, 'usaspending_awards', state='VA', today=self.today,
+                                     force_full=True)[2], 'full')
+        with mock.patch.dict(os.environ, {'FEDERAL_SYNC_MODE': 'full'}):
+            self.assertEqual(plan_window(self.session, 'usaspending_awards', state='VA', today=self.today)[2], 'full')
+
+    def test_per_state_naics_marks(self):
+        record_syncs(self.session, 'samgov', [('VA', '561720', self.today, 'full', 3),
+                                              ('MD', '561720', self.today, 'full', 0)])
+        states = get_sync_states(self.session, 'samgov')
+        self.assertEqual(set(states), {('VA', '561720'), ('MD', '561720')})
+        tomorrow = self.today + timedelta(days=1)
+        self.assertEqual(plan_window(self.session, 'samgov', 'VA', '561720', default_days=14,
+                                     today=tomorrow, states=states)[2], 'delta')
+        self.assertEqual(plan_window(self.session, 'samgov', 'VA', '561740', default_days=14,
+                                     today=tomorrow, states=states)[2], 'full')
+
+
+if __name__ == '__main__':
+    unittest.main()
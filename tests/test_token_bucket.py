@@ -0,0 +1,46 @@
+import unittest
+
+from token_bucket import TokenBucket
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TokenBucketTestCase(unittest.TestCase):
+    def test_burst_then_refill_rate(self):
+        clock = _FakeClock()
+        bucket = TokenBucket(rate=10, capacity=2, clock=clock, sleep=clock.sleep)
+        for _ in range(4):
+            bucket.acquire()
+        # Two burst tokens, then one every 0.1s
+        self.assertAlmostEqual(clock.now, 0.2)
+        self.assertAlmostEqual(bucket.waited, 0.2)
+
+    def test_retry_after_pause_holds_every_caller(self):
+        clock = _FakeClock()
+        bucket = TokenBucket(rate=2, capacity=2, clock=clock, sleep=clock.sleep)
+        bucket.pause_for(10)
+        bucket.acquire()
+        bucket.acquire()
+        # Nothing accrued during the pause: one token, then the normal rate
+        self.assertAlmostEqual(clock.now, 10.5)
+        self.assertAlmostEqual(bucket.waited, 10.5)
+
+    def test_zero_rate_is_unlimited(self):
+        clock = _FakeClock()
+        bucket = TokenBucket(rate=0, clock=clock, sleep=clock.sleep)
+        for _ in range(100):
+            bucket.acquire()
+        self.assertEqual((clock.now, bucket.waited), (0.0, 0.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+"""
+Thread-safe token bucket
+Shared by the SAM.gov sweep (one bucket for every fetch worker) and the mail
+dispatcher (one bucket per SMTP account).
+
+rate is tokens per second (0 or less = unlimited); capacity bounds bursts.
+acquire() blocks until a token is available and adds the time it slept to
+`waited`. pause_for() stops handing out tokens for a while - e.g. when a server
+answers 429 with Retry-After - so every caller backs off, not just the one that
+got throttled.
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """Token bucket; acquire() waits for a token, pause_for() holds every caller back."""
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = max(float(capacity), 1.0)
+        self.tokens = self.capacity
+        self.waited = 0.0
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = self._clock()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                self.waited += wait
+            self._sleep(wait)
+
+    def pause_for(self, seconds):
+        """Stop handing out tokens for `seconds` (e.g. a Retry-After header)."""
+        with self._lock:
+            now = self._clock()
+            self._paused_until = max(self._paused_until, now + seconds)
+            # Nothing accrues while paused; resume with a single token
+            self._updated = self._paused_until
+            self.tokens = min(self.tokens, 1.0)
@@ -98,8 +98,19 @@ def insert_contracts(contracts):
         logger.error(f"❌ Database error: {e}")
         return 0
 
+def ingest_bulk_file(source, states=None):
+    """Stream a bulk CSV/ZIP award file (URL or local path) into federal_contracts."""
+    from app import app, ingest_federal_bulk_file
+    with app.app_context():
+        return ingest_federal_bulk_file(source, states=states)
+
 def main():
     """Main function to fetch and update contracts"""
+    # python update_from_datagov.py --bulk-file <url-or-path> [STATE ...]
+    if len(sys.argv) > 2 and sys.argv[1] == '--bulk-file':
+        ingest_bulk_file(sys.argv[2], states=sys.argv[3:] or None)
+        return
+
     logger.info("🚀 Starting Data.gov bulk data update...")
     
     # Initialize fetcher